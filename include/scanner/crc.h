@@ -30,9 +30,19 @@ namespace gr {
   namespace scanner {
 
     /*!
-     * \brief <+description of block+>
+     * \brief Smartnet OSW error correction, CRC check and parsing
      * \ingroup scanner
      *
+     * Takes scanner::smartnet_frame items from deinterleave and posts the
+     * good ones to the queue as CTRL_MSG_SMARTNET messages (see
+     * scanner/ctrl_msg.h). Up to max_batch packets go in each message;
+     * a partial batch is posted at the end of every work call, so
+     * batching never holds a packet back.
+     *
+     * The decoder health counters below can be read at any time, and
+     * every stats_interval seconds (if > 0) they're published on the
+     * "stats" message port as a dict of the counters plus "time", the
+     * unix time they were read.
      */
     class SCANNER_API crc : virtual public gr::sync_block
     {
@@ -47,7 +57,18 @@ namespace gr {
        * class. scanner::crc::make is the public interface for
        * creating new instances.
        */
-      static sptr make(gr::msg_queue::sptr queue);
+      static sptr make(gr::msg_queue::sptr queue, int max_batch=1, double stats_interval=1.0);
+
+      //! Frames checked
+      virtual uint64_t num_frames() const = 0;
+      //! Frames the ECC flipped bits in
+      virtual uint64_t num_corrected() const = 0;
+      //! Bits flipped by the ECC
+      virtual uint64_t num_bits_corrected() const = 0;
+      //! Frames that passed CRC
+      virtual uint64_t num_crc_pass() const = 0;
+      //! Frames that failed CRC
+      virtual uint64_t num_crc_fail() const = 0;
     };
 
   } // namespace scanner
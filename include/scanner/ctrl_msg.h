@@ -0,0 +1,82 @@
+/* -*- c++ -*- */
+/*
+ * Copyright 2013 Nick Foster
+ *
+ * This is free software; you can redistribute it and/or modify
+ * it under the terms of the GNU General Public License as published by
+ * the Free Software Foundation; either version 3, or (at your option)
+ * any later version.
+ *
+ * This software is distributed in the hope that it will be useful,
+ * but WITHOUT ANY WARRANTY; without even the implied warranty of
+ * MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+ * GNU General Public License for more details.
+ *
+ * You should have received a copy of the GNU General Public License
+ * along with this software; see the file COPYING.  If not, write to
+ * the Free Software Foundation, Inc., 51 Franklin Street,
+ * Boston, MA 02110-1301, USA.
+ */
+
+#ifndef INCLUDED_SCANNER_CTRL_MSG_H
+#define INCLUDED_SCANNER_CTRL_MSG_H
+
+#include <stdint.h>
+#include <sys/time.h>
+
+/*
+ * Binary control channel messages.
+ *
+ * The control channel decoders hand packets to Python through a msg_queue.
+ * Each message holds a batch of fixed-size records in native byte order:
+ * arg2 says which record, arg1 holds the record count, and the payload is
+ * the packed record array. The message type is always 0: gru.msgq_runner
+ * takes any other type as a request to stop. python/ctrl_chan.py mirrors these
+ * layouts as numpy dtypes, so keep the two in sync.
+ *
+ * Each record carries the wall clock time the decoder emitted it, so
+ * Python can tell how long packets spend in the stream buffers ahead of
+ * the decoder and in the queue after it, and the demodulator input
+ * sample its preamble came from (from fsk_demod's "sample" tags, see
+ * lib/sample_clock.h), SAMPLE_UNKNOWN until the first tag turns up.
+ */
+
+namespace gr {
+  namespace scanner {
+
+    //carried in arg2, 0 is left for ctrl_chan.py's queue_flush marker
+    enum ctrl_msg_kind {
+      CTRL_MSG_SMARTNET = 1, //payload is smartnet_record[arg1]
+      CTRL_MSG_EDACS = 2     //payload is edacs_record[arg1]
+    };
+
+    static const uint64_t SAMPLE_UNKNOWN = ~uint64_t(0);
+
+    struct smartnet_record {
+      uint64_t offset;    //bit stream offset of the frame's preamble
+      uint16_t address;
+      uint16_t command;
+      uint8_t groupflag;
+      uint8_t reserved[3];
+      double emitted;     //unix time the decoder emitted it
+      uint64_t sample;    //demod input sample of the preamble
+    };
+
+    struct edacs_record {
+      uint64_t offset;    //bit stream offset of the frame's preamble
+      uint64_t pkt;       //40-bit packet, right-justified
+      double emitted;     //unix time the decoder emitted it
+      uint64_t sample;    //demod input sample of the preamble
+    };
+
+    //wall clock time for the emitted fields
+    static inline double ctrl_msg_now() {
+        struct timeval tv;
+        gettimeofday(&tv, NULL);
+        return tv.tv_sec + tv.tv_usec * 1e-6;
+    }
+
+  } // namespace scanner
+} // namespace gr
+
+#endif /* INCLUDED_SCANNER_CTRL_MSG_H */
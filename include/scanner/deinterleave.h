@@ -24,14 +24,18 @@
 
 #include <scanner/api.h>
 #include <gnuradio/block.h>
+#include <scanner/smartnet_frame.h>
 
 namespace gr {
   namespace scanner {
 
     /*!
-     * \brief <+description of block+>
+     * \brief Smartnet OSW deinterleaver
      * \ingroup scanner
      *
+     * Takes the sliced bit stream tagged "smartnet_preamble" and emits
+     * one packed scanner::smartnet_frame (scanner/smartnet_frame.h) per
+     * preamble, tagged "smartnet_frame".
      */
     class SCANNER_API deinterleave : virtual public gr::block
     {
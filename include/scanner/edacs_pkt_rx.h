@@ -24,14 +24,26 @@
 
 #include <scanner/api.h>
 #include <gnuradio/sync_block.h>
+#include <gnuradio/msg_queue.h>
 
 namespace gr {
   namespace scanner {
 
     /*!
-     * \brief <+description of block+>
+     * \brief EDACS control channel packet receiver
      * \ingroup scanner
      *
+     * Takes the bit stream tagged "edacs_preamble", recovers the two
+     * packets following each preamble by a bitwise majority vote of
+     * their three copies, CRC checks them and posts them to the queue as
+     * CTRL_MSG_EDACS messages (see scanner/ctrl_msg.h). Up to max_batch
+     * packets go in each message; a partial batch is posted at the end
+     * of every work call.
+     *
+     * The decoder health counters below can be read at any time, and
+     * every stats_interval seconds (if > 0) they're published on the
+     * "stats" message port as a dict of the counters plus "time", the
+     * unix time they were read.
      */
     class SCANNER_API edacs_pkt_rx : virtual public gr::sync_block
     {
@@ -46,7 +58,18 @@ namespace gr {
        * class. scanner::edacs_pkt_rx::make is the public interface for
        * creating new instances.
        */
-      static sptr make(gr::msg_queue::sptr queue);
+      static sptr make(gr::msg_queue::sptr queue, int max_batch=1, double stats_interval=1.0);
+
+      //! Frames (preambles) seen, each holding two packets
+      virtual uint64_t num_frames() const = 0;
+      //! Packets where all three copies agreed
+      virtual uint64_t num_clean() const = 0;
+      //! Packets where two of the three copies agreed
+      virtual uint64_t num_matched() const = 0;
+      //! Packets no two copies agreed on, recovered by the bitwise vote
+      virtual uint64_t num_voted() const = 0;
+      //! Packets that failed CRC after voting
+      virtual uint64_t num_crc_fail() const = 0;
     };
 
   } // namespace scanner
@@ -0,0 +1,70 @@
+/* -*- c++ -*- */
+/*
+ * Copyright 2013 Nick Foster
+ *
+ * This is free software; you can redistribute it and/or modify
+ * it under the terms of the GNU General Public License as published by
+ * the Free Software Foundation; either version 3, or (at your option)
+ * any later version.
+ *
+ * This software is distributed in the hope that it will be useful,
+ * but WITHOUT ANY WARRANTY; without even the implied warranty of
+ * MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+ * GNU General Public License for more details.
+ *
+ * You should have received a copy of the GNU General Public License
+ * along with this software; see the file COPYING.  If not, write to
+ * the Free Software Foundation, Inc., 51 Franklin Street,
+ * Boston, MA 02110-1301, USA.
+ */
+
+#ifndef INCLUDED_SCANNER_NOISE_SQUELCH_FF_H
+#define INCLUDED_SCANNER_NOISE_SQUELCH_FF_H
+
+#include <scanner/api.h>
+#include <gnuradio/block.h>
+
+namespace gr {
+  namespace scanner {
+
+    /*!
+     * \brief Noise squelch for demodulated FM audio
+     * \ingroup scanner
+     *
+     * The whole of standard_squelch_ff in one block: the audio goes
+     * through a pair of complementary high- and low-pass IIRs, their
+     * envelope powers are compared against threshold_db with 1dB of
+     * hysteresis, and the smoothed open/closed decision scales the
+     * audio. Scaled samples below -100dB are dropped if gate is set,
+     * otherwise everything is passed through.
+     */
+    class SCANNER_API noise_squelch_ff : virtual public gr::block
+    {
+     public:
+      typedef boost::shared_ptr<noise_squelch_ff> sptr;
+
+      /*!
+       * \brief Return a shared_ptr to a new instance of scanner::noise_squelch_ff.
+       *
+       * To avoid accidental use of raw pointers, scanner::noise_squelch_ff's
+       * constructor is in a private implementation
+       * class. scanner::noise_squelch_ff::make is the public interface for
+       * creating new instances.
+       */
+      static sptr make(double alpha=0.0001, float threshold_db=-10, bool gate=false);
+
+      virtual void set_alpha(double alpha) = 0;
+      virtual double alpha() const = 0;
+      virtual void set_threshold(float threshold_db) = 0;
+      //! The opening threshold as a power ratio
+      virtual float threshold() const = 0;
+      virtual void set_gate(bool gate) = 0;
+      virtual bool gate() const = 0;
+      //! Whether the squelch decision was open at the last sample
+      virtual bool is_open() const = 0;
+    };
+
+  } // namespace scanner
+} // namespace gr
+
+#endif /* INCLUDED_SCANNER_NOISE_SQUELCH_FF_H */
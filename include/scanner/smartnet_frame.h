@@ -0,0 +1,47 @@
+/* -*- c++ -*- */
+/*
+ * Copyright 2013 Nick Foster
+ *
+ * This is free software; you can redistribute it and/or modify
+ * it under the terms of the GNU General Public License as published by
+ * the Free Software Foundation; either version 3, or (at your option)
+ * any later version.
+ *
+ * This software is distributed in the hope that it will be useful,
+ * but WITHOUT ANY WARRANTY; without even the implied warranty of
+ * MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+ * GNU General Public License for more details.
+ *
+ * You should have received a copy of the GNU General Public License
+ * along with this software; see the file COPYING.  If not, write to
+ * the Free Software Foundation, Inc., 51 Franklin Street,
+ * Boston, MA 02110-1301, USA.
+ */
+
+#ifndef INCLUDED_SCANNER_SMARTNET_FRAME_H
+#define INCLUDED_SCANNER_SMARTNET_FRAME_H
+
+#include <stdint.h>
+
+namespace gr {
+  namespace scanner {
+
+    /*!
+     * A deinterleaved Smartnet OSW, one per stream item between
+     * deinterleave and crc.
+     *
+     * An OSW is 38 data bits, each followed by a parity bit. The data
+     * and parity bits are packed into separate words, first bit in
+     * bit 37, so data bit k is (data >> (37-k)) & 1.
+     */
+    struct smartnet_frame {
+      uint64_t data;
+      uint64_t parity;
+      uint64_t offset;    //bit stream offset of the frame's preamble
+      uint64_t sample;    //demod input sample of the preamble, see ctrl_msg.h
+    };
+
+  } // namespace scanner
+} // namespace gr
+
+#endif /* INCLUDED_SCANNER_SMARTNET_FRAME_H */
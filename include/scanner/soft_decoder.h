@@ -0,0 +1,62 @@
+/* -*- c++ -*- */
+/*
+ * Copyright 2013 Nick Foster
+ *
+ * This is free software; you can redistribute it and/or modify
+ * it under the terms of the GNU General Public License as published by
+ * the Free Software Foundation; either version 3, or (at your option)
+ * any later version.
+ *
+ * This software is distributed in the hope that it will be useful,
+ * but WITHOUT ANY WARRANTY; without even the implied warranty of
+ * MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+ * GNU General Public License for more details.
+ *
+ * You should have received a copy of the GNU General Public License
+ * along with this software; see the file COPYING.  If not, write to
+ * the Free Software Foundation, Inc., 51 Franklin Street,
+ * Boston, MA 02110-1301, USA.
+ */
+
+#ifndef INCLUDED_SCANNER_SOFT_DECODER_H
+#define INCLUDED_SCANNER_SOFT_DECODER_H
+
+#include <scanner/api.h>
+#include <gnuradio/block.h>
+#include <scanner/smartnet_frame.h>
+
+namespace gr {
+  namespace scanner {
+
+    /*!
+     * \brief Soft-decision Smartnet OSW deinterleaver and decoder
+     * \ingroup scanner
+     *
+     * Drop-in replacement for scanner::deinterleave. Input 0 is the
+     * sliced bit stream tagged "smartnet_preamble", and input 1 is the
+     * soft symbol stream it was sliced from. The soft symbols following
+     * each preamble are Viterbi decoded, and one packed
+     * scanner::smartnet_frame (scanner/smartnet_frame.h) is emitted per
+     * preamble, tagged "smartnet_frame", for scanner::crc to check.
+     */
+    class SCANNER_API soft_decoder : virtual public gr::block
+    {
+     public:
+      typedef boost::shared_ptr<soft_decoder> sptr;
+
+      /*!
+       * \brief Return a shared_ptr to a new instance of scanner::soft_decoder.
+       *
+       * To avoid accidental use of raw pointers, scanner::soft_decoder's
+       * constructor is in a private implementation
+       * class. scanner::soft_decoder::make is the public interface for
+       * creating new instances.
+       */
+      static sptr make();
+    };
+
+  } // namespace scanner
+} // namespace gr
+
+#endif /* INCLUDED_SCANNER_SOFT_DECODER_H */
+
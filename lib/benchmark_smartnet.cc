@@ -0,0 +1,279 @@
+/* -*- c++ -*- */
+/*
+ * Copyright 2013 Nick Foster
+ *
+ * This is free software; you can redistribute it and/or modify
+ * it under the terms of the GNU General Public License as published by
+ * the Free Software Foundation; either version 3, or (at your option)
+ * any later version.
+ *
+ * This software is distributed in the hope that it will be useful,
+ * but WITHOUT ANY WARRANTY; without even the implied warranty of
+ * MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+ * GNU General Public License for more details.
+ *
+ * You should have received a copy of the GNU General Public License
+ * along with this software; see the file COPYING.  If not, write to
+ * the Free Software Foundation, Inc., 51 Franklin Street,
+ * Boston, MA 02110-1301, USA.
+ */
+
+/*
+ * Throughput benchmark for the Smartnet frame path.
+ * Runs the same OSWs through the old one-bit-per-byte deinterleave/ECC/CRC
+ * code and the packed-word code in smartnet_bits.h, checks that they
+ * agree on every packet, and prints frames per second for each.
+ * Then it sweeps the SNR of noisy soft symbols and compares how many
+ * packets the hard path (slice, ECC, CRC) and the soft-decision path
+ * (smartnet_soft_decode, CRC) get through.
+ */
+
+#include <cstdio>
+#include <cstdlib>
+#include <cstring>
+#include <cmath>
+#include <vector>
+#include <sys/time.h>
+#include "smartnet_bits.h"
+
+using namespace gr::scanner;
+
+//the one-bit-per-byte implementation deinterleave and crc used to have
+namespace bytewise {
+    void deinterleave(char *out, const char *in) {
+        for(int k=0; k<76/4; k++) {
+            for(int l=0; l<4; l++) {
+                out[k*4 + l] = in[k + l*19];
+            }
+        }
+    }
+
+    void smartnet_ecc(char *out, const char *in) {
+        char expected[76];
+        char syndrome[76];
+
+        expected[0] = in[0] & 0x01;
+        expected[1] = in[0] & 0x01;
+        for(int k = 2; k < 76; k+=2) {
+            expected[k] = in[k] & 0x01;
+            expected[k+1] = (in[k] & 0x01) ^ (in[k-2] & 0x01);
+        }
+
+        for(int k = 0; k < 76; k++) {
+            syndrome[k] = expected[k] ^ (in[k] & 0x01);
+        }
+
+        for(int k = 0; k < 38-1; k++) {
+            if(syndrome[2*k+1] && syndrome[2*k+3]) {
+                out[k] = (in[2*k] & 0x01) ? 0 : 1;
+            }
+            else out[k] = in[2*k];
+        }
+        out[37] = in[74];
+    }
+
+    bool crc(const char *in) {
+        unsigned int crcaccum = 0x0393;
+        unsigned int crcop = 0x036E;
+        unsigned int crcgiven;
+
+        for(int j=0; j<27; j++) {
+            if(crcop & 0x01) crcop = (crcop >> 1)^0x0225;
+            else crcop >>= 1;
+            if (in[j] & 0x01) crcaccum = crcaccum ^ crcop;
+        }
+
+        crcgiven = 0x0000;
+        for(int j=0; j<10; j++) {
+            crcgiven <<= 1;
+            crcgiven += !bool(in[j+27] & 0x01);
+        }
+
+        return (crcgiven == crcaccum);
+    }
+
+    smartnet_packet parse(const char *in) {
+        smartnet_packet pkt;
+
+        pkt.address = 0;
+        pkt.groupflag = false;
+        pkt.command = 0;
+        pkt.crc = 0;
+
+        int i=0;
+
+        for(int k = 15; k >=0 ; k--) pkt.address += (!bool(in[i++] & 0x01)) << k;
+        pkt.groupflag = !bool(in[i++]);
+        for(int k = 9; k >=0 ; k--) pkt.command += (!bool(in[i++] & 0x01)) << k;
+        for(int k = 9; k >=0 ; k--) pkt.crc += (!bool(in[i++] & 0x01)) << k;
+
+        pkt.address ^= 0x33C7;
+        pkt.command ^= 0x032A;
+
+        return pkt;
+    }
+}
+
+//build an on-air OSW (after the preamble) for a packet
+static void encode(char *out, unsigned int address, bool groupflag, unsigned int command) {
+    char data[38];
+    unsigned int a = address ^ 0x33C7;
+    unsigned int c = command ^ 0x032A;
+    for(int k = 0; k < 16; k++) data[k] = !((a >> (15-k)) & 0x01);
+    data[16] = !groupflag;
+    for(int k = 0; k < 10; k++) data[17+k] = !((c >> (9-k)) & 0x01);
+
+    unsigned int crcaccum = 0x0393;
+    unsigned int crcop = 0x036E;
+    for(int j=0; j<27; j++) {
+        if(crcop & 0x01) crcop = (crcop >> 1)^0x0225;
+        else crcop >>= 1;
+        if(data[j]) crcaccum ^= crcop;
+    }
+    for(int k = 0; k < 10; k++) data[27+k] = !((crcaccum >> (9-k)) & 0x01);
+    data[37] = 0;
+
+    char frame[76];
+    for(int k = 0; k < 38; k++) {
+        frame[2*k] = data[k];
+        frame[2*k+1] = data[k] ^ (k ? data[k-1] : 0);
+    }
+    for(int k=0; k<76/4; k++) {
+        for(int l=0; l<4; l++) {
+            out[k + l*19] = frame[k*4 + l];
+        }
+    }
+}
+
+//unit-variance gaussian noise, Box-Muller
+static float gaussian() {
+    double u1 = (rand() + 1.0) / (RAND_MAX + 2.0);
+    double u2 = (rand() + 1.0) / (RAND_MAX + 2.0);
+    return sqrt(-2.0 * log(u1)) * cos(2.0 * M_PI * u2);
+}
+
+static double now() {
+    struct timeval tv;
+    gettimeofday(&tv, NULL);
+    return tv.tv_sec + tv.tv_usec * 1e-6;
+}
+
+int
+main (int argc, char **argv)
+{
+    const int nframes = 100000;
+    const int passes = (argc > 1) ? atoi(argv[1]) : 20;
+    std::vector<char> osws(nframes * 84);
+
+    //a third clean, a third with a single bit error, a third garbage
+    srand(1);
+    for(int i = 0; i < nframes; i++) {
+        char *osw = &osws[i*84];
+        if(i % 3 == 2) {
+            for(int k = 0; k < 84; k++) osw[k] = rand() & 0x01;
+        } else {
+            encode(osw, rand() & 0xFFFF, rand() & 0x01, rand() & 0x3FF);
+            for(int k = 76; k < 84; k++) osw[k] = rand() & 0x01;
+            if(i % 3 == 1) osw[rand() % 76] ^= 0x01;
+        }
+    }
+
+    //check they agree
+    smartnet_crc_table table;
+    int ngood = 0;
+    for(int i = 0; i < nframes; i++) {
+        const char *osw = &osws[i*84];
+        char frame[76], databits[38];
+        bytewise::deinterleave(frame, osw);
+        bytewise::smartnet_ecc(databits, frame);
+        bool ok_bytes = bytewise::crc(databits);
+
+        int nfixed;
+        uint64_t data = smartnet_ecc(smartnet_deinterleave(osw), nfixed);
+        bool ok_packed = table.check(data);
+
+        if(ok_bytes != ok_packed) {
+            printf("CRC mismatch at frame %i\n", i);
+            return 1;
+        }
+        if(ok_bytes) {
+            smartnet_packet a = bytewise::parse(databits);
+            smartnet_packet b = smartnet_parse(data);
+            if(a.address != b.address || a.command != b.command
+               || a.groupflag != b.groupflag || a.crc != b.crc) {
+                printf("Packet mismatch at frame %i\n", i);
+                return 1;
+            }
+            ngood++;
+        }
+    }
+    printf("%i of %i frames decoded, both paths agree\n", ngood, nframes);
+
+    //and time them
+    unsigned int sink = 0;
+    double start = now();
+    for(int p = 0; p < passes; p++) {
+        for(int i = 0; i < nframes; i++) {
+            char frame[76], databits[38];
+            bytewise::deinterleave(frame, &osws[i*84]);
+            bytewise::smartnet_ecc(databits, frame);
+            if(bytewise::crc(databits)) sink += bytewise::parse(databits).address;
+        }
+    }
+    double bytes_time = now() - start;
+
+    start = now();
+    for(int p = 0; p < passes; p++) {
+        for(int i = 0; i < nframes; i++) {
+            int nfixed;
+            uint64_t data = smartnet_ecc(smartnet_deinterleave(&osws[i*84]), nfixed);
+            if(table.check(data)) sink += smartnet_parse(data).address;
+        }
+    }
+    double packed_time = now() - start;
+
+    double total = double(nframes) * passes;
+    printf("byte per bit: %.2f Mframes/s\n", total / bytes_time / 1e6);
+    printf("packed:       %.2f Mframes/s\n", total / packed_time / 1e6);
+    printf("speedup:      %.2fx (%u)\n", bytes_time / packed_time, sink & 0x1);
+
+    //soft-decision decoding of the clean OSWs at swept SNR (Es/N0, antipodal symbols)
+    const int nsweep = 20000;
+    std::vector<char> clean(nsweep * 84);
+    std::vector<float> soft(nsweep * 84);
+    std::vector<char> sliced(nsweep * 84);
+    std::vector<unsigned int> addrs(nsweep);
+    for(int i = 0; i < nsweep; i++) {
+        addrs[i] = rand() & 0xFFFF;
+        encode(&clean[i*84], addrs[i], rand() & 0x01, rand() & 0x3FF);
+    }
+    printf("\n SNR(dB)   hard    soft\n");
+    for(int snr = 0; snr <= 10; snr++) {
+        float sigma = sqrt(0.5 / pow(10.0, snr / 10.0));
+        for(int k = 0; k < nsweep * 84; k++) {
+            soft[k] = (clean[k] ? 1.0f : -1.0f) + sigma * gaussian();
+            sliced[k] = soft[k] > 0;
+        }
+        int nhard = 0, nsoft = 0;
+        for(int i = 0; i < nsweep; i++) {
+            int nfixed;
+            uint64_t data = smartnet_ecc(smartnet_deinterleave(&sliced[i*84]), nfixed);
+            if(table.check(data) && smartnet_parse(data).address == addrs[i]) nhard++;
+            data = smartnet_ecc(smartnet_soft_decode(&soft[i*84]), nfixed);
+            if(table.check(data) && smartnet_parse(data).address == addrs[i]) nsoft++;
+        }
+        printf("%8i  %5.1f%%  %5.1f%%\n", snr, 100.0 * nhard / nsweep, 100.0 * nsoft / nsweep);
+    }
+
+    start = now();
+    for(int p = 0; p < passes; p++) {
+        for(int i = 0; i < nsweep; i++) {
+            int nfixed;
+            uint64_t data = smartnet_ecc(smartnet_soft_decode(&soft[i*84]), nfixed);
+            if(table.check(data)) sink += smartnet_parse(data).address;
+        }
+    }
+    double soft_time = now() - start;
+    printf("soft:         %.2f Mframes/s (%u)\n", double(nsweep) * passes / soft_time / 1e6, sink & 0x1);
+    return 0;
+}
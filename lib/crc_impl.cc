@@ -24,6 +24,7 @@
 
 #include <gnuradio/io_signature.h>
 #include <gnuradio/tags.h>
+#include <cstring>
 #include "crc_impl.h"
 
 #define VERBOSE 0
@@ -32,22 +33,25 @@ namespace gr {
   namespace scanner {
 
     crc::sptr
-    crc::make(gr::msg_queue::sptr queue)
+    crc::make(gr::msg_queue::sptr queue, int max_batch, double stats_interval)
     {
       return gnuradio::get_initial_sptr
-        (new crc_impl(queue));
+        (new crc_impl(queue, max_batch, stats_interval));
     }
 
     /*
      * The private constructor
      */
-    crc_impl::crc_impl(gr::msg_queue::sptr queue)
+    crc_impl::crc_impl(gr::msg_queue::sptr queue, int max_batch, double stats_interval)
       : gr::sync_block("crc",
-              gr::io_signature::make(1, 1, sizeof(char)),
-              gr::io_signature::make(0, 0, 0))
+              gr::io_signature::make(1, 1, sizeof(smartnet_frame)),
+              gr::io_signature::make(0, 0, 0)),
+        d_stats_interval(stats_interval)
     {
-        set_output_multiple(38);
         d_queue = queue;
+        d_max_batch = (max_batch > 0) ? max_batch : 1;
+        d_batch.reserve(d_max_batch);
+        message_port_register_out(pmt::mp("stats"));
     }
 
     /*
@@ -57,79 +61,36 @@ namespace gr {
     {
     }
 
-    void crc_impl::smartnet_ecc(char *out, const char *in) {
-        char expected[76];
-        char syndrome[76];
-
-        //first we calculate the EXPECTED parity bits from the RECEIVED bitstream
-        //parity is I[i] ^ I[i-1]
-        //since the bitstream is still interleaved with the P bits, we can do this while running
-        expected[0] = in[0] & 0x01; //info bit
-        expected[1] = in[0] & 0x01; //this is a parity bit, prev bits were 0 so we call x ^ 0 = x
-        for(int k = 2; k < 76*2; k+=2) {
-            expected[k] = in[k] & 0x01; //info bit
-            expected[k+1] = (in[k] & 0x01) ^ (in[k-2] & 0x01); //parity bit
-        }
-
-        for(int k = 0; k < 76; k++) {
-            syndrome[k] = expected[k] ^ (in[k] & 0x01); //calculate the syndrome
-            if(VERBOSE) if(syndrome[k]) std::cout << "Bit error at bit " << k << std::endl;
-        }
-
-        for(int k = 0; k < 38-1; k++) {
-            //now we correct the data using the syndrome: if two consecutive
-            //parity bits are flipped, you've got a bad previous bit
-            if(syndrome[2*k+1] && syndrome[2*k+3]) {
-                out[k] = (in[2*k] & 0x01) ? 0 : 1; //byte-safe bit flip
-                if(VERBOSE) std::cout << "I just flipped a bit!" << std::endl;
-            }
-            else out[k] = in[2*k];
-        }
+    bool crc_impl::start() {
+        d_reporter.start(d_stats_interval, boost::bind(&crc_impl::publish_stats, this));
+        return true;
     }
 
-    bool crc_impl::crc(const char *in) {
-        unsigned int crcaccum = 0x0393;
-        unsigned int crcop = 0x036E;
-        unsigned int crcgiven;
-
-        //calc expected crc
-        for(int j=0; j<27; j++) {
-            if(crcop & 0x01) crcop = (crcop >> 1)^0x0225;
-            else crcop >>= 1;
-            if (in[j] & 0x01) crcaccum = crcaccum ^ crcop;
-        }
-
-        //load given crc
-        crcgiven = 0x0000;
-        for(int j=0; j<10; j++) {
-            crcgiven <<= 1;
-            crcgiven += !bool(in[j+27] & 0x01);
-        }
-
-        return (crcgiven == crcaccum);
+    bool crc_impl::stop() {
+        d_reporter.stop();
+        return true;
     }
 
-    smartnet_packet crc_impl::parse(const char *in) {
-        smartnet_packet pkt;
-
-        pkt.address = 0;
-        pkt.groupflag = false;
-        pkt.command = 0;
-        pkt.crc = 0;
-
-        int i=0;
-
-        for(int k = 15; k >=0 ; k--) pkt.address += (!bool(in[i++] & 0x01)) << k; //first 16 bits are ID, MSB first
-        pkt.groupflag = !bool(in[i++]);
-        for(int k = 9; k >=0 ; k--) pkt.command += (!bool(in[i++] & 0x01)) << k; //next 10 bits are command, MSB first
-        for(int k = 9; k >=0 ; k--) pkt.crc += (!bool(in[i++] & 0x01)) << k; //next 10 bits are CRC
-        i++; //skip the guard bit
+    void crc_impl::publish_stats() {
+        pmt::pmt_t stats = pmt::make_dict();
+        stats = pmt::dict_add(stats, pmt::mp("time"), pmt::from_double(ctrl_msg_now()));
+        stats = pmt::dict_add(stats, pmt::mp("frames"), pmt::from_uint64(num_frames()));
+        stats = pmt::dict_add(stats, pmt::mp("corrected"), pmt::from_uint64(num_corrected()));
+        stats = pmt::dict_add(stats, pmt::mp("bits_corrected"), pmt::from_uint64(num_bits_corrected()));
+        stats = pmt::dict_add(stats, pmt::mp("crc_pass"), pmt::from_uint64(num_crc_pass()));
+        stats = pmt::dict_add(stats, pmt::mp("crc_fail"), pmt::from_uint64(num_crc_fail()));
+        message_port_pub(pmt::mp("stats"), stats);
+    }
 
-        //now correct things according to the mottrunk.txt description
-        pkt.address ^= 0x33C7;
-        pkt.command ^= 0x032A;
+    //post whatever's been batched up as one binary message
+    void crc_impl::flush() {
+        if(d_batch.empty()) return;
 
-        return pkt;
+        size_t len = d_batch.size() * sizeof(smartnet_record);
+        gr::message::sptr msg = gr::message::make(0, d_batch.size(), CTRL_MSG_SMARTNET, len);
+        memcpy(msg->msg(), &d_batch[0], len);
+        d_queue->handle(msg);
+        d_batch.clear();
     }
 
     int
@@ -137,50 +98,44 @@ namespace gr {
                 gr_vector_const_void_star &input_items,
                 gr_vector_void_star &output_items)
     {
-        const char *in = (const char*) input_items[0];
-
-        int size = noutput_items - 76;
-        if(size <= 0) {
-            return 0; //better luck next time
-        }
-
-        uint64_t abs_sample_cnt = nitems_read(0);
-        std::vector<gr::tag_t> frame_tags;
-
-        get_tags_in_range(frame_tags, 0, abs_sample_cnt, abs_sample_cnt + size, pmt::string_to_symbol("smartnet_frame"));
-        if(frame_tags.size() == 0) {
-            return 0; //sad trombone
-        }
-
-        std::vector<gr::tag_t>::iterator tag_iter;
-        for(tag_iter = frame_tags.begin(); tag_iter != frame_tags.end(); tag_iter++) {
-            uint64_t mark = tag_iter->offset - abs_sample_cnt;
-            if(VERBOSE) std::cout << "found a frame at " << mark << std::endl;
-
-            char databits[38];
-            smartnet_ecc(databits, &in[mark]);
-            bool crc_ok = crc(databits);
-
-            if(VERBOSE) {
-                for(int j=0; j<38;j++) {
-                    std::cout << int(databits[j]);
-                } std::cout << std::endl;
-            }
-
-            if(crc_ok) {
+        const smartnet_frame *in = (const smartnet_frame *) input_items[0];
+        const double now = ctrl_msg_now();
+        int ncorrected = 0, nbits = 0, npass = 0;
+
+        for(int i = 0; i < noutput_items; i++) {
+            int nfixed;
+            uint64_t databits = smartnet_ecc(in[i], nfixed);
+            if(VERBOSE && nfixed) std::cout << "I just flipped " << nfixed << " bits!" << std::endl;
+            if(nfixed) ncorrected++;
+            nbits += nfixed;
+
+            if(d_crc_table.check(databits)) {
+                npass++;
                 if(VERBOSE) std::cout << "CRC OK" << std::endl;
                 //parse the message into readable chunks
-                smartnet_packet pkt = parse(databits);
-
-            //and throw it at the msgq
-            std::ostringstream payload;
-            payload.str("");
-            payload << pkt.address << "," << pkt.groupflag << "," << pkt.command;
-            gr::message::sptr msg = gr::message::make_from_string(std::string(payload.str()));
-            d_queue->handle(msg);
+                smartnet_packet pkt = smartnet_parse(databits);
+
+                //and batch it up for the msgq
+                smartnet_record rec;
+                memset(&rec, 0, sizeof(rec));
+                rec.offset = in[i].offset;
+                rec.sample = in[i].sample;
+                rec.address = pkt.address;
+                rec.command = pkt.command;
+                rec.groupflag = pkt.groupflag;
+                rec.emitted = now;
+                d_batch.push_back(rec);
+                if(d_batch.size() >= d_max_batch) flush();
             } else if (VERBOSE) std::cout << "CRC FAILED" << std::endl;
         }
-        return size;
+        flush();
+
+        d_num_frames.add(noutput_items);
+        d_num_corrected.add(ncorrected);
+        d_num_bits_corrected.add(nbits);
+        d_num_crc_pass.add(npass);
+        d_num_crc_fail.add(noutput_items - npass);
+        return noutput_items;
     }
 
   } /* namespace scanner */
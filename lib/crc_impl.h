@@ -23,29 +23,45 @@
 
 #include <gnuradio/tags.h>
 #include <scanner/crc.h>
+#include <scanner/ctrl_msg.h>
+#include <vector>
+#include "smartnet_bits.h"
+#include "health_stats.h"
 
 namespace gr {
   namespace scanner {
-    struct smartnet_packet {
-        bool groupflag;
-        unsigned int command;
-        unsigned int address;
-        unsigned int crc;
-    };
-
     class crc_impl : public crc
     {
      private:
-        void smartnet_ecc(char *out, const char *in);
-        bool crc(const char *in);
-        smartnet_packet parse(const char *in);
+        void flush();
+        void publish_stats();
 
+        smartnet_crc_table d_crc_table;
         gr::msg_queue::sptr d_queue;
+        unsigned int d_max_batch;
+        std::vector<smartnet_record> d_batch;
+
+        double d_stats_interval;
+        health_counter d_num_frames;
+        health_counter d_num_corrected;
+        health_counter d_num_bits_corrected;
+        health_counter d_num_crc_pass;
+        health_counter d_num_crc_fail;
+        health_reporter d_reporter; //last, so its thread is stopped before the rest goes
 
      public:
-      crc_impl(gr::msg_queue::sptr queue);
+      crc_impl(gr::msg_queue::sptr queue, int max_batch, double stats_interval);
       ~crc_impl();
 
+      uint64_t num_frames() const { return d_num_frames.get(); }
+      uint64_t num_corrected() const { return d_num_corrected.get(); }
+      uint64_t num_bits_corrected() const { return d_num_bits_corrected.get(); }
+      uint64_t num_crc_pass() const { return d_num_crc_pass.get(); }
+      uint64_t num_crc_fail() const { return d_num_crc_fail.get(); }
+
+      bool start();
+      bool stop();
+
       // Where all the action really happens
       int work(int noutput_items,
             gr_vector_const_void_star &input_items,
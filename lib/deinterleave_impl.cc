@@ -25,6 +25,7 @@
 #include <gnuradio/io_signature.h>
 #include <gnuradio/tags.h>
 #include "deinterleave_impl.h"
+#include "smartnet_bits.h"
 
 #define VERBOSE 0
 
@@ -44,10 +45,9 @@ namespace gr {
     deinterleave_impl::deinterleave_impl()
       : gr::block("deinterleave",
               gr::io_signature::make(1, 1, sizeof(char)),
-              gr::io_signature::make(1, 1, sizeof(char)))
+              gr::io_signature::make(1, 1, sizeof(smartnet_frame)))
     {
-        set_relative_rate((double)(76.0/84.0));
-        set_output_multiple(76*2);
+        set_relative_rate(1.0/84.0);
     }
 
     /*
@@ -60,9 +60,8 @@ namespace gr {
     void
     deinterleave_impl::forecast (int noutput_items, gr_vector_int &ninput_items_required)
     {
-        /* <+forecast+> e.g. ninput_items_required[0] = noutput_items */
-        int size = (noutput_items * 84) / 76;
-        ninput_items_required[0] = size;
+        //one frame per 84-bit preamble+OSW, plus room to see the last one
+        ninput_items_required[0] = (noutput_items + 1) * 84;
     }
 
     int
@@ -72,7 +71,7 @@ namespace gr {
                        gr_vector_void_star &output_items)
     {
         const char *in = (const char *) input_items[0];
-        char *out = (char *) output_items[0];
+        smartnet_frame *out = (smartnet_frame *) output_items[0];
 
         int size = ninput_items[0] - 84;
         if(size <= 0) {
@@ -83,38 +82,43 @@ namespace gr {
         uint64_t abs_sample_cnt = nitems_read(0);
         std::vector<gr::tag_t> preamble_tags;
 
-        uint64_t outlen = 0; //output sample count
+        int outlen = 0; //output frame count
+        int consumed = size;
 
         get_tags_in_range(preamble_tags, 0, abs_sample_cnt, abs_sample_cnt + size, pmt::string_to_symbol("smartnet_preamble"));
-        if(preamble_tags.size() == 0) {
-            consume_each(size);
-            return 0;
-        }
+
+        std::vector<gr::tag_t> sample_tags;
+        get_tags_in_range(sample_tags, 0, abs_sample_cnt, abs_sample_cnt + size, sample_clock::key());
+        d_clock.set_tags(sample_tags);
 
         std::vector<gr::tag_t>::iterator tag_iter;
         for(tag_iter = preamble_tags.begin(); tag_iter != preamble_tags.end(); tag_iter++) {
             uint64_t mark = tag_iter->offset - abs_sample_cnt;
 
+            if(outlen == noutput_items) {
+                consumed = mark; //out of room, pick up from this one next time
+                break;
+            }
+
             if(VERBOSE) std::cout << "found a preamble at " << tag_iter->offset << std::endl;
 
-            for(int k=0; k<76/4; k++) {
-                for(int l=0; l<4; l++) {
-                out[k*4 + l] = in[mark + k + l*19];
-                }
-            }
+            out[outlen] = smartnet_deinterleave(&in[mark]);
+            out[outlen].offset = tag_iter->offset;
+            out[outlen].sample = d_clock.sample_at(tag_iter->offset);
 
             //since you're a nonsynchronized block, you have to reissue a
             //tag with the correct output sample number
             add_item_tag(0, //stream ID
                     nitems_written(0) + outlen, //sample
                     pmt::string_to_symbol("smartnet_frame"), //key
-                    pmt::pmt_t() //data (unused here)
+                    pmt::from_uint64(tag_iter->offset) //data: preamble offset in the bit stream
                     );
-            outlen += 76;
+            outlen++;
         }
 
-        consume_each(preamble_tags.back().offset - abs_sample_cnt + 84);
-        if(VERBOSE) std::cout << "consumed " << (preamble_tags.back().offset - abs_sample_cnt + 84) << ", produced " << outlen << std::endl;
+        d_clock.advance(abs_sample_cnt + consumed);
+        consume_each(consumed);
+        if(VERBOSE) std::cout << "consumed " << consumed << ", produced " << outlen << std::endl;
         return outlen;
     }
 
@@ -22,6 +22,7 @@
 #define INCLUDED_SCANNER_DEINTERLEAVE_IMPL_H
 
 #include <scanner/deinterleave.h>
+#include "sample_clock.h"
 
 namespace gr {
   namespace scanner {
@@ -29,7 +30,7 @@ namespace gr {
     class deinterleave_impl : public deinterleave
     {
      private:
-      // Nothing to declare in this block.
+      sample_clock d_clock;
 
      public:
       deinterleave_impl();
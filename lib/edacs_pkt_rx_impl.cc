@@ -25,6 +25,7 @@
 #include <gnuradio/io_signature.h>
 #include <gnuradio/msg_queue.h>
 #include <gnuradio/tags.h>
+#include <cstring>
 #include "edacs_pkt_rx_impl.h"
 
 #define DEBUG 1
@@ -33,22 +34,26 @@ namespace gr {
   namespace scanner {
 
     edacs_pkt_rx::sptr
-    edacs_pkt_rx::make(gr::msg_queue::sptr queue)
+    edacs_pkt_rx::make(gr::msg_queue::sptr queue, int max_batch, double stats_interval)
     {
       return gnuradio::get_initial_sptr
-        (new edacs_pkt_rx_impl(queue));
+        (new edacs_pkt_rx_impl(queue, max_batch, stats_interval));
     }
 
     /*
      * The private constructor
      */
-    edacs_pkt_rx_impl::edacs_pkt_rx_impl(gr::msg_queue::sptr queue)
+    edacs_pkt_rx_impl::edacs_pkt_rx_impl(gr::msg_queue::sptr queue, int max_batch, double stats_interval)
       : gr::sync_block("edacs_pkt_rx",
               gr::io_signature::make(1, 1, sizeof(char)),
               gr::io_signature::make(0, 0, 0)),
-        d_queue(queue)
+        d_queue(queue),
+        d_max_batch((max_batch > 0) ? max_batch : 1),
+        d_stats_interval(stats_interval)
     {
         set_output_multiple(288*2);
+        d_batch.reserve(d_max_batch);
+        message_port_register_out(pmt::mp("stats"));
     }
 
     /*
@@ -58,13 +63,64 @@ namespace gr {
     {
     }
 
-    static bool crc(uint64_t pkt) {
-        //extract data from checksum
-        uint16_t checksum = pkt | 0xFFF;
-        uint64_t data = pkt >> 12;
-        uint16_t poly = 0x7D7;
+    /*
+     * CRC-12, poly 0x7D7, MSB first over the 28 data bits, compared
+     * against the low 12 bits of the packet. A zero initial value means
+     * leading zeros don't change the CRC, so the data goes through the
+     * byte table as four bytes with the top nibble zeroed.
+     */
+    edacs_crc_table::edacs_crc_table()
+    {
+        for(int v = 0; v < 256; v++) {
+            uint16_t crc = v << 4;
+            for(int b = 0; b < 8; b++) {
+                crc = (crc & 0x800) ? ((crc << 1) ^ 0x7D7) : (crc << 1);
+            }
+            d_table[v] = crc & 0xFFF;
+        }
+    }
+
+    bool edacs_crc_table::check(uint64_t pkt) const
+    {
+        uint16_t checksum = pkt & 0xFFF;
+        uint32_t data = (pkt >> 12) & 0xFFFFFFF;
         uint16_t crc = 0;
-        return 1; //TODO HALP
+        for(int shift = 24; shift >= 0; shift -= 8) {
+            crc = ((crc << 8) & 0xFFF) ^ d_table[((crc >> 4) ^ (data >> shift)) & 0xFF];
+        }
+        return (crc == checksum);
+    }
+
+    bool edacs_pkt_rx_impl::start() {
+        d_reporter.start(d_stats_interval, boost::bind(&edacs_pkt_rx_impl::publish_stats, this));
+        return true;
+    }
+
+    bool edacs_pkt_rx_impl::stop() {
+        d_reporter.stop();
+        return true;
+    }
+
+    void edacs_pkt_rx_impl::publish_stats() {
+        pmt::pmt_t stats = pmt::make_dict();
+        stats = pmt::dict_add(stats, pmt::mp("time"), pmt::from_double(ctrl_msg_now()));
+        stats = pmt::dict_add(stats, pmt::mp("frames"), pmt::from_uint64(num_frames()));
+        stats = pmt::dict_add(stats, pmt::mp("clean"), pmt::from_uint64(num_clean()));
+        stats = pmt::dict_add(stats, pmt::mp("matched"), pmt::from_uint64(num_matched()));
+        stats = pmt::dict_add(stats, pmt::mp("voted"), pmt::from_uint64(num_voted()));
+        stats = pmt::dict_add(stats, pmt::mp("crc_fail"), pmt::from_uint64(num_crc_fail()));
+        message_port_pub(pmt::mp("stats"), stats);
+    }
+
+    //post whatever's been batched up as one binary message
+    void edacs_pkt_rx_impl::flush() {
+        if(d_batch.empty()) return;
+
+        size_t len = d_batch.size() * sizeof(edacs_record);
+        gr::message::sptr msg = gr::message::make(0, d_batch.size(), CTRL_MSG_EDACS, len);
+        memcpy(msg->msg(), &d_batch[0], len);
+        d_queue->handle(msg);
+        d_batch.clear();
     }
 
     int
@@ -80,11 +136,20 @@ namespace gr {
         std::vector<gr::tag_t> preamble_tags;
         uint64_t abs_sample_cnt = nitems_read(0);
         get_tags_in_range(preamble_tags, 0, abs_sample_cnt, abs_sample_cnt + nitems, pmt::string_to_symbol("edacs_preamble"));
-        if(preamble_tags.size() == 0) return nitems; //sad trombone
+        std::vector<gr::tag_t> sample_tags;
+        get_tags_in_range(sample_tags, 0, abs_sample_cnt, abs_sample_cnt + nitems, sample_clock::key());
+        d_clock.set_tags(sample_tags);
+        if(preamble_tags.size() == 0) {
+            d_clock.advance(abs_sample_cnt + uint64_t(nitems));
+            return nitems; //sad trombone
+        }
+        const double now = ctrl_msg_now();
+        int nclean = 0, nmatched = 0, nvoted = 0, nfail = 0;
         std::vector<gr::tag_t>::iterator tag_iter;
         for(tag_iter = preamble_tags.begin(); tag_iter != preamble_tags.end(); tag_iter++) {
             uint64_t i = tag_iter->offset - abs_sample_cnt; //48 is the preamble length
-            assert(i < abs_sample_count + noutput_items); //just to be safe
+            const uint64_t sample = d_clock.sample_at(tag_iter->offset);
+            assert(i < uint64_t(noutput_items)); //just to be safe
             //EDACS packets are weird.
             //First of all, there's two packets per block.
             //Secondly, there are three 40-bit copies to each packet.
@@ -95,33 +160,46 @@ namespace gr {
                 for(int k=0; k<3; k++) {
                     for(int j=0; j<40; j++) {
                         pkts[l][k] <<= 1;
-                        pkts[l][k] |= in[i++];
+                        pkts[l][k] |= (in[i++] & 0x01);
                     }
                 }
                 //invert the second one
-                pkts[l][1] ^= uint64_t(0xFFFFFFFFFF);
-                //compare them all
-                bool ok12 = (pkts[l][0] == pkts[l][1]);
-                bool ok23 = (pkts[l][1] == pkts[l][2]);
-                bool ok13 = (pkts[l][0] == pkts[l][2]);
-                //we just want two of the same in order to call it good.
-                if(not (ok12 or ok23 or ok13)) continue; //garbage
-                uint64_t ok = (ok12 or ok13) ? pkts[l][0] : pkts[l][2];
+                const uint64_t a = pkts[l][0];
+                const uint64_t b = pkts[l][1] ^ uint64_t(0xFFFFFFFFFF);
+                const uint64_t c = pkts[l][2];
+                //bitwise 2-of-3 vote. if two copies match this is just
+                //that copy, but it also recovers packets where every
+                //copy took a hit, as long as no bit is bad in two of them.
+                uint64_t ok = (a & b) | (a & c) | (b & c);
                 //now check CRC
-                if(not crc(ok)) continue;
-                //now push that message out the queue.
-//                pmt::pmt_t p = pmt::mp(ok);
-
-                std::stringstream payload;
-                payload.str("");
-                payload << std::hex << ok;
-                gr::message::sptr msg = gr::message::make_from_string(std::string(payload.str()));
-                d_queue->handle(msg);
+                if(not d_crc_table.check(ok)) {
+                    nfail++;
+                    continue;
+                }
+                if(a == b and b == c) nclean++;
+                else if(a == b or b == c or a == c) nmatched++;
+                else nvoted++;
+                //now batch it up for the msgq
+                edacs_record rec;
+                rec.offset = tag_iter->offset;
+                rec.pkt = ok;
+                rec.emitted = now;
+                rec.sample = sample;
+                d_batch.push_back(rec);
+                if(d_batch.size() >= d_max_batch) flush();
             }
         }
+        flush();
+
+        d_num_frames.add(preamble_tags.size());
+        d_num_clean.add(nclean);
+        d_num_matched.add(nmatched);
+        d_num_voted.add(nvoted);
+        d_num_crc_fail.add(nfail);
+        d_clock.advance(abs_sample_cnt + uint64_t(nitems));
 
-        // Tell runtime system how many output items we produced.
-        return noutput_items;
+        //only preambles before nitems have been looked at, leave the rest for next time
+        return nitems;
     }
 
   } /* namespace scanner */
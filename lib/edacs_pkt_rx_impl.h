@@ -22,18 +22,55 @@
 #define INCLUDED_SCANNER_EDACS_PKT_RX_IMPL_H
 
 #include <scanner/edacs_pkt_rx.h>
+#include <scanner/ctrl_msg.h>
+#include <vector>
+#include "health_stats.h"
+#include "sample_clock.h"
 
 namespace gr {
   namespace scanner {
 
+    class edacs_crc_table
+    {
+     public:
+        edacs_crc_table();
+        bool check(uint64_t pkt) const;
+     private:
+        uint16_t d_table[256];
+    };
+
     class edacs_pkt_rx_impl : public edacs_pkt_rx
     {
      private:
+        void flush();
+        void publish_stats();
+
+        edacs_crc_table d_crc_table;
+        sample_clock d_clock;
         gr::msg_queue::sptr d_queue;
+        unsigned int d_max_batch;
+        std::vector<edacs_record> d_batch;
+
+        double d_stats_interval;
+        health_counter d_num_frames;
+        health_counter d_num_clean;
+        health_counter d_num_matched;
+        health_counter d_num_voted;
+        health_counter d_num_crc_fail;
+        health_reporter d_reporter; //last, so its thread is stopped before the rest goes
      public:
-      edacs_pkt_rx_impl(gr::msg_queue::sptr queue);
+      edacs_pkt_rx_impl(gr::msg_queue::sptr queue, int max_batch, double stats_interval);
       ~edacs_pkt_rx_impl();
 
+      uint64_t num_frames() const { return d_num_frames.get(); }
+      uint64_t num_clean() const { return d_num_clean.get(); }
+      uint64_t num_matched() const { return d_num_matched.get(); }
+      uint64_t num_voted() const { return d_num_voted.get(); }
+      uint64_t num_crc_fail() const { return d_num_crc_fail.get(); }
+
+      bool start();
+      bool stop();
+
       // Where all the action really happens
       int work(int noutput_items,
 	       gr_vector_const_void_star &input_items,
@@ -0,0 +1,94 @@
+/* -*- c++ -*- */
+/*
+ * Copyright 2013 Nick Foster
+ *
+ * This is free software; you can redistribute it and/or modify
+ * it under the terms of the GNU General Public License as published by
+ * the Free Software Foundation; either version 3, or (at your option)
+ * any later version.
+ *
+ * This software is distributed in the hope that it will be useful,
+ * but WITHOUT ANY WARRANTY; without even the implied warranty of
+ * MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+ * GNU General Public License for more details.
+ *
+ * You should have received a copy of the GNU General Public License
+ * along with this software; see the file COPYING.  If not, write to
+ * the Free Software Foundation, Inc., 51 Franklin Street,
+ * Boston, MA 02110-1301, USA.
+ */
+
+#ifndef INCLUDED_SCANNER_HEALTH_STATS_H
+#define INCLUDED_SCANNER_HEALTH_STATS_H
+
+/*
+ * Decoder health counters.
+ * The work thread adds to the counters once per work call, and anything
+ * can read them at any time without a lock. A reporter thread calls back
+ * every so often to publish them, and keeps doing so when no input is
+ * arriving at all, since a dead control channel is exactly what we
+ * want to hear about.
+ */
+
+#include <stdint.h>
+#include <gnuradio/thread/thread.h>
+#include <boost/bind.hpp>
+#include <boost/function.hpp>
+#include <boost/shared_ptr.hpp>
+
+namespace gr {
+  namespace scanner {
+
+    class health_counter
+    {
+    public:
+        health_counter() : d_count(0) {}
+
+        void add(uint64_t n) {
+            if(n) __sync_fetch_and_add(&d_count, n);
+        }
+
+        uint64_t get() const {
+            return __sync_add_and_fetch(const_cast<volatile uint64_t *>(&d_count), 0);
+        }
+
+    private:
+        volatile uint64_t d_count;
+    };
+
+    class health_reporter
+    {
+    public:
+        ~health_reporter() { stop(); }
+
+        //call report every interval seconds until stop(), or never if interval <= 0
+        void start(double interval, boost::function<void ()> report) {
+            if(interval <= 0 || d_thread) return;
+            d_thread.reset(new gr::thread::thread(boost::bind(&health_reporter::run, interval, report)));
+        }
+
+        void stop() {
+            if(!d_thread) return;
+            d_thread->interrupt();
+            d_thread->join();
+            d_thread.reset();
+        }
+
+    private:
+        static void run(double interval, boost::function<void ()> report) {
+            try {
+                while(true) {
+                    boost::this_thread::sleep(boost::posix_time::microseconds(long(interval * 1e6)));
+                    report();
+                }
+            }
+            catch(boost::thread_interrupted &) {}
+        }
+
+        boost::shared_ptr<gr::thread::thread> d_thread;
+    };
+
+  } // namespace scanner
+} // namespace gr
+
+#endif /* INCLUDED_SCANNER_HEALTH_STATS_H */
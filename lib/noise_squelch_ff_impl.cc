@@ -0,0 +1,119 @@
+/* -*- c++ -*- */
+/*
+ * Copyright 2013 Nick Foster
+ *
+ * This is free software; you can redistribute it and/or modify
+ * it under the terms of the GNU General Public License as published by
+ * the Free Software Foundation; either version 3, or (at your option)
+ * any later version.
+ *
+ * This software is distributed in the hope that it will be useful,
+ * but WITHOUT ANY WARRANTY; without even the implied warranty of
+ * MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+ * GNU General Public License for more details.
+ *
+ * You should have received a copy of the GNU General Public License
+ * along with this software; see the file COPYING.  If not, write to
+ * the Free Software Foundation, Inc., 51 Franklin Street,
+ * Boston, MA 02110-1301, USA.
+ */
+
+#ifdef HAVE_CONFIG_H
+#include "config.h"
+#endif
+
+#include <gnuradio/io_signature.h>
+#include <cmath>
+#include <algorithm>
+#include "noise_squelch_ff_impl.h"
+
+namespace gr {
+  namespace scanner {
+
+    //fixed coeffs, Chebyshev type 2 LPF=[0, 0.4, 0.7], HPF=[0.4, 0.7, 1]
+    static const double low_b[4] = {0.12260106307699403, -0.22058023529806434, 0.22058023529806436, -0.12260106307699434};
+    static const double low_a[4] = {1.00000000000000000, 0.7589332900264623, 0.5162740252200005, 0.07097813844342238};
+    static const double hi_b[4] = {0.1913118666668073, 0.4406071020350289, 0.4406071020350288, 0.19131186666680736};
+    static const double hi_a[4] = {1.000000000000000000, -0.11503633296078866, 0.3769676347066441, 0.0019066356578167866};
+
+    //gate drops samples under -100dB, pwr_squelch_ff(-100, ...)'s floor
+    static const float gate_floor = 1e-10;
+
+    squelch_iir::squelch_iir(const double *b, const double *a)
+    {
+        for(int k = 0; k < 4; k++) {
+            d_b[k] = b[k];
+            d_a[k] = a[k];
+        }
+        for(int k = 0; k < 3; k++) d_x[k] = d_y[k] = 0;
+    }
+
+    noise_squelch_ff::sptr
+    noise_squelch_ff::make(double alpha, float threshold_db, bool gate)
+    {
+      return gnuradio::get_initial_sptr
+        (new noise_squelch_ff_impl(alpha, threshold_db, gate));
+    }
+
+    /*
+     * The private constructor
+     */
+    noise_squelch_ff_impl::noise_squelch_ff_impl(double alpha, float threshold_db, bool gate)
+      : gr::block("noise_squelch_ff",
+              gr::io_signature::make(1, 1, sizeof(float)),
+              gr::io_signature::make(1, 1, sizeof(float))),
+        d_low(low_b, low_a),
+        d_hi(hi_b, hi_a),
+        d_alpha(alpha),
+        d_low_pwr(0), d_hi_pwr(0), d_envelope(0),
+        d_gate(gate),
+        d_open(false)
+    {
+        set_threshold(threshold_db);
+    }
+
+    /*
+     * Our virtual destructor.
+     */
+    noise_squelch_ff_impl::~noise_squelch_ff_impl()
+    {
+    }
+
+    void noise_squelch_ff_impl::set_threshold(float threshold_db) {
+        //inverted thresholds because the ratio is noise over signal
+        d_thresh_hi = 1/std::pow(10.0, threshold_db/10.);
+        d_thresh_lo = 1/std::pow(10.0, (threshold_db+1)/10.);
+    }
+
+    int
+    noise_squelch_ff_impl::general_work(int noutput_items,
+                       gr_vector_int &ninput_items,
+                       gr_vector_const_void_star &input_items,
+                       gr_vector_void_star &output_items)
+    {
+        const float *in = (const float *) input_items[0];
+        float *out = (float *) output_items[0];
+        int ninput = std::min(ninput_items[0], noutput_items);
+        int j = 0;
+
+        for(int i = 0; i < ninput; i++) {
+            double low = d_low.filter(in[i]);
+            double hi = d_hi.filter(in[i]);
+            d_low_pwr = d_alpha*low*low + (1-d_alpha)*d_low_pwr;
+            d_hi_pwr = d_alpha*hi*hi + (1-d_alpha)*d_hi_pwr;
+
+            float ratio = d_low_pwr / d_hi_pwr;
+            if(ratio > d_thresh_hi) d_open = true;
+            else if(ratio < d_thresh_lo) d_open = false;
+            d_envelope = d_alpha*(d_open ? 1.0 : 0.0) + (1-d_alpha)*d_envelope;
+
+            float sample = in[i] * float(d_envelope);
+            if(!d_gate || sample*sample >= gate_floor) out[j++] = sample;
+        }
+
+        consume_each(ninput);
+        return j;
+    }
+
+  } /* namespace scanner */
+} /* namespace gr */
@@ -0,0 +1,78 @@
+/* -*- c++ -*- */
+/*
+ * Copyright 2013 Nick Foster
+ *
+ * This is free software; you can redistribute it and/or modify
+ * it under the terms of the GNU General Public License as published by
+ * the Free Software Foundation; either version 3, or (at your option)
+ * any later version.
+ *
+ * This software is distributed in the hope that it will be useful,
+ * but WITHOUT ANY WARRANTY; without even the implied warranty of
+ * MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+ * GNU General Public License for more details.
+ *
+ * You should have received a copy of the GNU General Public License
+ * along with this software; see the file COPYING.  If not, write to
+ * the Free Software Foundation, Inc., 51 Franklin Street,
+ * Boston, MA 02110-1301, USA.
+ */
+
+#ifndef INCLUDED_SCANNER_NOISE_SQUELCH_FF_IMPL_H
+#define INCLUDED_SCANNER_NOISE_SQUELCH_FF_IMPL_H
+
+#include <scanner/noise_squelch_ff.h>
+
+namespace gr {
+  namespace scanner {
+
+    //3rd order IIR, direct form I with double taps and state like iir_filter_ffd
+    class squelch_iir
+    {
+     public:
+      squelch_iir(const double *b, const double *a);
+      double filter(double x) {
+          double y = d_b[0]*x + d_b[1]*d_x[0] + d_b[2]*d_x[1] + d_b[3]*d_x[2]
+                   - d_a[1]*d_y[0] - d_a[2]*d_y[1] - d_a[3]*d_y[2];
+          d_x[2] = d_x[1]; d_x[1] = d_x[0]; d_x[0] = x;
+          d_y[2] = d_y[1]; d_y[1] = d_y[0]; d_y[0] = y;
+          return y;
+      }
+     private:
+      double d_b[4], d_a[4];
+      double d_x[3], d_y[3];
+    };
+
+    class noise_squelch_ff_impl : public noise_squelch_ff
+    {
+     private:
+      squelch_iir d_low, d_hi;
+      double d_alpha;
+      double d_low_pwr, d_hi_pwr, d_envelope;
+      float d_thresh_hi, d_thresh_lo;
+      bool d_gate;
+      bool d_open;
+
+     public:
+      noise_squelch_ff_impl(double alpha, float threshold_db, bool gate);
+      ~noise_squelch_ff_impl();
+
+      void set_alpha(double alpha) { d_alpha = alpha; }
+      double alpha() const { return d_alpha; }
+      void set_threshold(float threshold_db);
+      float threshold() const { return d_thresh_hi; }
+      void set_gate(bool gate) { d_gate = gate; }
+      bool gate() const { return d_gate; }
+      bool is_open() const { return d_open; }
+
+      // Where all the action really happens
+      int general_work(int noutput_items,
+		       gr_vector_int &ninput_items,
+		       gr_vector_const_void_star &input_items,
+		       gr_vector_void_star &output_items);
+    };
+
+  } // namespace scanner
+} // namespace gr
+
+#endif /* INCLUDED_SCANNER_NOISE_SQUELCH_FF_IMPL_H */
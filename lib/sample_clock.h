@@ -0,0 +1,87 @@
+/* -*- c++ -*- */
+/*
+ * Copyright 2013 Nick Foster
+ *
+ * This is free software; you can redistribute it and/or modify
+ * it under the terms of the GNU General Public License as published by
+ * the Free Software Foundation; either version 3, or (at your option)
+ * any later version.
+ *
+ * This software is distributed in the hope that it will be useful,
+ * but WITHOUT ANY WARRANTY; without even the implied warranty of
+ * MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+ * GNU General Public License for more details.
+ *
+ * You should have received a copy of the GNU General Public License
+ * along with this software; see the file COPYING.  If not, write to
+ * the Free Software Foundation, Inc., 51 Franklin Street,
+ * Boston, MA 02110-1301, USA.
+ */
+
+#ifndef INCLUDED_SCANNER_SAMPLE_CLOCK_H
+#define INCLUDED_SCANNER_SAMPLE_CLOCK_H
+
+/*
+ * Maps bit stream offsets back to demodulator input samples.
+ * fsk_demod tags its input every so often with "sample": a tuple of the
+ * input sample the tagged item came from (less the demod's filter delay)
+ * and the input samples per bit. The tags ride through the resamplers
+ * and clock recovery and land on the bits, so a bit's input sample is
+ * the latest tag's plus the bits since then times samples per bit, which
+ * doesn't drift the way counting bits from the start of the stream does.
+ */
+
+#include <gnuradio/tags.h>
+#include <pmt/pmt.h>
+#include <scanner/ctrl_msg.h>
+#include <algorithm>
+#include <cmath>
+#include <vector>
+
+namespace gr {
+  namespace scanner {
+
+    class sample_clock {
+     public:
+      sample_clock() : d_offset(0), d_sample(SAMPLE_UNKNOWN), d_sps(0), d_next(0) {}
+
+      static pmt::pmt_t key() { return pmt::string_to_symbol("sample"); }
+
+      //the "sample" tags in the range the block's about to work on
+      void set_tags(const std::vector<gr::tag_t> &tags) {
+          d_tags = tags;
+          std::sort(d_tags.begin(), d_tags.end(), gr::tag_t::offset_compare);
+          d_next = 0;
+      }
+
+      //takes in the tags before until, which must not go backwards between calls.
+      //Call with the end of what was consumed before returning, so none get skipped.
+      void advance(uint64_t until) {
+          for(; d_next < d_tags.size() && d_tags[d_next].offset < until; d_next++) {
+              const pmt::pmt_t &value = d_tags[d_next].value;
+              if(!pmt::is_tuple(value) || pmt::length(value) != 2) continue;
+              d_offset = d_tags[d_next].offset;
+              d_sample = pmt::to_uint64(pmt::tuple_ref(value, 0));
+              d_sps = pmt::to_double(pmt::tuple_ref(value, 1));
+          }
+      }
+
+      //input sample of bit offset, SAMPLE_UNKNOWN if no tag's been seen yet
+      uint64_t sample_at(uint64_t offset) {
+          advance(offset + 1);
+          if(d_sample == SAMPLE_UNKNOWN) return SAMPLE_UNKNOWN;
+          return d_sample + uint64_t(std::floor((offset - d_offset) * d_sps + 0.5));
+      }
+
+     private:
+      uint64_t d_offset; //bit offset of the latest tag
+      uint64_t d_sample; //and its input sample
+      double d_sps;      //input samples per bit
+      std::vector<gr::tag_t> d_tags;
+      size_t d_next;
+    };
+
+  } // namespace scanner
+} // namespace gr
+
+#endif /* INCLUDED_SCANNER_SAMPLE_CLOCK_H */
@@ -0,0 +1,202 @@
+/* -*- c++ -*- */
+/*
+ * Copyright 2013 Nick Foster
+ *
+ * This is free software; you can redistribute it and/or modify
+ * it under the terms of the GNU General Public License as published by
+ * the Free Software Foundation; either version 3, or (at your option)
+ * any later version.
+ *
+ * This software is distributed in the hope that it will be useful,
+ * but WITHOUT ANY WARRANTY; without even the implied warranty of
+ * MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+ * GNU General Public License for more details.
+ *
+ * You should have received a copy of the GNU General Public License
+ * along with this software; see the file COPYING.  If not, write to
+ * the Free Software Foundation, Inc., 51 Franklin Street,
+ * Boston, MA 02110-1301, USA.
+ */
+
+#ifndef INCLUDED_SCANNER_SMARTNET_BITS_H
+#define INCLUDED_SCANNER_SMARTNET_BITS_H
+
+/*
+ * Smartnet OSW bit twiddling on packed words.
+ * Bits are packed first bit in the MSB, see scanner/smartnet_frame.h.
+ * No Gnuradio dependencies here so the benchmark can build standalone.
+ */
+
+#include <stdint.h>
+#include <scanner/smartnet_frame.h>
+
+namespace gr {
+  namespace scanner {
+
+    static const uint64_t SMARTNET_MASK38 = (uint64_t(1) << 38) - 1;
+
+    struct smartnet_packet {
+        bool groupflag;
+        unsigned int command;
+        unsigned int address;
+        unsigned int crc;
+    };
+
+    //spread the low 32 bits of x out to the even bit positions
+    static inline uint64_t smartnet_spread(uint64_t x) {
+        x &= 0xFFFFFFFF;
+        x = (x | (x << 16)) & 0x0000FFFF0000FFFFULL;
+        x = (x | (x << 8))  & 0x00FF00FF00FF00FFULL;
+        x = (x | (x << 4))  & 0x0F0F0F0F0F0F0F0FULL;
+        x = (x | (x << 2))  & 0x3333333333333333ULL;
+        x = (x | (x << 1))  & 0x5555555555555555ULL;
+        return x;
+    }
+
+    //pack n one-bit-per-byte bits, first bit in the MSB
+    static inline uint64_t smartnet_pack(const char *in, int n) {
+        uint64_t x = 0;
+        for(int i = 0; i < n; i++) x = (x << 1) | (in[i] & 0x01);
+        return x;
+    }
+
+    /*
+     * Deinterleave the 76 bits following a preamble.
+     * On the air the frame is sent as four rows of 19 bits, and frame
+     * bit 4k+l is bit k of row l. Even frame bits are data and odd are
+     * parity, so rows 0 and 2 interleave into the data word and rows 1
+     * and 3 into the parity word.
+     */
+    static inline smartnet_frame smartnet_deinterleave(const char *in) {
+        uint64_t rows[4];
+        for(int l = 0; l < 4; l++) rows[l] = smartnet_pack(&in[l*19], 19);
+
+        smartnet_frame frame;
+        frame.data = (smartnet_spread(rows[0]) << 1) | smartnet_spread(rows[2]);
+        frame.parity = (smartnet_spread(rows[1]) << 1) | smartnet_spread(rows[3]);
+        frame.offset = 0;
+        frame.sample = 0;
+        return frame;
+    }
+
+    /*
+     * Error-correct the data word.
+     * Parity bit k is data bit k ^ data bit k-1, so the syndrome is
+     * parity ^ data ^ (data shifted one bit later). A bad data bit
+     * shows up as two consecutive syndrome bits; flip it. nfixed gets
+     * the number of bits flipped.
+     */
+    static inline uint64_t smartnet_ecc(const smartnet_frame &frame, int &nfixed) {
+        uint64_t syndrome = (frame.parity ^ frame.data ^ (frame.data >> 1)) & SMARTNET_MASK38;
+        uint64_t flip = syndrome & (syndrome << 1) & SMARTNET_MASK38;
+        nfixed = __builtin_popcountll(flip);
+        return frame.data ^ flip;
+    }
+
+    /*
+     * Soft-decision decode of the 76 soft symbols following a preamble
+     * (positive for a 1), deinterleaving as above.
+     * The code is rate 1/2 with one bit of memory, so this is a two-state
+     * Viterbi decoder where the state is the previous data bit, starting
+     * from 0. Each branch scores the correlation of its data and parity
+     * bits with the soft symbols. The returned frame's parity is made
+     * consistent with its data, so smartnet_ecc() leaves it alone.
+     */
+    static inline smartnet_frame smartnet_soft_decode(const float *in) {
+        float d[38], p[38];
+        for(int k = 0; k < 19; k++) {
+            for(int l = 0; l < 4; l++) {
+                int j = 4*k + l;
+                if(j & 0x01) p[j >> 1] = in[l*19 + k];
+                else d[j >> 1] = in[l*19 + k];
+            }
+        }
+
+        //from0_* / from1_*: bits set where the survivor into state 0/1 came from state 1
+        float m0 = 0, m1 = -1e30f;
+        uint64_t from1_0 = 0, from1_1 = 0;
+        for(int k = 0; k < 38; k++) {
+            uint64_t bit = uint64_t(1) << (37-k);
+            float a0 = m0 - d[k] - p[k], a1 = m1 - d[k] + p[k]; //into state 0
+            float b0 = m0 + d[k] + p[k], b1 = m1 + d[k] - p[k]; //into state 1
+            if(a1 > a0) { from1_0 |= bit; a0 = a1; }
+            if(b1 > b0) { from1_1 |= bit; b0 = b1; }
+            m0 = a0;
+            m1 = b0;
+        }
+
+        uint64_t data = 0;
+        int state = (m1 > m0);
+        for(int k = 0; k < 38; k++) {
+            uint64_t bit = uint64_t(1) << k;
+            if(state) data |= bit;
+            state = ((state ? from1_1 : from1_0) & bit) ? 1 : 0;
+        }
+
+        smartnet_frame frame;
+        frame.data = data;
+        frame.parity = (data ^ (data >> 1)) & SMARTNET_MASK38;
+        frame.offset = 0;
+        frame.sample = 0;
+        return frame;
+    }
+
+    /*
+     * Table-driven CRC. Each of the first 27 data bits XORs a fixed
+     * value into the CRC register, so the XOR of those values is
+     * precomputed for every byte of the 27 bits.
+     */
+    class smartnet_crc_table
+    {
+    public:
+        smartnet_crc_table() {
+            unsigned int ops[27];
+            unsigned int crcop = 0x036E;
+            for(int j = 0; j < 27; j++) {
+                if(crcop & 0x01) crcop = (crcop >> 1) ^ 0x0225;
+                else crcop >>= 1;
+                ops[j] = crcop;
+            }
+            //byte n holds data bits 26-8n-7..26-8n, MSB first
+            for(int n = 0; n < 4; n++) {
+                for(int v = 0; v < 256; v++) {
+                    uint16_t accum = 0;
+                    for(int b = 0; b < 8; b++) {
+                        int j = 26 - (8*n + b);
+                        if(j >= 0 && (v >> b) & 0x01) accum ^= ops[j];
+                    }
+                    d_table[n][v] = accum;
+                }
+            }
+        }
+
+        //true if the CRC in the (corrected) data word checks out
+        bool check(uint64_t data) const {
+            uint32_t bits = data >> 11; //first 27 bits
+            unsigned int crcaccum = 0x0393 ^ d_table[0][bits & 0xFF]
+                                           ^ d_table[1][(bits >> 8) & 0xFF]
+                                           ^ d_table[2][(bits >> 16) & 0xFF]
+                                           ^ d_table[3][(bits >> 24) & 0xFF];
+            unsigned int crcgiven = (~data >> 1) & 0x3FF; //sent inverted
+            return (crcgiven == crcaccum);
+        }
+
+    private:
+        uint16_t d_table[4][256];
+    };
+
+    //everything's sent inverted, and XOR'd per the mottrunk.txt description
+    static inline smartnet_packet smartnet_parse(uint64_t data) {
+        uint64_t bits = ~data & SMARTNET_MASK38;
+        smartnet_packet pkt;
+        pkt.address = ((bits >> 22) & 0xFFFF) ^ 0x33C7;
+        pkt.groupflag = (bits >> 21) & 0x01;
+        pkt.command = ((bits >> 11) & 0x3FF) ^ 0x032A;
+        pkt.crc = (bits >> 1) & 0x3FF;
+        return pkt;
+    }
+
+  } // namespace scanner
+} // namespace gr
+
+#endif /* INCLUDED_SCANNER_SMARTNET_BITS_H */
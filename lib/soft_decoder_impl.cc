@@ -0,0 +1,117 @@
+/* -*- c++ -*- */
+/*
+ * Copyright 2013 Nick Foster
+ *
+ * This is free software; you can redistribute it and/or modify
+ * it under the terms of the GNU General Public License as published by
+ * the Free Software Foundation; either version 3, or (at your option)
+ * any later version.
+ *
+ * This software is distributed in the hope that it will be useful,
+ * but WITHOUT ANY WARRANTY; without even the implied warranty of
+ * MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+ * GNU General Public License for more details.
+ *
+ * You should have received a copy of the GNU General Public License
+ * along with this software; see the file COPYING.  If not, write to
+ * the Free Software Foundation, Inc., 51 Franklin Street,
+ * Boston, MA 02110-1301, USA.
+ */
+
+#ifdef HAVE_CONFIG_H
+#include "config.h"
+#endif
+
+#include <gnuradio/io_signature.h>
+#include <gnuradio/tags.h>
+#include <algorithm>
+#include "soft_decoder_impl.h"
+#include "smartnet_bits.h"
+
+namespace gr {
+  namespace scanner {
+
+    soft_decoder::sptr
+    soft_decoder::make()
+    {
+      return gnuradio::get_initial_sptr
+        (new soft_decoder_impl());
+    }
+
+    soft_decoder_impl::soft_decoder_impl()
+      : gr::block("soft_decoder",
+              gr::io_signature::make2(2, 2, sizeof(char), sizeof(float)),
+              gr::io_signature::make(1, 1, sizeof(smartnet_frame)))
+    {
+        set_relative_rate(1.0/84.0);
+    }
+
+    soft_decoder_impl::~soft_decoder_impl()
+    {
+    }
+
+    void
+    soft_decoder_impl::forecast (int noutput_items, gr_vector_int &ninput_items_required)
+    {
+        //same as deinterleave, on both streams
+        ninput_items_required[0] = (noutput_items + 1) * 84;
+        ninput_items_required[1] = (noutput_items + 1) * 84;
+    }
+
+    int
+    soft_decoder_impl::general_work (int noutput_items,
+                       gr_vector_int &ninput_items,
+                       gr_vector_const_void_star &input_items,
+                       gr_vector_void_star &output_items)
+    {
+        const float *soft = (const float *) input_items[1];
+        smartnet_frame *out = (smartnet_frame *) output_items[0];
+
+        //the streams are sample-aligned, so work on what both have
+        int size = std::min(ninput_items[0], ninput_items[1]) - 84;
+        if(size <= 0) {
+            consume_each(0);
+            return 0;
+        }
+
+        uint64_t abs_sample_cnt = nitems_read(0);
+        std::vector<gr::tag_t> preamble_tags;
+
+        int outlen = 0;
+        int consumed = size;
+
+        get_tags_in_range(preamble_tags, 0, abs_sample_cnt, abs_sample_cnt + size, pmt::string_to_symbol("smartnet_preamble"));
+
+        std::vector<gr::tag_t> sample_tags;
+        get_tags_in_range(sample_tags, 0, abs_sample_cnt, abs_sample_cnt + size, sample_clock::key());
+        d_clock.set_tags(sample_tags);
+
+        std::vector<gr::tag_t>::iterator tag_iter;
+        for(tag_iter = preamble_tags.begin(); tag_iter != preamble_tags.end(); tag_iter++) {
+            uint64_t mark = tag_iter->offset - abs_sample_cnt;
+
+            if(outlen == noutput_items) {
+                consumed = mark; //out of room, pick up from this one next time
+                break;
+            }
+
+            out[outlen] = smartnet_soft_decode(&soft[mark]);
+            out[outlen].offset = tag_iter->offset;
+            out[outlen].sample = d_clock.sample_at(tag_iter->offset);
+
+            add_item_tag(0,
+                    nitems_written(0) + outlen,
+                    pmt::string_to_symbol("smartnet_frame"),
+                    pmt::from_uint64(tag_iter->offset)
+                    );
+            outlen++;
+        }
+
+        d_clock.advance(abs_sample_cnt + consumed);
+        consume_each(consumed);
+        return outlen;
+    }
+
+  } /* namespace scanner */
+} /* namespace gr */
+
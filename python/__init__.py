@@ -23,38 +23,99 @@ This is the GNU Radio SCANNER module. Place your Python package
 description here (python/__init__.py).
 '''
 
-# ----------------------------------------------------------------
-# Temporary workaround for ticket:181 (swig+python problem)
+# Everything is loaded on first use, so a decode-only or replay run never
+# imports UHD, the sound card, the swig library or the protocol decoders
+# it doesn't touch. The package module is swapped for a lazy_module that
+# imports the submodule behind a name the first time it's looked up.
+
 import sys
-_RTLD_GLOBAL = 0
-try:
-    from dl import RTLD_GLOBAL as _RTLD_GLOBAL
-except ImportError:
+import types
+import importlib
+
+#public name: (submodule, attribute in it, or None for the submodule itself)
+_exports = {
+    "audio_path":         ("audio", "audio_path"),
+    "latency_stats":      ("latency", "latency_stats"),
+    "smartnet_ctrl_rx":   ("ctrl_chan", "smartnet_ctrl_rx"),
+    "edacs_ctrl_rx":      ("ctrl_chan", "edacs_ctrl_rx"),
+    "edacs_pkt":          ("edacs_parse", "edacs_pkt"),
+    "fsk_demod":          ("fsk_demod", "fsk_demod"),
+    "trunked_feed":       ("radio", "trunked_feed"),
+    "fm_demod":           ("radio", "fm_demod"),
+    "recorder":           ("recorder", "recorder"),
+    "recorder_pool":      ("recorder", "recorder_pool"),
+    "smartnet_decode":    ("smartnet_decode", None),
+    "waveform":           ("waveform", None),
+    "bandplan":           ("bandplan", "bandplan"),
+    "planner":            ("planner", None),
+    "perf_monitor":       ("perfstats", "perf_monitor"),
+    "preroll_buffer":     ("preroll", "preroll_buffer"),
+    "preroll_injector":   ("preroll", "preroll_injector"),
+    "settle_gate":        ("retune", "settle_gate"),
+    "retune_scheduler":   ("retune", "retune_scheduler"),
+    "capture":            ("capture", None),
+    "capture_source":     ("capture", "capture_source"),
+    "talkgroups":         ("talkgroups", None),
+    "talkgroup_db":       ("talkgroups", "talkgroup_db"),
+    "trunked_scanner":    ("trunked_scanner", "trunked_scanner"),
+    "standard_squelch_ff": ("standard_squelch_ff", "standard_squelch_ff"),
+}
+
+#the C++ blocks, for "from scanner import *"; anything else is looked up in swig on demand
+_swig_blocks = ["crc", "deinterleave", "edacs_pkt_rx", "invert", "noise_squelch_ff", "soft_decoder"]
+
+def _load_swig():
+    # ----------------------------------------------------------------
+    # Temporary workaround for ticket:181 (swig+python problem)
+    _RTLD_GLOBAL = 0
     try:
-	from DLFCN import RTLD_GLOBAL as _RTLD_GLOBAL
+        from dl import RTLD_GLOBAL as _RTLD_GLOBAL
     except ImportError:
-	pass
-
-if _RTLD_GLOBAL != 0:
-    _dlopenflags = sys.getdlopenflags()
-    sys.setdlopenflags(_dlopenflags|_RTLD_GLOBAL)
-# ----------------------------------------------------------------
-
-
-# import swig generated symbols into the smartnet namespace
-from scanner_swig import *
-
-# import any pure python here
-from audio import audio_path
-from ctrl_chan import smartnet_ctrl_rx, edacs_ctrl_rx
-from edacs_parse import edacs_pkt
-from fsk_demod import fsk_demod
-from radio import trunked_feed, fm_demod
-from trunked_scanner import trunked_scanner
-from standard_squelch_ff import standard_squelch_ff
-
-# ----------------------------------------------------------------
-# Tail of workaround
-if _RTLD_GLOBAL != 0:
-    sys.setdlopenflags(_dlopenflags)      # Restore original flags
-# ----------------------------------------------------------------
+        try:
+            from DLFCN import RTLD_GLOBAL as _RTLD_GLOBAL
+        except ImportError:
+            pass
+
+    if _RTLD_GLOBAL != 0:
+        _dlopenflags = sys.getdlopenflags()
+        sys.setdlopenflags(_dlopenflags|_RTLD_GLOBAL)
+    try:
+        return importlib.import_module(__name__ + ".scanner_swig")
+    finally:
+        # Tail of workaround
+        if _RTLD_GLOBAL != 0:
+            sys.setdlopenflags(_dlopenflags)      # Restore original flags
+    # ----------------------------------------------------------------
+
+class lazy_module(types.ModuleType):
+    def __getattr__(self, name):
+        if name.startswith("__"):
+            raise AttributeError(name)
+        if name in _exports:
+            module, attr = _exports[name]
+            value = importlib.import_module(self.__name__ + "." + module)
+            if attr is not None:
+                value = getattr(value, attr)
+            self._rebind()
+        else:
+            value = getattr(_load_swig(), name)
+        self.__dict__[name] = value
+        return value
+
+    def _rebind(self):
+        #importing a submodule binds it on the package, which Python 2 does
+        #straight into __dict__, and that import can pull in others. Where a
+        #class has its submodule's name (fsk_demod, bandplan...) the class wins.
+        for name, (module, attr) in _exports.items():
+            if attr is not None and isinstance(self.__dict__.get(name), types.ModuleType):
+                self.__dict__[name] = getattr(self.__dict__[name], attr)
+
+    def __dir__(self):
+        return sorted(set(self.__dict__) | set(_exports) | set(_swig_blocks))
+
+_lazy = lazy_module(__name__, __doc__)
+#Python 2 clears a module's globals when it's freed, and the functions here still use them
+_lazy._module = sys.modules[__name__]
+_lazy.__dict__.update(dict((k, v) for k, v in globals().items() if k not in ("types", "importlib", "sys")))
+_lazy.__all__ = sorted(_exports) + _swig_blocks
+sys.modules[__name__] = _lazy
@@ -1,4 +1,4 @@
-from gnuradio import gr, filter, analog, audio
+from gnuradio import gr, blocks, filter, analog
 from optparse import OptionParser, OptionGroup
 import scanner
 
@@ -15,9 +15,19 @@ class audio_path (gr.hier_block2):
         print "Audio demod decimation: %f" % self.decim
         self.demod = scanner.fm_demod(options.rate, self.decim, False)
         self.volume = blocks.multiply_const_ff(options.volume)
-        self.audiosink = audio.sink(int(self.audiorate), "")
+        #the sound card paces the whole flowgraph, so replays go to a file or nowhere
+        if options.audio_output == "null":
+            self.audiosink = blocks.null_sink(gr.sizeof_float)
+        elif options.audio_output:
+            self.audiosink = blocks.wavfile_sink(options.audio_output, 1, int(self.audiorate), 16)
+        else:
+            from gnuradio import audio #only when there's a sound card to open
+            self.audiosink = audio.sink(int(self.audiorate), "")
         self.connect(self, self.demod, self.volume, self.audiosink)
 
+    def squelch_open(self):
+        return self.demod.squelch_open()
+
     def set_volume(self, volume):
         self.volume.set_k(volume)
 
@@ -30,5 +40,7 @@ class audio_path (gr.hier_block2):
                             help="set audio squelch level (default=%defaultdB, play with it)")
         group.add_option("-a", "--audio-rate", type="eng_float", default=48e3,
                             help="set audio rate [default=%default]")
+        group.add_option("--audio-output", type="string", default="",
+                            help="play audio on the sound card (blank), write it to a .wav file, or null to drop it")
         parser.add_option_group(group)
 
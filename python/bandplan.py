@@ -0,0 +1,126 @@
+# Copyright 2013 Nick Foster
+#
+# This file is part of gr-scanner
+#
+# gr-scanner is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3, or (at your option)
+# any later version.
+#
+# gr-scanner is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with gr-scanner; see the file COPYING.  If not, write to
+# the Free Software Foundation, Inc., 51 Franklin Street,
+# Boston, MA 02110-1301, USA.
+#
+
+# Bandplans: channel number to frequency tables
+# A bandplan is a dense array indexed by channel number (a Smartnet
+# command or an EDACS LCN) holding the frequency in Hz, NaN where the
+# number isn't a channel. Lookup is a single index, and works on arrays
+# of channel numbers as well as single ones.
+
+import csv
+import numpy
+import diskcache
+
+#standard Smartnet bandplans as (first cmd, last cmd, first freq MHz, spacing MHz)
+_standard_plans = {
+    "800_standard": [(0x000, 0x2CF, 851.0125, 0.025),
+                     (0x2D0, 0x2F7, 866.0000, 0.025),
+                     (0x32F, 0x33F, 867.0000, 0.025),
+                     (0x3BE, 0x3BE, 868.9750, 0.025),
+                     (0x3C1, 0x3FE, 867.4250, 0.025)],
+    "800_reband":   [(0x000, 0x1B7, 851.0125, 0.025),
+                     (0x1B8, 0x22F, 851.0250, 0.025)],
+    "800_splinter": [(0x000, 0x257, 851.0000, 0.025),
+                     (0x258, 0x2CF, 866.0000, 0.025)],
+    "900":          [(0x000, 0x1DE, 935.0125, 0.0125)],
+}
+
+class bandplan(object):
+    """
+    Channel number to frequency lookup table.
+
+    Args:
+        table: frequency in Hz for each channel number, NaN for none (array)
+    """
+    def __init__(self, table):
+        self._table = numpy.asarray(table, dtype=numpy.float64)
+
+    def cmd_to_freq(self, cmd):
+        """
+        Frequency in Hz for a channel number or array of them, NaN where
+        there's no channel.
+        """
+        return self._table[cmd]
+
+    def channels(self):
+        """
+        All the frequencies in the plan, in Hz.
+        """
+        return self._table[numpy.isfinite(self._table)]
+
+    def size(self):
+        return len(self._table)
+
+    @staticmethod
+    def standard(name, size=0x400):
+        """
+        One of the standard plans: 800_standard, 800_reband, 800_splinter,
+        900, or a custom "obt,<base MHz>,<spacing MHz>,<first cmd>" plan
+        where cmd n is base + spacing*(n - first cmd).
+        """
+        if name.startswith("obt,"):
+            base, spacing, first = name.split(",")[1:]
+            segments = [(int(first, 0), size-1, float(base), float(spacing))]
+        elif name in _standard_plans:
+            segments = _standard_plans[name]
+        else:
+            raise Exception("Unknown bandplan %s (must be %s, or obt,<base>,<spacing>,<offset>)" % (name, ", ".join(sorted(_standard_plans))))
+        table = numpy.empty(size)
+        table[:] = numpy.nan
+        cmd = numpy.arange(size)
+        for first, last, base, spacing in segments:
+            seg = (cmd >= first) & (cmd <= last)
+            table[seg] = (base + spacing * (cmd[seg] - first)) * 1.e6
+        return bandplan(table)
+
+    @staticmethod
+    def from_csv(filename, size=0x400):
+        """
+        Loads a channel CSV of channel number, frequency in MHz (like
+        apps/motochan14.csv). A header row is skipped. The table is cached
+        in binary form until the CSV changes.
+        """
+        path = diskcache.file_path("bandplan-%i" % size, filename)
+        table = diskcache.load(path)
+        if table is not None:
+            return bandplan(table)
+
+        table = numpy.empty(size)
+        table[:] = numpy.nan
+        with open(filename, "r") as f:
+            for row in csv.reader(f):
+                try:
+                    chan, freq = int(row[0]), float(row[1])
+                except (ValueError, IndexError):
+                    continue #header or blank line
+                if chan >= size:
+                    raise Exception("Channel %i in %s is past the end of a %i-channel bandplan" % (chan, filename, size))
+                table[chan] = freq * 1.e6
+        diskcache.save(path, table)
+        return bandplan(table)
+
+    @staticmethod
+    def load(spec, size=0x400):
+        """
+        A standard plan by name, or a channel CSV by filename.
+        """
+        if spec.startswith("obt,") or spec in _standard_plans:
+            return bandplan.standard(spec, size)
+        return bandplan.from_csv(spec, size)
@@ -0,0 +1,235 @@
+# Copyright 2013 Nick Foster
+#
+# This file is part of gr-scanner
+#
+# gr-scanner is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3, or (at your option)
+# any later version.
+#
+# gr-scanner is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with gr-scanner; see the file COPYING.  If not, write to
+# the Free Software Foundation, Inc., 51 Franklin Street,
+# Boston, MA 02110-1301, USA.
+#
+
+# IQ capture files
+# A capture is a raw complex64 file with a JSON sidecar (<capture>.json)
+# holding the sample rate, center frequency, and an index of
+# [sample, unix time] pairs. There's one pair per stretch of contiguous
+# samples, so a capture with dropped samples still maps back to the wall
+# clock. The source memory-maps the capture, so opening it doesn't read
+# anything, and seeking is just moving a pointer.
+
+import os
+import json
+import time
+import bisect
+import threading
+import numpy
+from gnuradio import gr
+import diskcache
+
+def index_path(filename):
+    return filename + ".json"
+
+class capture_index(object):
+    """
+    Sample offset to wall clock time map for a capture.
+
+    Args:
+        rate: sample rate (float)
+        center_freq: tuner center frequency (float)
+        index: [sample, unix time] pairs, sorted by sample (list)
+    """
+    def __init__(self, rate, center_freq, index):
+        self.rate = float(rate)
+        self.center_freq = float(center_freq)
+        self.index = [(int(s), float(t)) for s, t in index]
+        self._samples = [s for s, t in self.index]
+
+    @staticmethod
+    def load(filename):
+        """
+        The sidecar index for a capture, or None if it hasn't got one.
+        """
+        try:
+            with open(index_path(filename), "r") as f:
+                d = json.load(f)
+        except (IOError, OSError, ValueError):
+            return None
+        return capture_index(d["rate"], d["center_freq"], d["index"])
+
+    def save(self, filename):
+        with open(index_path(filename), "w") as f:
+            json.dump({"rate": self.rate,
+                       "center_freq": self.center_freq,
+                       "index": self.index}, f)
+
+    def time_at(self, sample):
+        """
+        Unix time of a sample offset in the capture.
+        """
+        k = max(bisect.bisect_right(self._samples, sample) - 1, 0)
+        s, t = self.index[k]
+        return t + (sample - s) / self.rate
+
+    def sample_at(self, when):
+        """
+        Sample offset of a unix time, clamped to the start of the capture.
+        """
+        k = 0
+        for i, (s, t) in enumerate(self.index):
+            if t <= when:
+                k = i
+        s, t = self.index[k]
+        return max(s + int(round((when - t) * self.rate)), 0)
+
+def block_power(filename, block_len, chunk=1<<24):
+    """
+    Mean power in dB of each block_len samples of a capture, cached
+    until the capture changes.
+    """
+    path = diskcache.file_path("capture-power-%i" % block_len, filename)
+    power = diskcache.load(path)
+    if power is not None:
+        return power
+    samples = numpy.memmap(filename, dtype=numpy.complex64, mode="r")
+    nblocks = len(samples) // block_len
+    power = numpy.empty(nblocks)
+    step = max(chunk // block_len, 1)
+    for first in xrange(0, nblocks, step):
+        last = min(first + step, nblocks)
+        x = samples[first*block_len:last*block_len].reshape(last-first, block_len)
+        power[first:last] = 10*numpy.log10(numpy.mean(x.real**2 + x.imag**2, axis=1) + 1e-20)
+    diskcache.save(path, power)
+    return power
+
+def loud_runs(power, threshold, block_len):
+    """
+    [start, stop) sample ranges of the blocks no more than threshold dB
+    below the median block power.
+    """
+    loud = numpy.concatenate(([False], power >= numpy.median(power) - threshold, [False]))
+    edges = numpy.flatnonzero(numpy.diff(loud.astype(numpy.int8)))
+    return [(int(a)*block_len, int(b)*block_len) for a, b in zip(edges[0::2], edges[1::2])]
+
+class capture_source(gr.sync_block):
+    """
+    Memory-mapped complex64 capture file source.
+
+    Args:
+        filename: capture file (str)
+        rate: sample rate, if the capture has no sidecar index (float)
+        center_freq: center frequency, if the capture has no sidecar index (float)
+        skip_quiet: skip stretches more than this many dB below the median
+                    power, or None to play everything (float)
+    """
+    def __init__(self, filename, rate=None, center_freq=None, skip_quiet=None):
+        gr.sync_block.__init__(self,
+                               name="capture_source",
+                               in_sig=None,
+                               out_sig=[numpy.complex64])
+        self._samples = numpy.memmap(filename, dtype=numpy.complex64, mode="r")
+        self._index = capture_index.load(filename)
+        if self._index is None:
+            if rate is None or center_freq is None:
+                raise Exception("Capture %s has no index, so it needs a sample rate and center frequency" % filename)
+            #no sidecar, so assume the capture ended when the file was last written
+            start = os.path.getmtime(filename) - len(self._samples) / float(rate)
+            self._index = capture_index(rate, center_freq, [(0, start)])
+
+        #play the whole file, or just the stretches with signal in them
+        if skip_quiet is None:
+            self._runs = [(0, len(self._samples))]
+        else:
+            block_len = max(int(self._index.rate / 10), 1) #100ms
+            self._runs = loud_runs(block_power(filename, block_len), skip_quiet, block_len)
+            print "Capture has %.1fs of signal in %i stretches" % (sum(b-a for a, b in self._runs) / self._index.rate,
+                                                                  len(self._runs))
+        self._lock = threading.Lock()
+        self._run = 0
+        self._pos = self._runs[0][0] if self._runs else 0
+        #(stream offset, file offset) at every jump, to map output samples back to the capture
+        self._jumps = [(0, self._pos)]
+        self._produced = 0
+
+    def rate(self):
+        return self._index.rate
+
+    def center_freq(self):
+        return self._index.center_freq
+
+    def index(self):
+        return self._index
+
+    def seek(self, sample):
+        """
+        Continue playing from a sample offset in the capture (or the next
+        stretch of signal after it).
+        """
+        with self._lock:
+            self._run = 0
+            while self._run < len(self._runs) and self._runs[self._run][1] <= sample:
+                self._run += 1
+            if self._run < len(self._runs):
+                sample = max(sample, self._runs[self._run][0])
+            self._jump(sample)
+
+    def seek_time(self, when):
+        self.seek(self._index.sample_at(when))
+
+    def file_sample(self, offset):
+        """
+        Capture sample offset of an output sample offset.
+        """
+        with self._lock:
+            k = bisect.bisect_right(self._jumps, (offset, len(self._samples))) - 1
+            stream, pos = self._jumps[max(k, 0)]
+        return pos + (offset - stream)
+
+    def time_at(self, offset):
+        """
+        Unix time of an output sample offset.
+        """
+        return self._index.time_at(self.file_sample(offset))
+
+    def samples_read(self):
+        return self._produced
+
+    def _jump(self, sample):
+        self._pos = sample
+        if self._jumps[-1][0] == self._produced:
+            self._jumps[-1] = (self._produced, sample)
+        else:
+            self._jumps.append((self._produced, sample))
+
+    def work(self, input_items, output_items):
+        out = output_items[0]
+        with self._lock:
+            if self._run < len(self._runs) and self._pos >= self._runs[self._run][1]:
+                self._run += 1
+                if self._run < len(self._runs):
+                    self._jump(self._runs[self._run][0])
+            if self._run >= len(self._runs):
+                return -1 #WORK_DONE
+            n = min(len(out), self._runs[self._run][1] - self._pos)
+            out[:n] = self._samples[self._pos:self._pos+n]
+            self._pos += n
+            self._produced += n
+        return n
+
+def parse_time(spec, index):
+    """
+    A seek target as a capture sample offset: seconds into the capture,
+    or a local time as "YYYY-MM-DD HH:MM:SS".
+    """
+    try:
+        return int(float(spec) * index.rate)
+    except ValueError:
+        return index.sample_at(time.mktime(time.strptime(spec, "%Y-%m-%d %H:%M:%S")))
@@ -1,66 +1,192 @@
 from gnuradio import gr, gru, digital
+import time
+import threading
+import numpy
 import scanner
+
+#binary control channel messages, see include/scanner/ctrl_msg.h.
+#These go in arg2: msgq_runner stops on any message type but 0.
+CTRL_MSG_SMARTNET = 1
+CTRL_MSG_EDACS = 2
+CTRL_MSG_FLUSH = 0 #Python only, see queue_flush
+smartnet_record = numpy.dtype([("offset", numpy.uint64),
+                               ("address", numpy.uint16),
+                               ("command", numpy.uint16),
+                               ("groupflag", numpy.uint8),
+                               ("reserved", numpy.uint8, 3),
+                               ("emitted", numpy.float64),
+                               ("sample", numpy.uint64)])
+edacs_record = numpy.dtype([("offset", numpy.uint64),
+                            ("pkt", numpy.uint64),
+                            ("emitted", numpy.float64),
+                            ("sample", numpy.uint64)])
+SAMPLE_UNKNOWN = numpy.uint64(0xFFFFFFFFFFFFFFFF)
+
+#demod input sample of each record. Until the decoder sees its first
+#sample tag there's nothing better than counting bits at the nominal rate.
+def record_samples(recs, sps):
+    return numpy.where(recs["sample"] == SAMPLE_UNKNOWN,
+                       numpy.round(recs["offset"] * sps),
+                       recs["sample"]).astype(numpy.int64)
+
+#queue and demod latency of a batch of records picked up at time received
+def time_records(latency, epoch, recs, times, received):
+    latency.add("queue", received - recs["emitted"])
+    if epoch is not None:
+        latency.add("demod", recs["emitted"] - (epoch + times))
+
+#calls the assign callback, timing the handler (less any retune in it) and,
+#if it retuned, the whole trip from the preamble being on the air
+def timed_assign(latency, epoch, callback, addr, groupflag, freq, timestamp, sample):
+    start, retunes = time.time(), latency.timed_total()
+    callback(addr, groupflag, freq, timestamp, sample)
+    end = time.time()
+    retuned = latency.timed_total() - retunes
+    latency.add("handler", end - start - retuned)
+    if retuned > 0 and epoch is not None:
+        latency.add("total", end - (epoch + timestamp))
+
+class queue_flush(object):
+    """
+    Waits for a msgq_runner's handler to finish with everything queued so
+    far. wait() puts a marker message on the end of the queue and the
+    handler calls done() when it gets to it, which it only does once it's
+    returned from every message ahead of it.
+    """
+    def __init__(self, queue):
+        self._queue = queue
+        self._lock = threading.Lock()
+        self._waiting = [] #one event per marker in the queue, in order
+
+    def wait(self, timeout):
+        event = threading.Event()
+        with self._lock:
+            self._waiting.append(event)
+            self._queue.insert_tail(gr.message(0, 0, CTRL_MSG_FLUSH))
+        return event.wait(timeout)
+
+    def done(self):
+        with self._lock:
+            if self._waiting:
+                self._waiting.pop(0).set()
+
 #hier block encapsulating the Smartnet-II control channel decoder
 #could probably be split into its own file
 #this should eventually spit out PMTs with control commands
 class smartnet_ctrl_rx (gr.hier_block2):
-    def __init__(self, rate): #TODO pass in chanlist
+    def __init__(self, rate, max_batch=16, bandplan=None, soft=False):
         gr.hier_block2.__init__(self,
                                 "smartnet_ctrl_rx",
                                 gr.io_signature(1,1,gr.sizeof_gr_complex),
                                 gr.io_signature(0,0,0))
 
         self.set_assign_callback(None)
+        self.set_record_callback(None)
+        if bandplan is None:
+            bandplan = scanner.bandplan.standard("800_standard")
+        self._bandplan = bandplan
         self._queue = gr.msg_queue()
+        self._flush = queue_flush(self._queue)
         self._async_sender = gru.msgq_runner(self._queue, self.msg_handler)
+        self._latency = scanner.latency_stats()
+        self._epoch = None
 
+        self._rate = float(rate)
         self._syms_per_sec = 3600.
         self._sps = rate / self._syms_per_sec
 
-        self._demod = scanner.fsk_demod(self._sps, 0.1)
+        self._demod = scanner.fsk_demod(self._sps, 0.1, soft=soft)
         self._sof = digital.correlate_access_code_tag_bb("10101100",
                                                           0,
                                                          "smartnet_preamble")
-        self._deinterleave = scanner.deinterleave()
-        self._crc = scanner.crc(self._queue)
-        self.connect(self, self._demod, self._sof, self._deinterleave, self._crc)
-
-    #TODO reimplement the chanlist
-    def cmd_to_freq(self, chanlist, cmd):
-        if chanlist is None:
-            if cmd < 0x2d0:
-                freq = float(cmd * 0.025 + 851.0125)*1.e6
-            else:
-                freq = None
+        self._crc = scanner.crc(self._queue, max_batch)
+        if soft:
+            #preambles are found in the sliced bits, but frames are decoded from the soft symbols
+            self._slicer = digital.binary_slicer_fb()
+            self._deinterleave = scanner.soft_decoder()
+            self.connect(self, self._demod, self._slicer, self._sof, (self._deinterleave, 0))
+            self.connect(self._demod, (self._deinterleave, 1))
         else:
-            if chanlist.get(str(cmd), None) is not None:
-                freq = float(chanlist[str(cmd)])
-            else:
-                freq = None
-        return freq
+            self._deinterleave = scanner.deinterleave()
+            self.connect(self, self._demod, self._sof, self._deinterleave)
+        self.connect(self._deinterleave, self._crc)
+
+    #stream time in seconds of a demod input sample
+    def sample_to_time(self, sample):
+        return sample / self._rate
+
+    #works on a single command or an array of them, NaN where there's no channel
+    def cmd_to_freq(self, cmd):
+        return self._bandplan.cmd_to_freq(cmd)
 
     def set_assign_callback(self, func):
         self._assign_callback = func
 
+    #called with every batch of decoded records (a ctrl_chan record array), before they're handled
+    def set_record_callback(self, func):
+        self._record_callback = func
+
+    #wall clock time of the stream's first sample, for timing packets from when they were on the air
+    def set_epoch(self, epoch):
+        self._epoch = epoch
+
+    def latency(self):
+        return self._latency
+
+    #decoder health counters, also published on the crc block's "stats" port
+    def health(self):
+        return {"frames": self._crc.num_frames(),
+                "corrected": self._crc.num_corrected(),
+                "bits_corrected": self._crc.num_bits_corrected(),
+                "crc_pass": self._crc.num_crc_pass(),
+                "crc_fail": self._crc.num_crc_fail()}
+
+    #the handler runs on its own thread, so packets can still be queued when the flowgraph finishes.
+    #Returns once the handler's done with all of them, or False after timeout.
+    def wait_idle(self, timeout=5.0):
+        return self._flush.wait(timeout)
+
     def msg_handler(self, msg):
-        print msg.to_string()
-        [addr, groupflag, cmd] = [int(i) for i in msg.to_string().split(',')]
-        freq = self.cmd_to_freq(None, cmd)
-        if self._assign_callback is not None and freq is not None:
-            self._assign_callback(addr, groupflag, freq)
+        kind = int(msg.arg2())
+        if kind == CTRL_MSG_FLUSH:
+            self._flush.done()
+            return
+        if kind != CTRL_MSG_SMARTNET:
+            return
+        received = time.time()
+        pkts = numpy.frombuffer(msg.to_string(), dtype=smartnet_record)
+        samples = record_samples(pkts, self._sps)
+        time_records(self._latency, self._epoch, pkts, self.sample_to_time(samples), received)
+        if self._record_callback is not None:
+            self._record_callback(pkts)
+        if self._assign_callback is None:
+            return
+        #look up the whole batch at once and only go per-packet for channel grants
+        freqs = self.cmd_to_freq(pkts["command"])
+        grants = numpy.isfinite(freqs)
+        for pkt, freq, sample in zip(pkts[grants], freqs[grants], samples[grants]):
+            timed_assign(self._latency, self._epoch, self._assign_callback,
+                         int(pkt["address"]), int(pkt["groupflag"]), float(freq),
+                         self.sample_to_time(float(sample)), int(sample))
 
 
 class edacs_ctrl_rx(gr.hier_block2):
-    def __init__(self, rate): #TODO pass in chanlist
+    def __init__(self, rate, max_batch=16, bandplan=None):
         gr.hier_block2.__init__(self,
                                 "edacs_ctrl_rx",
                                 gr.io_signature(1,1,gr.sizeof_gr_complex),
                                 gr.io_signature(0,0,0))
 
         self.set_assign_callback(None)
+        self.set_record_callback(None)
+        self._bandplan = bandplan #LCN table, there's no standard one for EDACS
         self._queue = gr.msg_queue()
+        self._flush = queue_flush(self._queue)
         self._async_sender = gru.msgq_runner(self._queue, self.msg_handler)
+        self._latency = scanner.latency_stats()
+        self._epoch = None
 
+        self._rate = float(rate)
         self._syms_per_sec = 9600.
         self._sps = rate / self._syms_per_sec
 
@@ -69,39 +195,90 @@ class edacs_ctrl_rx(gr.hier_block2):
         self._sof = digital.correlate_access_code_tag_bb("010101010101010101010111000100100101010101010101",
                                                           0,
                                                          "edacs_preamble")
-        self._rx = scanner.edacs_pkt_rx(self._queue)
+        self._rx = scanner.edacs_pkt_rx(self._queue, max_batch)
         self.connect(self, self._demod, self._invert, self._sof, self._rx)
 
-    #TODO reimplement the chanlist
-    def cmd_to_freq(self, chanlist, cmd):
-        return None
+    #stream time in seconds of a demod input sample
+    def sample_to_time(self, sample):
+        return sample / self._rate
+
+    #LCN to frequency, NaN if there's no LCN table or no such LCN. Works on an array of them too.
+    def cmd_to_freq(self, lcn):
+        if self._bandplan is None:
+            return numpy.full(numpy.shape(lcn), numpy.nan)
+        return self._bandplan.cmd_to_freq(lcn)
 
     def set_assign_callback(self, func):
         self._assign_callback = func
 
+    #called with every batch of decoded records (a ctrl_chan record array), before they're handled
+    def set_record_callback(self, func):
+        self._record_callback = func
+
+    #wall clock time of the stream's first sample, for timing packets from when they were on the air
+    def set_epoch(self, epoch):
+        self._epoch = epoch
+
+    def latency(self):
+        return self._latency
+
+    #decoder health counters, also published on the edacs_pkt_rx block's "stats" port
+    def health(self):
+        return {"frames": self._rx.num_frames(),
+                "clean": self._rx.num_clean(),
+                "matched": self._rx.num_matched(),
+                "voted": self._rx.num_voted(),
+                "crc_fail": self._rx.num_crc_fail()}
+
+    #the handler runs on its own thread, so packets can still be queued when the flowgraph finishes.
+    #Returns once the handler's done with all of them, or False after timeout.
+    def wait_idle(self, timeout=5.0):
+        return self._flush.wait(timeout)
+
     def msg_handler(self, msg):
-        msg = scanner.edacs_pkt(int(msg.to_string(),16))
-        commands = { 0xA0: "Data assignment",
-                     0xA1: "Data assignment",
-                     0xEC: "Phone patch",
-                     0xEE: "Voice assigment",
-                     0xFC: "Idle",
-                     0xFD: "System ID"
-                   }
-        if msg["cmd"] not in commands:
-            cmdstring = "N/A"
-        else:
-            cmdstring = commands[msg["cmd"]]
-#        print "EDACS: Cmd: %s LCN: %x" % (cmdstring, msg["lcn"])
-        if msg["cmd"] in (0xA0, 0xA1, 0xEC, 0xEE):
-            if msg["id"].get_type() == 1:
-                print "Individual call to %x on LCN %i" % (msg["id"]["id"], msg["lcn"])
+        kind = int(msg.arg2())
+        if kind == CTRL_MSG_FLUSH:
+            self._flush.done()
+            return
+        if kind != CTRL_MSG_EDACS:
+            return
+        received = time.time()
+        recs = numpy.frombuffer(msg.to_string(), dtype=edacs_record)
+        samples = record_samples(recs, self._sps)
+        time_records(self._latency, self._epoch, recs, self.sample_to_time(samples), received)
+        if self._record_callback is not None:
+            self._record_callback(recs)
+        self.handle_pkts(recs["pkt"], samples)
+
+    _commands = { 0xA0: "Data assignment",
+                  0xA1: "Data assignment",
+                  0xEC: "Phone patch",
+                  0xEE: "Voice assigment",
+                  0xFC: "Idle",
+                  0xFD: "System ID"
+                }
+
+    #decodes the whole batch at once, only going per-packet to log them and for voice assignments
+    def handle_pkts(self, pkts, samples):
+        fields = scanner.edacs_pkt.parse_array(pkts)
+        cmds, lcns = fields["cmd"].astype(int), fields["lcn"].astype(int)
+        freqs = self.cmd_to_freq(lcns)
+        if self._assign_callback is not None:
+            for n in numpy.flatnonzero((cmds == 0xEE) & numpy.isfinite(freqs)):
+                timed_assign(self._latency, self._epoch, self._assign_callback,
+                             int(fields["id"][n]), int(fields["id.type"][n] == 0), float(freqs[n]),
+                             self.sample_to_time(float(samples[n])), int(samples[n]))
+        for n in xrange(len(pkts)):
+#            print "EDACS: Cmd: %s LCN: %x" % (self._commands.get(cmds[n], "N/A"), lcns[n])
+            if cmds[n] in (0xA0, 0xA1, 0xEC, 0xEE):
+                if fields["id.type"][n] == 1:
+                    print "Individual call to %x on LCN %i" % (fields["id.id"][n], lcns[n])
+                else:
+                    print "Group call to agency %i, fleet %i, subfleet %i on LCN %i" % (fields["id.agency"][n],
+                                                                                        fields["id.fleet"][n],
+                                                                                        fields["id.subfleet"][n],
+                                                                                        lcns[n])
+            elif cmds[n] == 0xFD:
+                print "EDACS system id: %x" % fields["id"][n]
             else:
-                print "Group call to agency %i, fleet %i, subfleet %i on LCN %i" % (msg["id"]["agency"],
-                                                                                    msg["id"]["fleet"], 
-                                                                                    msg["id"]["subfleet"],
-                                                                                    msg["lcn"])
-        elif msg["cmd"] == 0xFD:
-            print "EDACS system id: %x" % msg["id"]
-        else:
-            print "EDACS %s" % cmdstring
+                print "EDACS %s" % self._commands.get(cmds[n], "N/A")
@@ -0,0 +1,80 @@
+# Copyright 2013 Nick Foster
+#
+# This file is part of gr-scanner
+#
+# gr-scanner is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3, or (at your option)
+# any later version.
+#
+# gr-scanner is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with gr-scanner; see the file COPYING.  If not, write to
+# the Free Software Foundation, Inc., 51 Franklin Street,
+# Boston, MA 02110-1301, USA.
+#
+
+# On-disk cache for things gr-scanner builds from input files at startup.
+# Entries are plain .npy files so they can be memory-mapped, written
+# atomically so concurrent scanners can share the cache directory.
+
+import os
+import hashlib
+import tempfile
+import numpy
+
+def cache_dir():
+    """
+    The cache directory: $GR_SCANNER_CACHE, or ~/.cache/gr-scanner.
+    """
+    path = os.environ.get("GR_SCANNER_CACHE",
+                          os.path.join(os.path.expanduser("~"), ".cache", "gr-scanner"))
+    if not os.path.isdir(path):
+        try:
+            os.makedirs(path)
+        except OSError:
+            pass #lost a race, or can't write there; save() copes
+    return path
+
+def key_path(kind, key):
+    """
+    Path of the cache entry for an arbitrary key (anything with a stable repr).
+    """
+    digest = hashlib.sha1(repr(key).encode("utf-8")).hexdigest()
+    return os.path.join(cache_dir(), "%s-%s.npy" % (kind, digest))
+
+def file_path(kind, filename):
+    """
+    Path of the cache entry built from filename. The key includes the
+    file's size and mtime, so editing the file invalidates the entry.
+    """
+    st = os.stat(filename)
+    return key_path(kind, (os.path.abspath(filename), st.st_size, st.st_mtime))
+
+def load(path, mmap=False):
+    """
+    Returns the array cached at path, or None if there isn't one.
+    """
+    try:
+        return numpy.load(path, mmap_mode="r" if mmap else None)
+    except (IOError, OSError, ValueError):
+        return None
+
+def save(path, arr):
+    """
+    Writes an array to path atomically. Failing to cache isn't fatal.
+    """
+    try:
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+    except (IOError, OSError):
+        return
+    try:
+        with os.fdopen(fd, "wb") as f:
+            numpy.save(f, arr)
+        os.rename(tmp, path)
+    except (IOError, OSError):
+        os.unlink(tmp)
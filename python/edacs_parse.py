@@ -1,49 +1,98 @@
 #!/usr/bin/env python
 
-class data_field:
+import numpy
+
+class NoHandlerError(Exception):
+  pass
+
+class FieldNotInPacket(Exception):
+  pass
+
+class data_field(object):
+  __slots__ = ("data", "_type")
+
   def __init__(self, data):
     self.data = data
-    self.fields = self.parse()
+    self._type = self.get_type()
+    if self._type not in self.types:
+      raise NoHandlerError(self._type)
 
   types = { }
   offset = 0   #field offset applied to all fields. used for offsetting
                #subtypes to reconcile with the spec. Really just for readability.
+  numbits = 0
+
+  #the types table compiled down to {type: {field: (shift, mask, subtype)}}
+  #done once per class so each packet only has to shift and mask
+  @classmethod
+  def layout(cls):
+    if "_layout" not in cls.__dict__:
+      layout = {}
+      for mytype, fields in cls.types.items():
+        layout[mytype] = {}
+        for field, bits in fields.items():
+          shift = cls.numbits - bits[0] - bits[1] + cls.offset
+          subtype = bits[2] if len(bits) == 3 else None
+          layout[mytype][field] = (shift, (1 << bits[1]) - 1, subtype)
+      cls._layout = layout
+    return cls._layout
 
   #get a particular field from the data
   def __getitem__(self, fieldname):
-    mytype = self.get_type()
-    if mytype in self.types:
-      if fieldname in self.fields: #verify it exists in this packet type
-        return self.fields[fieldname]
-      else:
-        raise FieldNotInPacket(fieldname)
-    else:
-      raise NoHandlerError(mytype)
+    try:
+      shift, mask, subtype = self.layout()[self._type][fieldname]
+    except KeyError:
+      raise FieldNotInPacket(fieldname)
+    bits = (self.data >> shift) & mask if shift >= 0 else 0
+    return subtype(bits) if subtype is not None else bits
+
+  def __int__(self):
+    return self.data
 
   #grab all the fields in the packet as a dict
-  #done once on init so you don't have to iterate down every time you grab a field
   def parse(self):
     fields = {}
-    mytype = self.get_type()
-    if mytype in self.types:
-      for field in self.types[mytype]:
-        bits = self.types[self.get_type()][field]
-        if len(bits) == 3:
-          obj = bits[2](self.get_bits(bits[0], bits[1]))
-          fields.update(obj.parse())
-          fields.update({field: obj})
-        else:
-          fields.update({field: self.get_bits(bits[0], bits[1])})
-    else:
-      raise NoHandlerError(mytype)
+    for field, (shift, mask, subtype) in self.layout()[self._type].items():
+      if subtype is not None:
+        obj = self[field]
+        fields.update(obj.parse())
+        fields.update({field: obj})
+      else:
+        fields.update({field: self[field]})
+    return fields
+
+  #vectorized parse of an array of packets: returns a dict of field arrays,
+  #subtype fields named "field.subfield". fields not in a packet's type are 0.
+  @classmethod
+  def parse_array(cls, data):
+    data = numpy.asarray(data, dtype=numpy.uint64)
+    mytypes = cls.get_type_array(data)
+    fields = {}
+    for mytype, layout in cls.layout().items():
+      match = (mytypes == mytype)
+      for field, (shift, mask, subtype) in layout.items():
+        if field not in fields:
+          fields[field] = numpy.zeros(len(data), dtype=numpy.uint64)
+        if shift >= 0:
+          fields[field][match] = (data[match] >> numpy.uint64(shift)) & numpy.uint64(mask)
+        if subtype is not None:
+          for subfield, bits in subtype.parse_array(fields[field]).items():
+            name = "%s.%s" % (field, subfield)
+            if name not in fields:
+              fields[name] = numpy.zeros(len(data), dtype=numpy.uint64)
+            fields[name][match] = bits[match]
     return fields
 
   def get_type(self):
     raise NotImplementedError
 
-  def get_numbits(self):
+  @classmethod
+  def get_type_array(cls, data):
     raise NotImplementedError
 
+  def get_numbits(self):
+    return self.numbits
+
   def get_bits(self, *args):
     startbit = args[0]
     num = args[1]
@@ -57,23 +106,29 @@ class data_field:
     return bits
 
 class edacs_id_data(data_field):
+  __slots__ = ()
   offset = 16
+  numbits = 12
   types = {
       0x00: {"type": (16, 1), "agency": (17, 3), "fleet": (20, 4), "subfleet": (24, 4)},
       0x01: {"type": (16, 1), "id": (17, 11)},
   }
   def get_type(self):
-      return self.get_bits(16,1)
-  def get_numbits(self):
-      return 12
+      return (self.data >> 11) & 0x01
+  @classmethod
+  def get_type_array(cls, data):
+      return (data >> numpy.uint64(11)) & numpy.uint64(0x01)
 
 class edacs_pkt(data_field):
+  __slots__ = ()
   offset = 0
+  numbits = 40
   types = {
              0: {"cmd": (0,8), "lcn": (8,4), "st1": (13,1), "st2": (14,1),
                  "st3": (15,1), "id": (16,12,edacs_id_data), "crc": (28,12)}
           }
   def get_type(self):
     return 0
-  def get_numbits(self):
-    return 40
+  @classmethod
+  def get_type_array(cls, data):
+    return numpy.zeros(len(data), dtype=numpy.uint64)
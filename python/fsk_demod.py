@@ -6,12 +6,65 @@ from gnuradio import gr, gru, digital, analog, blocks, filter
 from gnuradio import eng_notation
 from gnuradio.filter import pfb
 from math import pi
+import numpy
+import pmt
+import tapcache
+
+def plan_decimation(decim, max_stage=8):
+    """
+    Splits a decimation into integer FIR stages of up to max_stage each,
+    largest first, and the fractional remainder (1 <= frac < 2) left for
+    an arbitrary resampler running at the lowest rate.
+    """
+    stages = []
+    while decim >= 2:
+        d = min(max_stage, int(decim))
+        stages.append(d)
+        decim /= d
+    return stages, max(decim, 1.0)
+
+class sample_tagger(gr.sync_block):
+    """
+    Passes samples through, tagging every interval'th one (from delay on)
+    with "sample": a tuple of its sample number less delay and sps. Put
+    ahead of a demod whose filters delay things by delay samples, the tags
+    come out on the items those input samples went into, so the decoders
+    can tell which input sample a bit came from (see lib/sample_clock.h).
+    """
+    def __init__(self, interval, delay, sps):
+        gr.sync_block.__init__(self,
+                               name="sample_tagger",
+                               in_sig=[numpy.complex64],
+                               out_sig=[numpy.complex64])
+        self._interval = max(int(interval), 1)
+        self._delay = max(int(round(delay)), 0)
+        self._key = pmt.intern("sample")
+        self._sps = pmt.from_double(sps)
+
+    def work(self, input_items, output_items):
+        out = output_items[0]
+        out[:] = input_items[0]
+        first = self.nitems_read(0)
+        k = max(0, (first - self._delay + self._interval - 1) // self._interval)
+        for n in xrange(self._delay + k*self._interval, first + len(out), self._interval):
+            self.add_item_tag(0, n, self._key, pmt.make_tuple(pmt.from_uint64(n - self._delay), self._sps))
+        return len(out)
 
 class fsk_demod(gr.hier_block2):
-    def __init__(self, sps, gain_mu):
+    """
+    FSK demodulator for sps samples per symbol input, sliced bits out,
+    or with soft set, clock recovery's soft symbols (floats, positive
+    for a 1) for a soft-decision decoder to slice itself.
+
+    The input is first brought down to _clockrec_oversample samples per
+    symbol. resampler="auto" does that with a cascade of integer
+    decimating FIRs and only resamples the fractional part that's left;
+    resampler="arb" uses one arbitrary resampler for the whole lot.
+    """
+    def __init__(self, sps, gain_mu, resampler="auto", soft=False):
         gr.hier_block2.__init__(self, "fsk_demod",
                                 gr.io_signature(1, 1, gr.sizeof_gr_complex), # Input signature
-                                gr.io_signature(1, 1, gr.sizeof_char)) # Output signature
+                                gr.io_signature(1, 1, gr.sizeof_float if soft else gr.sizeof_char)) # Output signature
 
         self._sps = float(sps)
         self._gain_mu = gain_mu # for the clock recovery block
@@ -22,17 +75,45 @@ class fsk_demod(gr.hier_block2):
         self._clockrec_oversample = 3.0
         self._decim = self._sps / self._clockrec_oversample
         print "Demodulator decimation: %f" % self._decim
-        self._downsampletaps = filter.firdes.low_pass(1.0/self._decim,
-                                                1.0, 0.4,
-                                                0.05, filter.firdes.WIN_HANN)
 
-#        self._downsample = filter.fft_filter_ccc(self._decim,
-#                                                self._downsampletaps)
+        #an arb resampler alone works, but it's a little heavy on the CPU
+        #at high rates, so by default it only does the fractional part
+        if resampler == "arb":
+            stages, frac = [], self._decim
+        elif resampler == "auto":
+            stages, frac = plan_decimation(self._decim)
+        else:
+            raise Exception("Invalid resampler (must be auto or arb)")
 
-        #sure this works but it's a little heavy on the CPU at high rates
-        self._downsample = pfb.arb_resampler_ccf(1/self._decim)
+        #each stage only has to keep the aliases out of the final passband,
+        #the later stages clean up the rest
+        final_rate = 1.0 / self._decim
+        passband = 0.4 * final_rate
+        self._downsample = []
+        rate = 1.0
+        delay = 0. #filter group delay, in input samples
+        self._cost = 0. #real multiplies per input sample
+        for d in stages:
+            taps = tapcache.firdes_low_pass(1.0, rate, (rate/d)/2., rate/d - 2*passband, filter.firdes.WIN_HAMMING)
+            self._downsample.append(filter.fir_filter_ccf(d, taps))
+            print "Demodulator stage: decimate by %i, %i taps" % (d, len(taps))
+            delay += (len(taps)-1) / 2. / rate
+            self._cost += 2. * len(taps) / d * rate #real taps on complex samples, per output
+            rate /= d
+        if abs(frac - 1.0) > 1e-6 and self._decim > 1:
+            taps = tapcache.arb_resampler(1/frac)
+            self._downsample.append(pfb.arb_resampler_ccf(1/frac, taps))
+            print "Demodulator stage: resample by %f" % (1/frac)
+            delay += (len(taps)/32. - 1) / 2. / rate #32 filter arms
+            self._cost += 4. * len(taps) / 32 * rate / frac #an arm and its derivative per output
 
-        self._clockrec_sps = self._sps / self._decim
+        #tags the input every 64 symbols with the sample it's from, see sample_tagger
+        self._tagger = sample_tagger(64*self._sps, delay, self._sps)
+
+        if self._decim > 1:
+            self._clockrec_sps = self._sps / self._decim
+        else:
+            self._clockrec_sps = self._sps #not resampled at all
 
         #using a pll to demod gets you a nice IIR LPF response for free
         self._demod = analog.pll_freqdet_cf(2.0 / self._clockrec_sps, #gain alpha, rad/samp
@@ -53,9 +134,15 @@ class fsk_demod(gr.hier_block2):
                                                  self._gain_mu, #mu gain
                                                  self._omega_relative_limit) #omega relative limit
 
-        self._slicer = digital.binary_slicer_fb()
-
-        if self._decim > 1:
-            self.connect(self, self._downsample, self._carriertrack, self._demod, self._softbits, self._slicer, self)
+        if soft:
+            self.connect(*([self, self._tagger] + self._downsample + [self._carriertrack, self._demod, self._softbits, self]))
         else:
-            self.connect(self, self._carriertrack, self._demod, self._softbits, self._slicer, self)
+            self._slicer = digital.binary_slicer_fb()
+            self.connect(*([self, self._tagger] + self._downsample + [self._carriertrack, self._demod, self._softbits, self._slicer, self]))
+
+    def resampler_cost(self):
+        """
+        Real multiplies per input sample the resampling front end does,
+        from its tap counts.
+        """
+        return self._cost
@@ -0,0 +1,147 @@
+# Copyright 2013 Nick Foster
+#
+# This file is part of gr-scanner
+#
+# gr-scanner is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3, or (at your option)
+# any later version.
+#
+# gr-scanner is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with gr-scanner; see the file COPYING.  If not, write to
+# the Free Software Foundation, Inc., 51 Franklin Street,
+# Boston, MA 02110-1301, USA.
+#
+
+# Grant-to-audio latency
+# A grant's preamble goes through the demod's stream buffers to the
+# decoder, waits in the message queue for the handler thread, is handled
+# in Python, and ends with the filterbank being retuned. Each of those
+# stages gets a histogram here:
+#   demod:   preamble on the air to the decoder emitting the packet
+#   queue:   decoder emitting it to the handler picking it up
+#   handler: time in the assign callback, less any retune
+#   retune:  the retune itself (set_channel_map, or hopping the tuner)
+#   total:   preamble on the air to the end of the retune
+# "On the air" is the stream's start time plus the preamble's symbol
+# offset, so the demod and total stages only mean anything for live
+# sources.
+
+import math
+import threading
+import time
+from contextlib import contextmanager
+import numpy
+
+STAGES = ("demod", "queue", "handler", "retune", "total")
+
+class latency_histogram(object):
+    """
+    Log-spaced histogram of latencies in seconds.
+
+    Args:
+        low: lowest bin edge (float)
+        high: highest bin edge (float)
+        bins_per_decade: resolution (int)
+    """
+    def __init__(self, low=1e-5, high=100., bins_per_decade=10):
+        ndecades = math.log10(high / low)
+        self._edges = numpy.logspace(math.log10(low), math.log10(high), int(round(ndecades * bins_per_decade)) + 1)
+        #one extra bin each end for under- and overflow
+        self._counts = numpy.zeros(len(self._edges) + 1, dtype=numpy.int64)
+        self._sum = 0.
+        self._max = 0.
+
+    def add(self, seconds):
+        seconds = numpy.atleast_1d(numpy.asarray(seconds, dtype=numpy.float64))
+        if len(seconds) == 0:
+            return
+        self._counts += numpy.bincount(numpy.searchsorted(self._edges, seconds, "right"),
+                                       minlength=len(self._counts))
+        self._sum += seconds.sum()
+        self._max = max(self._max, seconds.max())
+
+    def count(self):
+        return int(self._counts.sum())
+
+    def mean(self):
+        n = self.count()
+        return self._sum / n if n else 0.
+
+    def max(self):
+        return self._max
+
+    def percentile(self, p):
+        """
+        Upper edge of the bin holding the p'th percentile (0-100), or the
+        largest latency seen if that's lower.
+        """
+        n = self.count()
+        if n == 0:
+            return 0.
+        k = int(numpy.searchsorted(numpy.cumsum(self._counts), math.ceil(n * p / 100.)))
+        if k >= len(self._edges):
+            return self._max
+        return min(float(self._edges[k]), self._max)
+
+    def bins(self):
+        """
+        (edges, counts), counts[0] being under edges[0] and counts[-1]
+        over edges[-1].
+        """
+        return self._edges.copy(), self._counts.copy()
+
+class latency_stats(object):
+    """
+    A latency_histogram per stage, safe to add to from any thread.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._hists = dict((stage, latency_histogram()) for stage in STAGES)
+        self._local = threading.local()
+
+    def add(self, stage, seconds):
+        with self._lock:
+            self._hists[stage].add(seconds)
+
+    @contextmanager
+    def timed(self, stage):
+        """
+        Times a with block into a stage. The time is also counted in
+        timed_total() for the calling thread, so a caller can take it
+        back out of its own timing.
+        """
+        start = time.time()
+        try:
+            yield
+        finally:
+            elapsed = time.time() - start
+            self._local.total = self.timed_total() + elapsed
+            self.add(stage, elapsed)
+
+    def timed_total(self):
+        """
+        Seconds this thread has spent in timed() blocks.
+        """
+        return getattr(self._local, "total", 0.)
+
+    def histogram(self, stage):
+        return self._hists[stage]
+
+    def report(self):
+        """
+        Count, mean and percentiles of each stage in milliseconds, as a table.
+        """
+        lines = ["%-8s %8s %9s %9s %9s %9s %9s" % ("stage", "count", "mean ms", "p50 ms", "p90 ms", "p99 ms", "max ms")]
+        with self._lock:
+            for stage in STAGES:
+                h = self._hists[stage]
+                lines.append("%-8s %8i %9.2f %9.2f %9.2f %9.2f %9.2f" % (stage, h.count(), h.mean()*1e3,
+                                                                        h.percentile(50)*1e3, h.percentile(90)*1e3,
+                                                                        h.percentile(99)*1e3, h.max()*1e3))
+        return "\n".join(lines)
@@ -0,0 +1,201 @@
+# Copyright 2013 Nick Foster
+#
+# This file is part of gr-scanner
+#
+# gr-scanner is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3, or (at your option)
+# any later version.
+#
+# gr-scanner is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with gr-scanner; see the file COPYING.  If not, write to
+# the Free Software Foundation, Inc., 51 Franklin Street,
+# Boston, MA 02110-1301, USA.
+#
+
+# Per-block performance counters
+# GNU Radio keeps performance counters on every block (work time, buffer
+# fullness) when the config has [PerfCounters] on = True. The monitor
+# finds every block in a flowgraph by walking the Python objects it's
+# built from, names each one by where it lives (_feed._filter_bank,
+# _data_path._demod._softbits...), and samples the counters and item
+# counts every so often, turning running totals into rates. Item rates
+# work with the counters off.
+
+import threading
+import time
+from gnuradio import gr
+
+#the runtime's high_res_timer counts nanoseconds on Linux
+_TICKS_PER_SEC = 1e9
+
+def counters_enabled():
+    try:
+        return gr.prefs().get_bool("PerfCounters", "on", False)
+    except AttributeError:
+        return False
+
+def _walkable(obj):
+    #hier blocks and our own bookkeeping objects (pools, schedulers) can hold blocks
+    return isinstance(obj, gr.hier_block2) or type(obj).__module__.startswith("scanner")
+
+def find_blocks(root):
+    """
+    [(name, block)] for every block under root, found by walking the
+    attributes of root and of the hier blocks and scanner objects in it.
+    """
+    found = []
+    seen = set()
+    def walk(obj, name):
+        if id(obj) in seen:
+            return
+        if isinstance(obj, (list, tuple)):
+            for i, x in enumerate(obj):
+                walk(x, "%s[%i]" % (name, i))
+        elif isinstance(obj, dict) and obj is not root: #the top block is a pubsub, which is a dict
+            for k, x in sorted(obj.items()):
+                walk(x, "%s[%r]" % (name, k))
+        elif obj is not root and hasattr(obj, "nitems_written") and hasattr(obj, "unique_id"):
+            seen.add(id(obj))
+            found.append((name, obj))
+        elif obj is root or _walkable(obj):
+            seen.add(id(obj))
+            for attr, x in sorted(vars(obj).items()):
+                walk(x, "%s.%s" % (name, attr) if name else attr)
+    walk(root, "")
+    return found
+
+def _ports(block):
+    #(ninputs, noutputs), or None until the flowgraph has started
+    try:
+        detail = block.detail()
+        return detail.ninputs(), detail.noutputs()
+    except (AttributeError, RuntimeError, TypeError):
+        return None
+
+def _counter(block, name, *args):
+    try:
+        return float(getattr(block, name)(*args))
+    except (AttributeError, RuntimeError, TypeError):
+        return None
+
+def snapshot(block):
+    """
+    Running totals for a block: items in and out, total work time in
+    seconds (None if the runtime doesn't keep it), and the average
+    fullness of its fullest input and output buffers.
+    """
+    ports = _ports(block)
+    if ports is None:
+        return None
+    nin, nout = ports
+    work = _counter(block, "pc_work_time_total")
+    in_full = [_counter(block, "pc_input_buffers_full", i) for i in range(nin)]
+    out_full = [_counter(block, "pc_output_buffers_full", i) for i in range(nout)]
+    return {"time": time.time(),
+            "read": sum(block.nitems_read(i) for i in range(nin)),
+            "written": sum(block.nitems_written(i) for i in range(nout)),
+            "work": work / _TICKS_PER_SEC if work is not None else None,
+            "in_full": max([f for f in in_full if f is not None] or [None]),
+            "out_full": max([f for f in out_full if f is not None] or [None])}
+
+class perf_monitor(object):
+    """
+    Samples the performance counters of every block in a flowgraph.
+
+    Args:
+        root: the top block (gr.top_block)
+        interval: seconds between printed stats dumps, or 0 for none (float)
+    """
+    def __init__(self, root, interval=0):
+        self._blocks = find_blocks(root)
+        self._lock = threading.Lock()
+        self._last = {}
+        self._stats = {}
+        self._done = threading.Event()
+        if interval > 0:
+            if not counters_enabled():
+                print "Performance counters are off, so only item rates are available (set [PerfCounters] on = True in the GNU Radio config)"
+            self._thread = threading.Thread(target=self._run, args=(interval,))
+            self._thread.daemon = True
+            self._thread.start()
+        else:
+            self._thread = None
+
+    def blocks(self):
+        return [name for name, block in self._blocks]
+
+    def sample(self):
+        """
+        Rates since the last sample, per block name: items/s in and out,
+        fraction of a core spent in work, and buffer fullness (0-1).
+        Blocks that aren't running yet are left out.
+        """
+        with self._lock:
+            stats = {}
+            for name, block in self._blocks:
+                now = snapshot(block)
+                if now is None:
+                    continue
+                last = self._last.get(name)
+                self._last[name] = now
+                if last is None:
+                    continue
+                dt = now["time"] - last["time"]
+                if dt <= 0:
+                    continue
+                stats[name] = {"in_rate": (now["read"] - last["read"]) / dt,
+                               "out_rate": (now["written"] - last["written"]) / dt,
+                               "cpu": (now["work"] - last["work"]) / dt if now["work"] is not None else None,
+                               "in_full": now["in_full"],
+                               "out_full": now["out_full"]}
+            self._stats = stats
+            return stats
+
+    def stats(self):
+        """
+        The rates from the latest sample.
+        """
+        with self._lock:
+            return dict(self._stats)
+
+    def bottleneck(self):
+        """
+        The block using the most CPU in the latest sample, or failing that
+        the one with the fullest input buffers, or None.
+        """
+        stats = self.stats()
+        for key in ("cpu", "in_full"):
+            known = [(s[key], name) for name, s in stats.items() if s[key] is not None]
+            if known:
+                return max(known)[1]
+        return None
+
+    def dump(self):
+        """
+        The latest sample as a table, busiest blocks first.
+        """
+        fmt = lambda x, scale, spec: (spec % (x * scale)) if x is not None else "-"
+        stats = self.stats()
+        order = sorted(stats, key=lambda name: (-(stats[name]["cpu"] or 0), -stats[name]["in_rate"], name))
+        lines = ["%-48s %8s %12s %12s %6s %6s" % ("block", "CPU %", "in/s", "out/s", "in%", "out%")]
+        for name in order:
+            s = stats[name]
+            lines.append("%-48s %8s %12.0f %12.0f %6s %6s" % (name[-48:], fmt(s["cpu"], 100, "%.1f"),
+                                                              s["in_rate"], s["out_rate"],
+                                                              fmt(s["in_full"], 100, "%.0f"),
+                                                              fmt(s["out_full"], 100, "%.0f")))
+        return "\n".join(lines)
+
+    def close(self):
+        self._done.set()
+
+    def _run(self, interval):
+        while not self._done.wait(interval):
+            if self.sample():
+                print self.dump()
@@ -0,0 +1,112 @@
+# Copyright 2013 Nick Foster
+#
+# This file is part of gr-scanner
+#
+# gr-scanner is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3, or (at your option)
+# any later version.
+#
+# gr-scanner is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with gr-scanner; see the file COPYING.  If not, write to
+# the Free Software Foundation, Inc., 51 Franklin Street,
+# Boston, MA 02110-1301, USA.
+#
+
+# Sample rate and center frequency planner
+# Picks the lowest sample rate the radio supports that, with a suitable
+# center frequency, covers the control channel and every channel in the
+# bandplan. The filterbank maps channels by their offset from center, so
+# the center sits on the control channel's channel grid, and never on a
+# channel that's in use since that's where the DC spur lands. Rates have
+# to be a whole, FFT-friendly number of channels wide.
+
+import numpy
+
+def fft_friendly(n):
+    """
+    Whether n has no prime factors but 2, 3 and 5.
+    """
+    if n < 1:
+        return False
+    for p in (2, 3, 5):
+        while n % p == 0:
+            n //= p
+    return n == 1
+
+def candidate_rates(start, stop, step, spacing):
+    """
+    The rates in a start/stop/step range that are a whole number of channels.
+    """
+    rates = []
+    for n in xrange(int(numpy.ceil(start / spacing)), int(stop // spacing) + 1):
+        rate = n * spacing
+        if step <= 0 or abs(((rate - start) / step) - round((rate - start) / step)) < 1e-9:
+            rates.append(rate)
+    return rates
+
+def best_center(channels, ctrl_freq, rate, spacing, edge=0.1, center=None):
+    """
+    The center frequency covering the most channels at this rate, given
+    that it has to cover the control channel. Only the inner 1-edge of
+    the band is counted as covered. A center given by the caller is
+    taken as it is, spur or not. Returns (center, channels covered), or
+    None if nothing works.
+    """
+    half = rate * (1 - edge) / 2.
+    if center is not None:
+        centers = numpy.array([center], dtype=numpy.float64)
+    else:
+        #every grid point with the control channel in band, but not on a channel in use (DC spur)
+        k = numpy.arange(-int(half // spacing), int(half // spacing) + 1)
+        centers = ctrl_freq + k * spacing
+        in_use = numpy.abs(centers[:,None] - channels[None,:]).min(axis=1) < spacing / 2.
+        centers = centers[~in_use]
+    centers = centers[numpy.abs(centers - ctrl_freq) <= half]
+    if len(centers) == 0:
+        return None
+    covered = numpy.searchsorted(channels, centers + half, "right") - numpy.searchsorted(channels, centers - half, "left")
+    #most channels, then nearest the middle of the channels to keep away from the band edges
+    middle = (channels[0] + channels[-1]) / 2.
+    best = numpy.lexsort((numpy.abs(centers - middle), -covered))[0]
+    return float(centers[best]), int(covered[best])
+
+def plan(ctrl_freq, channels, rates, spacing=25e3, edge=0.1, center=None):
+    """
+    Picks (rate, center freq) for a control channel and a list of voice
+    channels out of the supported rates. If no rate covers everything,
+    the lowest rate covering the most channels is used instead.
+    Channels off the control channel's grid can't be mapped by the
+    filterbank and are left out.
+    """
+    channels = numpy.unique(numpy.concatenate(([ctrl_freq], numpy.asarray(channels, dtype=numpy.float64))))
+    steps = (channels - ctrl_freq) / spacing
+    on_grid = numpy.abs(steps - numpy.round(steps)) < 1e-6
+    if not on_grid.all():
+        print "Planner: %i channels aren't on the %.1fkHz channel grid" % ((~on_grid).sum(), spacing/1.e3)
+    channels = channels[on_grid]
+
+    usable = sorted(r for r in set(rates)
+                    if abs(r/spacing - round(r/spacing)) < 1e-6 and fft_friendly(int(round(r/spacing))))
+    if not usable:
+        raise Exception("No supported sample rate is an FFT-friendly number of %.1fkHz channels" % (spacing/1.e3))
+
+    fallback = None
+    for rate in usable:
+        found = best_center(channels, ctrl_freq, rate, spacing, edge, center)
+        if found is None:
+            continue
+        if found[1] == len(channels):
+            print "Planner: %.3fMsps centered on %.4fMHz covers all %i channels" % (rate/1.e6, found[0]/1.e6, len(channels))
+            return rate, found[0]
+        if fallback is None or found[1] > fallback[2]:
+            fallback = (rate, found[0], found[1])
+    if fallback is None:
+        raise Exception("No supported sample rate can cover the control channel")
+    print "Planner: no rate covers everything, %.3fMsps centered on %.4fMHz covers %i of %i channels" % (fallback[0]/1.e6, fallback[1]/1.e6, fallback[2], len(channels))
+    return fallback[0], fallback[1]
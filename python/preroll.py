@@ -0,0 +1,201 @@
+# Copyright 2013 Nick Foster
+#
+# This file is part of gr-scanner
+#
+# gr-scanner is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3, or (at your option)
+# any later version.
+#
+# gr-scanner is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with gr-scanner; see the file COPYING.  If not, write to
+# the Free Software Foundation, Inc., 51 Franklin Street,
+# Boston, MA 02110-1301, USA.
+#
+
+# Pre-roll for voice channels
+# By the time a grant has been decoded and the filterbank retuned, the
+# start of the call has already gone past. The pre-roll buffer keeps the
+# last few seconds of wideband input in a ring, and on a retune the
+# injector on that voice output channelizes the ring from just before the
+# grant and plays it out ahead of the live samples. Channelizing seconds
+# of wideband samples takes a while, so the injector leaves that to a
+# worker thread rather than holding up the scheduler.
+
+import threading
+import numpy
+from numpy.lib.stride_tricks import as_strided
+from gnuradio import gr
+
+def channelize(x, first, rate, offset, taps, decim):
+    """
+    Mixes wideband samples x (the first one being sample number first)
+    down by offset Hz, then filters and decimates them the way the
+    filterbank does. Only the decimated outputs are computed.
+    """
+    ntaps = len(taps)
+    if len(x) < ntaps:
+        return numpy.zeros(0, dtype=numpy.complex64)
+    #wrap the phase before scaling it so big sample numbers don't lose precision
+    cycles = numpy.mod(numpy.arange(first, first+len(x)) * (float(offset) / rate), 1.0)
+    mixed = (x * numpy.exp(-2j*numpy.pi*cycles)).astype(numpy.complex64)
+    nout = (len(mixed) - ntaps) // decim + 1
+    step = mixed.strides[0]
+    windows = as_strided(mixed, shape=(nout, ntaps), strides=(decim*step, step))
+    return windows.dot(numpy.asarray(taps[::-1], dtype=numpy.float32)).astype(numpy.complex64)
+
+class preroll_buffer(gr.sync_block):
+    """
+    Sink keeping the most recent seconds of wideband samples.
+
+    Args:
+        seconds: how much to keep (float)
+        rate: sample rate (float)
+    """
+    def __init__(self, seconds, rate):
+        gr.sync_block.__init__(self,
+                               name="preroll_buffer",
+                               in_sig=[numpy.complex64],
+                               out_sig=None)
+        self._ring = numpy.zeros(max(int(seconds * rate), 1), dtype=numpy.complex64)
+        self._count = 0 #samples ever written
+        self._lock = threading.Lock()
+        print "Pre-roll buffer: %.1fs, %.1fMB" % (seconds, self._ring.nbytes / 1.e6)
+
+    def read(self, start, stop):
+        """
+        Copy of samples start to stop, clipped to what's still in the ring.
+        Returns (first sample number, samples).
+        """
+        with self._lock:
+            start = max(start, self._count - len(self._ring), 0)
+            stop = min(stop, self._count)
+            if stop <= start:
+                return start, numpy.zeros(0, dtype=numpy.complex64)
+            size = len(self._ring)
+            a, b = start % size, stop % size
+            if a < b:
+                return start, self._ring[a:b].copy()
+            return start, numpy.concatenate((self._ring[a:], self._ring[:b]))
+
+    def work(self, input_items, output_items):
+        x = input_items[0]
+        size = len(self._ring)
+        with self._lock:
+            keep = x[-size:]
+            a = (self._count + len(x) - len(keep)) % size
+            first = min(len(keep), size - a)
+            self._ring[a:a+first] = keep[:first]
+            self._ring[:len(keep)-first] = keep[first:]
+            self._count += len(x)
+        return len(x)
+
+class preroll_injector(gr.basic_block):
+    """
+    Passes a voice channel through, except that after inject() it plays
+    the pre-roll for that channel first.
+
+    The pre-roll's channelized a chunk at a time on a worker thread, which
+    carries on until it's caught up with the end of the ring. Meanwhile the
+    live samples are dropped, since the worker covers them too (and the ones
+    queued up already may be from before the retune). Once it's caught up
+    and its output's gone out, the live samples pick up where it stopped.
+
+    Args:
+        buffer: the wideband preroll_buffer (preroll_buffer)
+        rate: wideband sample rate (float)
+        taps: filterbank prototype taps (list)
+        decim: filterbank decimation (int)
+    """
+    #wideband samples the worker channelizes at a time
+    CHUNK = 1 << 20
+
+    def __init__(self, buffer, rate, taps, decim):
+        gr.basic_block.__init__(self,
+                                name="preroll_injector",
+                                in_sig=[numpy.complex64],
+                                out_sig=[numpy.complex64])
+        self._buffer = buffer
+        self._rate = rate
+        self._taps = taps
+        self._decim = decim
+        self._lock = threading.Lock()
+        self._request = None   #(start, offset) for the worker
+        self._generation = 0   #bumped by inject(), so the worker drops a superseded pre-roll
+        self._replaying = False
+        self._chunks = []      #channelized pre-roll waiting to go out
+        self._resume = None    #live sample to pick up from, once the worker's caught up
+        self._wake = threading.Event()
+        self._worker = threading.Thread(target=self._run)
+        self._worker.daemon = True
+        self._worker.start()
+
+    def inject(self, start, offset):
+        """
+        Play out the channel offset Hz from center, starting at wideband
+        sample start, before carrying on with the live samples.
+        """
+        with self._lock:
+            self._generation += 1
+            self._request = (start, offset)
+            self._replaying = True
+            self._chunks = []
+            self._resume = None
+        self._wake.set()
+
+    def _run(self):
+        ntaps = len(self._taps)
+        while True:
+            self._wake.wait()
+            with self._lock:
+                self._wake.clear()
+                generation, (start, offset) = self._generation, self._request
+            #live sample k is the filterbank window starting at wideband
+            #sample k*decim, so the pre-roll's windows start on that grid too
+            pos = -(-start // self._decim) * self._decim
+            while True:
+                first, x = self._buffer.read(pos, pos + self.CHUNK + ntaps - 1)
+                if first > pos: #it's gone out of the ring already
+                    pos += -(-(first - pos) // self._decim) * self._decim
+                    continue
+                y = channelize(x, first, self._rate, offset, self._taps, self._decim)
+                with self._lock:
+                    if generation != self._generation:
+                        break
+                    if len(y) == 0:
+                        self._resume = pos // self._decim
+                        break
+                    self._chunks.append(y)
+                pos += len(y) * self._decim
+
+    def general_work(self, input_items, output_items):
+        inp, out = input_items[0], output_items[0]
+        n = drop = 0
+        with self._lock:
+            if self._replaying:
+                while self._chunks and n < len(out):
+                    y = self._chunks[0]
+                    k = min(len(y), len(out) - n)
+                    out[n:n+k] = y[:k]
+                    n += k
+                    if k < len(y):
+                        self._chunks[0] = y[k:]
+                    else:
+                        self._chunks.pop(0)
+                drop = len(inp)
+                if self._resume is not None:
+                    drop = min(drop, max(0, self._resume - self.nitems_read(0)))
+                    if not self._chunks and self.nitems_read(0) + drop >= self._resume:
+                        self._replaying = False
+            if not self._replaying:
+                k = min(len(inp) - drop, len(out) - n)
+                out[n:n+k] = inp[drop:drop+k]
+                n += k
+                drop += k
+        self.consume(0, drop)
+        return n
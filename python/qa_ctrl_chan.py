@@ -0,0 +1,98 @@
+#!/usr/bin/env python
+# Copyright 2013 Nick Foster
+#
+# This file is part of gr-scanner
+#
+# gr-scanner is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3, or (at your option)
+# any later version.
+#
+# gr-scanner is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with gr-scanner; see the file COPYING.  If not, write to
+# the Free Software Foundation, Inc., 51 Franklin Street,
+# Boston, MA 02110-1301, USA.
+#
+
+# Runs decoded packets through smartnet_ctrl_rx and edacs_ctrl_rx to the
+# callbacks, on the handler thread the way the scanner gets them, rather
+# than reading the decoders' queue directly.
+
+from gnuradio import gr, gr_unittest, blocks
+import sys
+import atexit
+import shutil
+import numpy
+import qa_package
+import waveform
+
+PKG_DIR = qa_package.link_package()
+atexit.register(shutil.rmtree, PKG_DIR)
+sys.path.insert(0, PKG_DIR)
+import scanner
+
+RATE = 50e3
+
+class qa_ctrl_chan(gr_unittest.TestCase):
+
+    def setUp(self):
+        self.tb = gr.top_block()
+
+    def tearDown(self):
+        self.tb = None
+
+    def test_001_smartnet_assign(self):
+        iq, sent = waveform.smartnet_signal(300, RATE, seed=5)
+        bandplan = scanner.bandplan.standard("800_standard")
+        rx = scanner.smartnet_ctrl_rx(RATE, bandplan=bandplan)
+        assigned, batches = [], []
+        rx.set_assign_callback(lambda addr, groupflag, freq, timestamp, sample: assigned.append((addr, groupflag, freq)))
+        rx.set_record_callback(batches.append)
+        self.tb.connect(blocks.vector_source_c(iq.tolist(), False), rx)
+        self.tb.run()
+        self.assertTrue(rx.wait_idle())
+
+        #every batch gets to the handler, not just the first
+        self.assertGreater(len(batches), 1)
+        self.assertGreaterEqual(sum(len(b) for b in batches), len(sent) - 2)
+        #and each channel grant gets to the assign callback
+        freqs = bandplan.cmd_to_freq(sent["command"])
+        grants = numpy.isfinite(freqs)
+        expected = zip(sent["address"][grants].tolist(), sent["groupflag"][grants].tolist(), freqs[grants].tolist())
+        self.assertTrue(set(assigned) <= set(expected))
+        self.assertGreaterEqual(len(assigned), len(expected) - 2)
+
+    def test_002_edacs_records(self):
+        iq, sent = waveform.edacs_signal(200, RATE, seed=6)
+        rx = scanner.edacs_ctrl_rx(RATE)
+        batches = []
+        rx.set_record_callback(batches.append)
+        self.tb.connect(blocks.vector_source_c(iq.tolist(), False), rx)
+        self.tb.run()
+        self.assertTrue(rx.wait_idle())
+        self.assertGreater(len(batches), 1)
+        got = numpy.concatenate(batches)["pkt"].tolist()
+        self.assertTrue(set(got) <= set(sent["pkt"].tolist()))
+        self.assertGreaterEqual(len(got), len(sent) - 4)
+
+    def test_003_edacs_assign(self):
+        #voice assignments (cmd 0xEE) get to the assign callback, group calls
+        #(id type 0) with the group flag set, and nothing else does
+        lcn_table = scanner.bandplan(851e6 + 25e3*numpy.arange(16))
+        rx = scanner.edacs_ctrl_rx(RATE, bandplan=lcn_table)
+        assigned = []
+        rx.set_assign_callback(lambda addr, groupflag, freq, timestamp, sample: assigned.append((addr, groupflag, freq, sample)))
+        cmds = numpy.array([0xEE, 0xFC, 0xEE, 0xA0, 0xFD], dtype=numpy.uint64)
+        lcns = numpy.array([3, 0, 7, 5, 0], dtype=numpy.uint64)
+        ids = numpy.array([0x123, 0, 0x923, 0x456, 0x789], dtype=numpy.uint64)
+        pkts = (cmds << numpy.uint64(32)) | (lcns << numpy.uint64(28)) | (ids << numpy.uint64(12))
+        rx.handle_pkts(pkts, numpy.arange(5) * 1000)
+        self.assertEqual(assigned, [(0x123, 1, 851e6 + 3*25e3, 0), (0x923, 0, 851e6 + 7*25e3, 2000)])
+
+if __name__ == '__main__':
+    gr_unittest.run(qa_ctrl_chan, "qa_ctrl_chan.xml")
@@ -0,0 +1,86 @@
+#!/usr/bin/env python
+# Copyright 2013 Nick Foster
+#
+# This file is part of gr-scanner
+#
+# gr-scanner is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3, or (at your option)
+# any later version.
+#
+# gr-scanner is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with gr-scanner; see the file COPYING.  If not, write to
+# the Free Software Foundation, Inc., 51 Franklin Street,
+# Boston, MA 02110-1301, USA.
+#
+
+# Checks edacs_pkt_rx's 2-of-3 vote and CRC-12: packets with clean,
+# matching, and all-different copies come through, and ones where the
+# same bit is bad in two copies are caught by the CRC and dropped.
+
+from gnuradio import gr, gr_unittest, blocks, digital
+import numpy
+import scanner_swig as scanner
+import waveform
+
+#edacs_pkt_rx's records, see include/scanner/ctrl_msg.h
+edacs_record = numpy.dtype([("offset", numpy.uint64),
+                            ("pkt", numpy.uint64),
+                            ("emitted", numpy.float64),
+                            ("sample", numpy.uint64)])
+
+CLEAN, MATCHED, VOTED, FAIL = range(4)
+
+class qa_edacs_pkt_rx(gr_unittest.TestCase):
+
+    def setUp(self):
+        self.tb = gr.top_block()
+
+    def tearDown(self):
+        self.tb = None
+
+    def test_001_vote(self):
+        rng = numpy.random.RandomState(1)
+        data = rng.randint(0, 1 << 28, 400).astype(numpy.uint64)
+        #plenty of lead so the last frame isn't left in the block's final partial work call
+        bits, marks, pkts = waveform.edacs_bits(data, lead=1200)
+        kind = rng.randint(0, 4, len(pkts))
+        for n in xrange(len(pkts)):
+            #copy k of packet n starts here, 40 bits each, the second inverted
+            copy = lambda k: marks[n] + 120*(n % 2) + 40*k
+            pos = rng.permutation(40)
+            if kind[n] == MATCHED:
+                bits[copy(rng.randint(0, 3)) + pos[:3]] ^= 1
+            elif kind[n] == VOTED:
+                for k in xrange(3):
+                    bits[copy(k) + pos[k]] ^= 1
+            elif kind[n] == FAIL:
+                bits[copy(0) + pos[0]] ^= 1
+                bits[copy(1) + pos[0]] ^= 1
+
+        queue = gr.msg_queue()
+        sof = digital.correlate_access_code_tag_bb(waveform.EDACS_PREAMBLE, 0, "edacs_preamble")
+        rx = scanner.edacs_pkt_rx(queue, 16)
+        self.tb.connect(blocks.vector_source_b(bits.tolist(), False), sof, rx)
+        self.tb.run()
+        recs = [numpy.zeros(0, dtype=edacs_record)]
+        while queue.count() > 0:
+            recs.append(numpy.frombuffer(queue.delete_head().to_string(), dtype=edacs_record))
+        recs = numpy.concatenate(recs)
+
+        keep = kind != FAIL
+        self.assertEqual(recs["offset"].tolist(), marks[keep].tolist())
+        self.assertEqual(recs["pkt"].tolist(), pkts[keep].tolist())
+        self.assertEqual(rx.num_frames(), len(pkts) // 2)
+        self.assertEqual(rx.num_clean(), numpy.sum(kind == CLEAN))
+        self.assertEqual(rx.num_matched(), numpy.sum(kind == MATCHED))
+        self.assertEqual(rx.num_voted(), numpy.sum(kind == VOTED))
+        self.assertEqual(rx.num_crc_fail(), numpy.sum(kind == FAIL))
+
+if __name__ == '__main__':
+    gr_unittest.run(qa_edacs_pkt_rx, "qa_edacs_pkt_rx.xml")
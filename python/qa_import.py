@@ -0,0 +1,82 @@
+#!/usr/bin/env python
+# Copyright 2013 Nick Foster
+#
+# This file is part of gr-scanner
+#
+# gr-scanner is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3, or (at your option)
+# any later version.
+#
+# gr-scanner is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with gr-scanner; see the file COPYING.  If not, write to
+# the Free Software Foundation, Inc., 51 Franklin Street,
+# Boston, MA 02110-1301, USA.
+#
+
+# Checks "import scanner" stays cheap: it shouldn't load the swig library,
+# UHD, the sound card or the filter design code until something asks for
+# them, and the import itself has a time budget. See apps/benchmark_import
+# for the full timings.
+
+from gnuradio import gr, gr_unittest
+import os
+import sys
+import json
+import shutil
+import subprocess
+import qa_package
+
+#the import alone, median of RUNS fresh interpreters, in seconds
+IMPORT_BUDGET = 0.1
+RUNS = 5
+
+HEAVY = ["gnuradio.uhd", "gnuradio.audio", "gnuradio.filter.optfir",
+         "gnuradio.wxgui", "scanner.scanner_swig", "scipy"]
+
+CHILD = """
+import sys, time, json
+start = time.time()
+import scanner
+elapsed = time.time() - start
+for name in %r:
+    getattr(scanner, name)
+print(json.dumps([elapsed, [m for m in %r if m in sys.modules]]))
+"""
+
+class qa_import(gr_unittest.TestCase):
+
+    def setUp(self):
+        self.dir = qa_package.link_package()
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def run_child(self, names):
+        env = dict(os.environ)
+        env["PYTHONPATH"] = os.pathsep.join([self.dir] + [p for p in [env.get("PYTHONPATH")] if p])
+        out = subprocess.check_output([sys.executable, "-c", CHILD % (names, HEAVY)], env=env)
+        return json.loads(out.strip().splitlines()[-1])
+
+    def test_001_import_loads_nothing(self):
+        elapsed, heavy = self.run_child([])
+        self.assertEqual(heavy, [])
+
+    def test_002_decode_only(self):
+        #a decode-only run needs the swig blocks, but not the radio or audio
+        elapsed, heavy = self.run_child(["smartnet_ctrl_rx", "edacs_ctrl_rx", "waveform", "smartnet_decode"])
+        self.assertEqual([m for m in heavy if m != "scanner.scanner_swig"], [])
+
+    def test_003_import_time(self):
+        times = sorted(self.run_child([])[0] for i in xrange(RUNS))
+        median = times[len(times)//2]
+        print "import scanner: median %.1fms, min %.1fms" % (median*1e3, times[0]*1e3)
+        self.assertLess(median, IMPORT_BUDGET)
+
+if __name__ == '__main__':
+    gr_unittest.run(qa_import, "qa_import.xml")
@@ -0,0 +1,93 @@
+#!/usr/bin/env python
+# Copyright 2013 Nick Foster
+#
+# This file is part of gr-scanner
+#
+# gr-scanner is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3, or (at your option)
+# any later version.
+#
+# gr-scanner is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with gr-scanner; see the file COPYING.  If not, write to
+# the Free Software Foundation, Inc., 51 Franklin Street,
+# Boston, MA 02110-1301, USA.
+#
+
+# Checks noise_squelch_ff against standard_squelch_ff.reference(), the
+# NumPy model of it, ungated and gated, through the standard_squelch_ff
+# wrapper and its setters.
+
+from gnuradio import gr, gr_unittest, blocks
+import sys
+import atexit
+import shutil
+import importlib
+import numpy
+import qa_package
+
+PKG_DIR = qa_package.link_package()
+atexit.register(shutil.rmtree, PKG_DIR)
+sys.path.insert(0, PKG_DIR)
+squelch = importlib.import_module("scanner.standard_squelch_ff")
+
+#noise, with a tone burst from burst[0] to burst[1] the squelch opens on
+def signal(n, burst, seed):
+    rng = numpy.random.RandomState(seed)
+    x = 0.5 * rng.standard_normal(n)
+    t = numpy.arange(burst[0], burst[1])
+    x[burst[0]:burst[1]] = numpy.sin(2*numpy.pi*0.4*t) + 0.05 * rng.standard_normal(len(t))
+    return x.astype(numpy.float32)
+
+class qa_noise_squelch_ff(gr_unittest.TestCase):
+
+    def setUp(self):
+        self.tb = gr.top_block()
+
+    def tearDown(self):
+        self.tb = None
+
+    def run_block(self, block, x):
+        dst = blocks.vector_sink_f()
+        self.tb.connect(blocks.vector_source_f(x.tolist(), False), block, dst)
+        self.tb.run()
+        return numpy.array(dst.data(), dtype=numpy.float32)
+
+    def check(self, block, x, alpha, threshold_db, gate):
+        out = self.run_block(block, x)
+        expected = squelch.reference(x, alpha, threshold_db, gate)
+        self.assertEqual(len(out), len(expected))
+        self.assertFloatTuplesAlmostEqual(out.tolist(), expected.tolist(), 5)
+        self.assertEqual(block.is_open(), bool(squelch.reference_state(x, alpha, threshold_db)[-1]))
+        return out
+
+    def test_001_ungated(self):
+        #opens for the burst and closes again after it, passing every sample through
+        x = signal(12000, (4000, 10000), 1)
+        out = self.check(squelch.standard_squelch_ff(0.01, -10, False), x, 0.01, -10, False)
+        self.assertEqual(len(out), len(x))
+        self.assertLess(numpy.abs(out[:4000]).max(), 1e-3)
+        self.assertGreater(numpy.abs(out[6000:10000]).max(), 0.5)
+
+    def test_002_gated(self):
+        #ends with the burst still going, so it's left open
+        x = signal(12000, (4000, 12000), 2)
+        out = self.check(squelch.standard_squelch_ff(0.01, -10, True), x, 0.01, -10, True)
+        self.assertLess(len(out), len(x))
+
+    def test_003_setters(self):
+        x = signal(12000, (3000, 9000), 3)
+        block = squelch.standard_squelch_ff()
+        block.set_threshold(-6)
+        block.set_alpha(0.005)
+        self.assertAlmostEqual(block.threshold(), 1/10**(-6/10.), 4)
+        self.assertAlmostEqual(block.alpha(), 0.005)
+        self.check(block, x, 0.005, -6, False)
+
+if __name__ == '__main__':
+    gr_unittest.run(qa_noise_squelch_ff, "qa_noise_squelch_ff.xml")
@@ -0,0 +1,44 @@
+# Copyright 2013 Nick Foster
+#
+# This file is part of gr-scanner
+#
+# gr-scanner is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3, or (at your option)
+# any later version.
+#
+# gr-scanner is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with gr-scanner; see the file COPYING.  If not, write to
+# the Free Software Foundation, Inc., 51 Franklin Street,
+# Boston, MA 02110-1301, USA.
+#
+
+# For the QA tests that need "import scanner". The package isn't put
+# together until it's installed, so this links one up from the sources
+# and the swig module on the test's path.
+
+import os
+import sys
+import glob
+import tempfile
+
+#links the package into a new temporary directory and returns the directory
+def link_package():
+    dirname = tempfile.mkdtemp()
+    pkg = os.path.join(dirname, "scanner")
+    os.mkdir(pkg)
+    src = os.path.dirname(os.path.abspath(__file__))
+    for f in glob.glob(os.path.join(src, "*.py")):
+        if not os.path.basename(f).startswith("qa_"):
+            os.symlink(f, os.path.join(pkg, os.path.basename(f)))
+    for d in sys.path:
+        for f in ("scanner_swig.py", "_scanner_swig.so"):
+            path = os.path.join(os.path.abspath(d or "."), f)
+            if os.path.exists(path) and not os.path.exists(os.path.join(pkg, f)):
+                os.symlink(path, os.path.join(pkg, f))
+    return dirname
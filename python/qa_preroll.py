@@ -0,0 +1,113 @@
+#!/usr/bin/env python
+# Copyright 2013 Nick Foster
+#
+# This file is part of gr-scanner
+#
+# gr-scanner is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3, or (at your option)
+# any later version.
+#
+# gr-scanner is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with gr-scanner; see the file COPYING.  If not, write to
+# the Free Software Foundation, Inc., 51 Franklin Street,
+# Boston, MA 02110-1301, USA.
+#
+
+# Checks the pre-roll: channelize() against a polyphase channelizer bin,
+# the ring buffer reading back across its wrap, and the injector playing
+# the pre-roll out ahead of the live samples.
+
+from gnuradio import gr, gr_unittest, blocks, filter
+import numpy
+import preroll
+
+RATE = 80e3
+NUMCHANS = 8
+
+def noise(n, seed):
+    rng = numpy.random.RandomState(seed)
+    return (rng.standard_normal(n) + 1j * rng.standard_normal(n)).astype(numpy.complex64)
+
+class qa_preroll(gr_unittest.TestCase):
+
+    def setUp(self):
+        self.tb = gr.top_block()
+        self.taps = filter.firdes.low_pass(1, NUMCHANS, 0.4, 0.2)
+
+    def tearDown(self):
+        self.tb = None
+
+    def test_001_channelize(self):
+        #bin 2 of the channelizer, which is what the filterbank maps +2 channels to
+        x = noise(16000, 1)
+        s2ss = blocks.stream_to_streams(gr.sizeof_gr_complex, NUMCHANS)
+        bank = filter.pfb_channelizer_ccf(NUMCHANS, self.taps, 1)
+        bank.set_channel_map([2])
+        dst = blocks.vector_sink_c()
+        self.tb.connect(blocks.vector_source_c(x.tolist(), False), s2ss)
+        for i in xrange(NUMCHANS):
+            self.tb.connect((s2ss,i), (bank,i))
+        self.tb.connect((bank,0), dst)
+        self.tb.run()
+        want = numpy.array(dst.data(), dtype=numpy.complex64)
+        got = preroll.channelize(x, 0, RATE, 2*RATE/NUMCHANS, self.taps, NUMCHANS)
+        #the two can be out by a sample or so and a fixed phase, find those
+        #and the rest should match
+        a, n = 10, len(got) - 20
+        best = None
+        for lag in xrange(-4, 5):
+            y, w = got[a:a+n], want[a+lag:a+lag+n]
+            if len(w) < n:
+                continue
+            gain = numpy.vdot(y, w) / numpy.vdot(y, y)
+            residual = numpy.linalg.norm(w - gain*y) / numpy.linalg.norm(w)
+            best = residual if best is None else min(best, residual)
+        self.assertLess(best, 1e-3)
+
+    def test_002_ring_wrap(self):
+        x = noise(5000, 2)
+        buf = preroll.preroll_buffer(1000 / RATE, RATE)
+        #the last write's more than the whole ring
+        for a, b in [(0, 300), (300, 900), (900, 1700), (1700, 1750), (1750, 2600), (2600, 5000)]:
+            buf.work([x[a:b]], [])
+            first, y = buf.read(b - 800, b)
+            self.assertEqual(first, b - 800)
+            self.assertComplexTuplesAlmostEqual(y.tolist(), x[b-800:b].tolist())
+            #clipped to what's still in the ring, and what's been written
+            first, y = buf.read(0, b + 100)
+            self.assertEqual(first, max(0, b - 1000))
+            self.assertComplexTuplesAlmostEqual(y.tolist(), x[first:b].tolist())
+
+    def test_003_inject(self):
+        x = noise(20000, 3)
+        offset = 2*RATE/NUMCHANS
+        buf = preroll.preroll_buffer(1.0, RATE)
+        buf.work([x], [])
+        inj = preroll.preroll_injector(buf, RATE, self.taps, NUMCHANS)
+        #live samples numbered so it's clear which ones come through
+        live = numpy.arange(4096).astype(numpy.complex64)
+        dst = blocks.vector_sink_c()
+        self.tb.connect(blocks.vector_source_c(live.tolist(), True), inj, blocks.head(gr.sizeof_gr_complex, 5000), dst)
+        start = 4000
+        inj.inject(start, offset)
+        self.tb.run()
+        out = numpy.array(dst.data(), dtype=numpy.complex64)
+
+        #the pre-roll, from start up to the end of the ring
+        expected = preroll.channelize(x[start:], start, RATE, offset, self.taps, NUMCHANS)
+        self.assertComplexTuplesAlmostEqual(out[:len(expected)].tolist(), expected.tolist(), 4)
+        #then the live samples, carrying straight on once they've started
+        rest = out[len(expected):].real.astype(numpy.int64)
+        self.assertGreater(len(rest), 0)
+        first = rest[0]
+        self.assertEqual(rest.tolist(), ((first + numpy.arange(len(rest))) % len(live)).tolist())
+        self.assertEqual(len(out), 5000)
+
+if __name__ == '__main__':
+    gr_unittest.run(qa_preroll, "qa_preroll.xml")
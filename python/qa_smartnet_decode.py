@@ -0,0 +1,125 @@
+#!/usr/bin/env python
+# Copyright 2013 Nick Foster
+#
+# This file is part of gr-scanner
+#
+# gr-scanner is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3, or (at your option)
+# any later version.
+#
+# gr-scanner is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with gr-scanner; see the file COPYING.  If not, write to
+# the Free Software Foundation, Inc., 51 Franklin Street,
+# Boston, MA 02110-1301, USA.
+#
+
+# Checks the numpy Smartnet decoder (smartnet_decode) and the C++
+# correlate/deinterleave/crc chain decode the same bit streams to the same
+# packets, that deinterleave packs frames the way smartnet_frame.h says,
+# and that decode_file's chunking doesn't change what it finds.
+
+from gnuradio import gr, gr_unittest, blocks, digital
+import os
+import shutil
+import tempfile
+import numpy
+import scanner_swig as scanner
+import smartnet_decode
+import waveform
+
+#crc's records, see include/scanner/ctrl_msg.h
+smartnet_record = numpy.dtype([("offset", numpy.uint64),
+                               ("address", numpy.uint16),
+                               ("command", numpy.uint16),
+                               ("groupflag", numpy.uint8),
+                               ("reserved", numpy.uint8, 3),
+                               ("emitted", numpy.float64),
+                               ("sample", numpy.uint64)])
+
+#deinterleave's output items, see include/scanner/smartnet_frame.h
+smartnet_frame = numpy.dtype([("data", numpy.uint64),
+                              ("parity", numpy.uint64),
+                              ("offset", numpy.uint64),
+                              ("sample", numpy.uint64)])
+
+def packets(recs):
+    return sorted(zip(*[recs[f].tolist() for f in ("offset", "address", "groupflag", "command")]))
+
+def osw_bits(n, seed):
+    rng = numpy.random.RandomState(seed)
+    return waveform.smartnet_bits(rng.randint(0, 0x10000, n), rng.randint(0, 2, n), rng.randint(0, 0x400, n))
+
+class qa_smartnet_decode(gr_unittest.TestCase):
+
+    def setUp(self):
+        self.tb = gr.top_block()
+
+    def tearDown(self):
+        self.tb = None
+
+    def decode_blocks(self, bits):
+        queue = gr.msg_queue()
+        src = blocks.vector_source_b(numpy.asarray(bits, dtype=numpy.uint8).tolist(), False)
+        sof = digital.correlate_access_code_tag_bb("10101100", 0, "smartnet_preamble")
+        self.tb.connect(src, sof, scanner.deinterleave(), scanner.crc(queue, 16))
+        self.tb.run()
+        recs = [numpy.zeros(0, dtype=smartnet_record)]
+        while queue.count() > 0:
+            recs.append(numpy.frombuffer(queue.delete_head().to_string(), dtype=smartnet_record))
+        return numpy.concatenate(recs)
+
+    def test_001_clean(self):
+        bits, marks = osw_bits(500, 1)
+        expected = smartnet_decode.decode_bits(bits)
+        self.assertEqual(len(expected), 500)
+        self.assertEqual(packets(self.decode_blocks(bits)), packets(expected))
+
+    def test_002_bit_errors(self):
+        #an error in each of most OSWs, some of them more than ecc can fix
+        bits, marks = osw_bits(500, 2)
+        rng = numpy.random.RandomState(2)
+        for mark in marks[rng.rand(len(marks)) < 0.8]:
+            for k in xrange(rng.randint(1, 4)):
+                bits[mark + rng.randint(0, smartnet_decode.FRAME_BITS)] ^= 1
+        expected = smartnet_decode.decode_bits(bits)
+        self.assertTrue(0 < len(expected) < 500)
+        self.assertEqual(packets(self.decode_blocks(bits)), packets(expected))
+
+    def test_003_decode_file_chunks(self):
+        bits, marks = osw_bits(300, 3)
+        expected = smartnet_decode.decode_bits(bits)
+        tmp = tempfile.mkdtemp()
+        try:
+            unpacked = os.path.join(tmp, "bits")
+            packed = os.path.join(tmp, "packed")
+            bits.astype(numpy.uint8).tofile(unpacked)
+            numpy.packbits(bits).tofile(packed)
+            #chunks smaller than a frame and not a multiple of 8, so frames straddle them
+            for chunk in (61, 1000, 1 << 22):
+                self.assertEqual(packets(smartnet_decode.decode_file(unpacked, chunk=chunk)), packets(expected))
+                self.assertEqual(packets(smartnet_decode.decode_file(packed, packed=True, chunk=chunk)), packets(expected))
+        finally:
+            shutil.rmtree(tmp)
+
+    def test_004_packed_frames(self):
+        #data bit k of a frame is (data >> (37-k)) & 1, and the same for parity
+        bits, marks = osw_bits(200, 4)
+        sink = blocks.vector_sink_b(smartnet_frame.itemsize)
+        sof = digital.correlate_access_code_tag_bb("10101100", 0, "smartnet_preamble")
+        self.tb.connect(blocks.vector_source_b(bits.tolist(), False), sof, scanner.deinterleave(), sink)
+        self.tb.run()
+        frames = numpy.array(sink.data(), dtype=numpy.uint8).view(smartnet_frame)
+        found, rows = smartnet_decode.deinterleave(bits, smartnet_decode.find_sync(bits))
+        weights = numpy.left_shift(numpy.uint64(1), numpy.arange(37, -1, -1).astype(numpy.uint64))
+        self.assertEqual(frames["offset"].tolist(), found.tolist())
+        self.assertEqual(frames["data"].tolist(), rows[:, 0::2].astype(numpy.uint64).dot(weights).tolist())
+        self.assertEqual(frames["parity"].tolist(), rows[:, 1::2].astype(numpy.uint64).dot(weights).tolist())
+
+if __name__ == '__main__':
+    gr_unittest.run(qa_smartnet_decode, "qa_smartnet_decode.xml")
@@ -0,0 +1,122 @@
+#!/usr/bin/env python
+# Copyright 2013 Nick Foster
+#
+# This file is part of gr-scanner
+#
+# gr-scanner is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3, or (at your option)
+# any later version.
+#
+# gr-scanner is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with gr-scanner; see the file COPYING.  If not, write to
+# the Free Software Foundation, Inc., 51 Franklin Street,
+# Boston, MA 02110-1301, USA.
+#
+
+# Round trips for the synthetic signal generator: the bit streams it
+# builds decode back to what it says it sent, and so does its IQ through
+# fsk_demod and the C++ decoders, with the packets stamped with the input
+# sample their preamble ended at.
+
+from gnuradio import gr, gr_unittest, blocks, digital
+import numpy
+import scanner_swig as scanner
+import smartnet_decode
+import waveform
+import fsk_demod
+
+#the decoders' records, see include/scanner/ctrl_msg.h
+smartnet_record = numpy.dtype([("offset", numpy.uint64),
+                               ("address", numpy.uint16),
+                               ("command", numpy.uint16),
+                               ("groupflag", numpy.uint8),
+                               ("reserved", numpy.uint8, 3),
+                               ("emitted", numpy.float64),
+                               ("sample", numpy.uint64)])
+edacs_record = numpy.dtype([("offset", numpy.uint64),
+                            ("pkt", numpy.uint64),
+                            ("emitted", numpy.float64),
+                            ("sample", numpy.uint64)])
+
+RATE = 50e3
+
+class qa_waveform(gr_unittest.TestCase):
+
+    def setUp(self):
+        self.tb = gr.top_block()
+
+    def tearDown(self):
+        self.tb = None
+
+    def drain(self, queue, dtype):
+        recs = [numpy.zeros(0, dtype=dtype)]
+        while queue.count() > 0:
+            recs.append(numpy.frombuffer(queue.delete_head().to_string(), dtype=dtype))
+        return numpy.concatenate(recs)
+
+    def test_001_smartnet_bits(self):
+        rng = numpy.random.RandomState(1)
+        address, groupflag, command = rng.randint(0, 0x10000, 200), rng.randint(0, 2, 200), rng.randint(0, 0x400, 200)
+        bits, marks = waveform.smartnet_bits(address, groupflag, command)
+        pkts = smartnet_decode.decode_bits(bits)
+        self.assertEqual(pkts["offset"].tolist(), marks.tolist())
+        self.assertEqual(pkts["address"].tolist(), address.tolist())
+        self.assertEqual(pkts["groupflag"].tolist(), groupflag.tolist())
+        self.assertEqual(pkts["command"].tolist(), command.tolist())
+
+    def test_002_edacs_bits(self):
+        data = numpy.random.RandomState(2).randint(0, 1 << 28, 100).astype(numpy.uint64)
+        bits, marks, pkts = waveform.edacs_bits(data)
+        self.assertEqual((pkts >> numpy.uint64(12)).tolist(), data.tolist())
+        self.assertEqual((pkts & numpy.uint64(0xFFF)).tolist(), waveform.edacs_crc(data).tolist())
+        #each frame's preamble, then both packets as three copies, the middle one inverted
+        weights = numpy.left_shift(numpy.uint64(1), numpy.arange(39, -1, -1).astype(numpy.uint64))
+        for n in xrange(len(pkts)):
+            mark = marks[n]
+            self.assertEqual("".join(str(b) for b in bits[mark-48:mark]), waveform.EDACS_PREAMBLE)
+            copies = bits[mark + 120*(n % 2):mark + 120*(n % 2) + 120].reshape(3, 40).astype(numpy.uint64)
+            copies[1] = 1 - copies[1]
+            self.assertEqual(copies.dot(weights).tolist(), [int(pkts[n])]*3)
+
+    def test_003_smartnet_iq(self):
+        #the symbol clock's off by 200ppm, which counting bits would be out by
+        #5 symbols over the run, so the sample tags have to do the timing
+        iq, sent = waveform.smartnet_signal(300, RATE, drift_ppm=200, seed=3)
+        sps = RATE / (waveform.SMARTNET_BAUD * (1 + 200e-6))
+        queue = gr.msg_queue()
+        sof = digital.correlate_access_code_tag_bb("10101100", 0, "smartnet_preamble")
+        self.tb.connect(blocks.vector_source_c(iq.tolist(), False),
+                        fsk_demod.fsk_demod(RATE / waveform.SMARTNET_BAUD, 0.1),
+                        sof, scanner.deinterleave(), scanner.crc(queue, 16))
+        self.tb.run()
+        recs = self.drain(queue, smartnet_record)
+        fields = lambda r: zip(r["address"].tolist(), r["groupflag"].tolist(), r["command"].tolist())
+        #where each OSW's preamble ended, in input samples
+        ends = dict(zip(fields(sent), (sent["offset"] * sps).tolist()))
+        #clock recovery can take an OSW or two to lock
+        self.assertTrue(set(fields(recs)) <= set(ends))
+        self.assertGreaterEqual(len(recs), len(sent) - 2)
+        #and each packet's sample is that to within a couple of symbols
+        for key, sample in zip(fields(recs), recs["sample"].tolist()):
+            self.assertLess(abs(sample - ends[key]), 2*sps)
+
+    def test_004_edacs_iq(self):
+        iq, sent = waveform.edacs_signal(200, RATE, seed=4)
+        queue = gr.msg_queue()
+        sof = digital.correlate_access_code_tag_bb(waveform.EDACS_PREAMBLE, 0, "edacs_preamble")
+        self.tb.connect(blocks.vector_source_c(iq.tolist(), False),
+                        fsk_demod.fsk_demod(RATE / waveform.EDACS_BAUD, 0.575),
+                        scanner.invert(), sof, scanner.edacs_pkt_rx(queue, 16))
+        self.tb.run()
+        got = self.drain(queue, edacs_record)["pkt"].tolist()
+        self.assertTrue(set(got) <= set(sent["pkt"].tolist()))
+        self.assertGreaterEqual(len(got), len(sent) - 4)
+
+if __name__ == '__main__':
+    gr_unittest.run(qa_waveform, "qa_waveform.xml")
@@ -22,14 +22,16 @@
 # Handles all hardware- and source-related functionality
 # You pass it options, it gives you data.
 
-from gnuradio import gr, blocks, uhd, analog
-from gnuradio.filter import pfb, optfir
+from gnuradio import gr, blocks, analog, filter
+from gnuradio.filter import pfb
 from gnuradio.eng_option import eng_option
 from gnuradio.gr.pubsub import pubsub
 from gnuradio.analog.fm_emph import fm_deemph
 from optparse import OptionParser, OptionGroup
-from math import pi
+from math import pi, ceil
+import re
 import scanner
+import tapcache
 
 class fm_demod(gr.hier_block2):
     """
@@ -40,8 +42,14 @@ class fm_demod(gr.hier_block2):
     arbitrary sample rate output. This way we don't have to immediately
     follow the fm_demod with a resampler to get to whatever audio rate.
     It also incorporates a noise squelch.
+
+    With gate set, idle_db turns on an idle mode: a carrier squelch on
+    the complex input drops samples while the channel's power is under
+    idle_db, so nothing after it runs on a quiet channel. It wakes up
+    within about wake_latency seconds of a carrier appearing. Without
+    gate the output has to keep flowing, so idle mode is off.
     """
-    def __init__(self, rate, decim, gate=False):
+    def __init__(self, rate, decim, gate=False, idle_db=None, wake_latency=0.005):
         gr.hier_block2.__init__(self,
                                 "fm_demod",
                                 gr.io_signature(1,1,gr.sizeof_gr_complex),
@@ -54,7 +62,7 @@ class fm_demod(gr.hier_block2):
         self.squelch = scanner.standard_squelch_ff(gate=gate)
         self.deemph = fm_deemph(rate, tau)
         self.nfilts = 32
-        audio_taps = optfir.band_pass(self.nfilts,
+        audio_taps = tapcache.band_pass(self.nfilts,
                                       self.rate*self.nfilts,
                                       250,
                                       300,
@@ -63,31 +71,72 @@ class fm_demod(gr.hier_block2):
                                       0.2,
                                       40)
         self.resamp = pfb.arb_resampler_fff(1./decim, audio_taps)
-        self.connect(self, self.quad, self.squelch, self.deemph, self.resamp, self)
+        if gate and idle_db is not None:
+            #single pole power average with a time constant of wake_latency
+            alpha = min(1.0, 1.0/(wake_latency*rate))
+            self.carrier = analog.pwr_squelch_cc(idle_db, alpha, 0, True)
+            self.connect(self, self.carrier, self.quad)
+        else:
+            self.carrier = None
+            self.connect(self, self.quad)
+        self.connect(self.quad, self.squelch, self.deemph, self.resamp, self)
+
+    def squelch_open(self):
+        #in idle mode the noise squelch stops getting samples when the
+        #carrier drops, and stays stuck wherever it was, so the carrier
+        #squelch has to be open too
+        if self.carrier is not None and not self.carrier.unmuted():
+            return False
+        return self.squelch.is_open()
+
+def _channel_taps(numchans, atten=60):
+    #the same prototype filter pfb.channelizer_ccf designs for itself
+    bw = 0.4
+    tb = 0.2
+    return tapcache.low_pass(1, numchans, bw, bw+tb, 0.1, atten)
 
 class filterbank(gr.hier_block2):
-    def __init__(self, rate, channel_spacing):
+    """
+    Channelizes the input into channel_spacing-wide channels and
+    pulls out nchans of them, mapped to outputs with set_freq().
+
+    The polyphase channelizer works out every channel in the band, but
+    only the nchans mapped ones get output buffers and downstream blocks.
+    """
+    def __init__(self, rate, channel_spacing, nchans=2):
         numchans = int(rate/channel_spacing)
         gr.hier_block2.__init__(self,
                                 "filterbank",
                                 gr.io_signature(1,1,gr.sizeof_gr_complex),
-                                gr.io_signature(numchans,numchans,gr.sizeof_gr_complex))
+                                gr.io_signature(nchans,nchans,gr.sizeof_gr_complex))
         self._channel_spacing = channel_spacing
         self._rate = rate
-        self._bank = pfb.channelizer_ccf(numchans, atten=60)
+        self._numchans = numchans
+        self._taps = _channel_taps(numchans)
         print "Filterbank using %i channels" % numchans
-        print "Filterbank filter length per channel: %i" % len(self._bank.pfb.taps()[0])
-        self._map = [0]*numchans
+        print "Filterbank filter length per channel: %i" % ceil(float(len(self._taps))/numchans)
+
+        self._map = [0]*nchans
+        self._s2ss = blocks.stream_to_streams(gr.sizeof_gr_complex, numchans)
+        self._bank = filter.pfb_channelizer_ccf(numchans, self._taps, 1)
         self._bank.set_channel_map(self._map)
-        self.connect(self, self._bank)
+        self.connect(self, self._s2ss)
         for i in xrange(numchans):
+            self.connect((self._s2ss,i), (self._bank,i))
+        for i in xrange(nchans):
             self.connect((self._bank,i), (self,i))
 
+    def taps(self):
+        return self._taps
+
+    def decimation(self):
+        return self._numchans
+
     def set_freq(self, chan, offset):
         assert(offset % self._channel_spacing < 1e-4)
         chan_num = int(offset / self._channel_spacing)
         if(chan_num < 0):
-            chan_num += int(self._rate / self._channel_spacing)
+            chan_num += self._numchans
         self._map[chan] = chan_num
         self._bank.set_channel_map(self._map)
 
@@ -133,21 +182,29 @@ class wavsink_path(gr.hier_block2):
 
 #TODO assign subscribers
 class trunked_feed(gr.hier_block2, pubsub):
-    def __init__(self, options, nchans=16):
+    """
+    Wideband source channelized into nchans outputs: the control channel
+    on output 0, voice channels after it. For radios, the sample rate and
+    center frequency not given in options are planned to cover the
+    control channel plus channels (a list of voice frequencies).
+    """
+    def __init__(self, options, nchans=16, channels=()):
         gr.hier_block2.__init__(self,
                                 "trunked_feed",
                                 gr.io_signature(0,0,gr.sizeof_gr_complex),
                                 gr.io_signature(nchans,nchans,gr.sizeof_gr_complex))
         pubsub.__init__(self)
         self._options = options
-        self._freqs = {"center": options.center_freq,
-                       "ctrl": options.ctrl_freq,
-                       "audio": options.ctrl_freq
-                      }
+        #output 0 is the control channel, the rest are voice channels
+        self._freqs = {"center": options.center_freq}
+        for i in xrange(nchans):
+            self._freqs[i] = options.ctrl_freq
         self._nchans = nchans
+        self._capture = None
+        channel_spacing = 25e3 #TODO parameterize
 
         if options.source == "uhd":
-            #UHD source by default
+            #UHD source by default, imported here so runs without one don't pay for it
             from gnuradio import uhd
             src = uhd.usrp_source(options.args, uhd.io_type_t.COMPLEX_FLOAT32, 1)
             if options.subdev is not None:
@@ -155,12 +212,11 @@ class trunked_feed(gr.hier_block2, pubsub):
             if options.antenna is not None:
                 src.set_antenna(options.antenna)
 
-            #pick a reasonable sample rate
+            #pick the lowest sample rate that covers the system
             master_clock_rate = src.get_clock_rate()
-            acceptable_rates = [i.start() for i in src.get_samp_rates() if i.start() > 8e6 and (master_clock_rate / i.start()) % 4 == 0]
-            src.set_samp_rate(min(acceptable_rates))
-            self._channel_decimation = 1
-            print "Using sample rate: %i" % min(acceptable_rates)
+            acceptable_rates = [i.start() for i in src.get_samp_rates() if (master_clock_rate / i.start()) % 4 == 0]
+            src.set_samp_rate(self.plan(acceptable_rates, channels, channel_spacing))
+            print "Using sample rate: %i" % src.get_samp_rate()
             if options.gain is None: #set to halfway
                 g = src.get_gain_range()
                 options.gain = (g.start()+g.stop()) / 2.0
@@ -173,11 +229,8 @@ class trunked_feed(gr.hier_block2, pubsub):
             import osmosdr
             src = osmosdr.source(options.source)
             wat = src.get_sample_rates()
-            rates = range(int(wat.start()), int(wat.stop()+1), int(wat.step()))
-            acceptable_rates = [i for i in rates if i >= 8e6]
-            if len(acceptable_rates) < 1: #we're in single-channel-only mode
-                acceptable_rates = (max(rates))
-            src.set_sample_rate(min(acceptable_rates))
+            rates = scanner.planner.candidate_rates(wat.start(), wat.stop(), wat.step(), channel_spacing)
+            src.set_sample_rate(self.plan(rates, channels, channel_spacing))
             src.get_samp_rate = src.get_sample_rate #alias for UHD compatibility in get_rate
 
             if options.gain is None:
@@ -193,20 +246,51 @@ class trunked_feed(gr.hier_block2, pubsub):
                     ip, port = re.search("(.*)\:(\d{1,5})", options.source).groups()
                 except:
                     raise Exception("Please input UDP source e.g. 192.168.10.1:12345")
+                if options.rate is None or options.center_freq is None:
+                    raise Exception("A UDP source needs --rate and --center-freq")
                 src = blocks.udp_source(gr.sizeof_gr_complex, ip, int(port))
                 print "Using UDP source %s:%s" % (ip, port)
             else:
-                src = blocks.file_source(gr.sizeof_gr_complex, options.source, repeat=False)
-                print "Using file source %s" % options.source
-
-        channel_spacing = 25e3
+                src = scanner.capture_source(options.source, options.rate, options.center_freq, options.skip_quiet)
+                if options.seek is not None:
+                    src.seek(scanner.capture.parse_time(options.seek, src.index()))
+                #the capture's own rate and center freq win over the options
+                self._rate = options.rate = src.rate()
+                options.center_freq = src.center_freq()
+                self._capture = src
+                print "Using capture source %s" % options.source
+
+        self._freqs["center"] = options.center_freq
+        self._channel_spacing = channel_spacing
+        if options.retune:
+            #blanks the tuner settling after a hop, see retune.py
+            self._settle = scanner.settle_gate(options.rate, options.settle_time)
+            self.connect(src, self._settle)
+            src = self._settle
+        else:
+            self._settle = None
         self._channel_decimation = int(options.rate / channel_spacing)
         self._filter_bank = filterbank(rate=options.rate,
-                                        channel_spacing=channel_spacing) #TODO parameterize
+                                       channel_spacing=channel_spacing,
+                                       nchans=self._nchans)
 
         self.connect(src, self._filter_bank)
-        for i in xrange(self._nchans):
-            self.connect((self._filter_bank,i), (self, i))
+        self.connect((self._filter_bank,0), (self,0))
+        if options.preroll > 0:
+            #voice outputs go through an injector so a retune can start a bit in the past
+            self._preroll = scanner.preroll_buffer(options.preroll, options.rate)
+            self.connect(src, self._preroll)
+            self._injectors = [None]
+            for i in xrange(1, self._nchans):
+                self._injectors.append(scanner.preroll_injector(self._preroll,
+                                                                options.rate,
+                                                                self._filter_bank.taps(),
+                                                                self._filter_bank.decimation()))
+                self.connect((self._filter_bank,i), self._injectors[i], (self,i))
+        else:
+            self._preroll = None
+            for i in xrange(1, self._nchans):
+                self.connect((self._filter_bank,i), (self, i))
 
         self._data_src = src
         self._source_name = options.source
@@ -218,6 +302,47 @@ class trunked_feed(gr.hier_block2, pubsub):
         print "Using ctrl rate: %f" % self.get_rate("ctrl")
         print "Using audio rate: %f" % self.get_rate("audio")
 
+    def plan(self, rates, channels, channel_spacing):
+        """
+        Picks the sample rate out of rates, and the center frequency, for
+        whichever of the two weren't given in the options.
+        """
+        if self._options.rate is not None:
+            rates = [self._options.rate]
+        rate, center = scanner.planner.plan(self._options.ctrl_freq, channels, rates,
+                                            channel_spacing, center=self._options.center_freq)
+        self._options.rate = rate
+        self._options.center_freq = center
+        return rate
+
+    def settle_gate(self):
+        return self._settle
+
+    def center_freq(self):
+        return self._freqs["center"]
+
+    def in_band(self, freq):
+        """
+        Whether freq can be mapped to an output without retuning.
+        """
+        offset = freq - self._freqs["center"]
+        steps = offset / self._channel_spacing
+        return abs(offset) <= self.get_rate("master") / 2 and abs(steps - round(steps)) < 1e-6
+
+    def center_for(self, freq):
+        """
+        A center frequency that puts freq a quarter of the band up from
+        DC, on the channel grid.
+        """
+        quarter = round(self.get_rate("master") / 4 / self._channel_spacing) * self._channel_spacing
+        return freq - quarter
+
+    def capture(self):
+        """
+        The capture_source when playing a file, or None.
+        """
+        return self._capture
+
     def live_source(self):
         return self._options.source in ("uhd", "osmocom", "hackrf", "rtlsdr")
 
@@ -249,12 +374,12 @@ class trunked_feed(gr.hier_block2, pubsub):
             self._data_src.set_center_freq(freq)
             self._freqs["center"] = self._data_src.get_center_freq()
 
-        self.set_freq("ctrl", self._freqs["ctrl"])
-        self.set_freq("audio", self._freqs["audio"])
+        for chan_num in xrange(self._nchans):
+            self.set_freq(chan_num, self._freqs[chan_num])
 
     def set_freq(self, chan, freq):
         print "Setting %s to %.4fMHz" % (chan, freq/1.e6)
-        chan_num = ["ctrl", "audio"].index(chan)
+        chan_num = {"ctrl": 0, "audio": 1}.get(chan, chan)
         #find the channel number
         offset = freq - self._freqs["center"]
         if abs(offset) > (self.get_rate("master") / 2):
@@ -264,7 +389,7 @@ class trunked_feed(gr.hier_block2, pubsub):
         self._filter_bank.set_freq(chan_num, offset)
         print "Setting channel %i" % (chan_num)
 
-        self._freqs[chan] = freq
+        self._freqs[chan_num] = freq
 
     def set_ctrl_freq(self, freq):
         self.set_freq("ctrl", freq)
@@ -272,6 +397,27 @@ class trunked_feed(gr.hier_block2, pubsub):
     def set_audio_freq(self, freq):
         self.set_freq("audio", freq)
 
+    def set_voice_freq(self, slot, freq):
+        #voice slot N lives on output N+1, after the control channel
+        self.set_freq(slot+1, freq)
+
+    def ctrl_to_master(self, sample):
+        """
+        Wideband sample number a control channel sample came from, taking
+        out the channel filter's delay.
+        """
+        return max(0, int(sample) * self._channel_decimation - (len(self._filter_bank.taps()) - 1) // 2)
+
+    def preroll(self, slot, start):
+        """
+        Replay a voice slot from wideband sample start, as far back as
+        the pre-roll buffer goes. Call after retuning the slot.
+        """
+        if self._preroll is None:
+            return
+        offset = self._freqs[slot+1] - self._freqs["center"]
+        self._injectors[slot+1].inject(max(0, int(start)), offset)
+
     def close(self):
         self._data_src = None
 
@@ -297,10 +443,19 @@ class trunked_feed(gr.hier_block2, pubsub):
         group.add_option("-f", "--ctrl-freq", type="eng_float",
                          default=851.425e6,
                          help="control channel frequency [default=%default]")
-        group.add_option("-c", "--center-freq", type="eng_float",
-                         default=852e6,
-                         help="tuner center frequency [default=%default]")
+        group.add_option("-c", "--center-freq", type="eng_float", default=None,
+                         help="tuner center frequency, leave blank to plan it from the bandplan")
         group.add_option("-r", "--rate", type="eng_float", default=None,
                          help="sample rate, leave blank for automatic")
+        group.add_option("--seek", type="string", default=None,
+                         help="start a capture file this many seconds in, or at a local time YYYY-MM-DD HH:MM:SS")
+        group.add_option("--skip-quiet", type="eng_float", default=None,
+                         help="skip parts of a capture file more than this many dB below its median power")
+        group.add_option("--preroll", type="eng_float", default=0,
+                         help="seconds of wideband samples to keep so voice channels can start before the grant [default=%default]")
+        group.add_option("--retune", action="store_true", default=False,
+                         help="hop the tuner to voice channels outside the band and back, for narrowband radios")
+        group.add_option("--settle-time", type="eng_float", default=0.02,
+                         help="initial tuner settle time estimate in seconds for --retune [default=%default]")
         parser.add_option_group(group)
 
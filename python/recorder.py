@@ -0,0 +1,150 @@
+# Copyright 2013 Nick Foster
+#
+# This file is part of gr-scanner
+#
+# gr-scanner is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3, or (at your option)
+# any later version.
+#
+# gr-scanner is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with gr-scanner; see the file COPYING.  If not, write to
+# the Free Software Foundation, Inc., 51 Franklin Street,
+# Boston, MA 02110-1301, USA.
+#
+
+# Voice recorders for gr-scanner
+# A recorder is a demod/wavfile chain pinned to one filterbank output.
+# The recorder pool hands grants out to free recorders and takes them
+# back when the call goes quiet on the control channel.
+
+from gnuradio import gr, blocks
+import os
+import time
+import threading
+import scanner
+
+class recorder(gr.hier_block2):
+    """
+    Gated FM demod feeding a wavfile sink. The sink is closed while
+    the recorder is idle, so nothing is written until start() is called.
+    idle_db is passed on to fm_demod to skip demodulating quiet channels.
+    """
+    def __init__(self, rate, audio_rate=8000, idle_db=None):
+        gr.hier_block2.__init__(self,
+                                "recorder",
+                                gr.io_signature(1,1,gr.sizeof_gr_complex),
+                                gr.io_signature(0,0,0))
+        self._rate = rate
+        self._audio_rate = int(audio_rate)
+        self._decim = float(self._rate) / self._audio_rate
+        self._demod = scanner.fm_demod(self._rate, #rate
+                                       self._decim, #audio decimation
+                                       True, #gate samples when closed
+                                       idle_db)
+        self._sink = blocks.wavfile_sink(os.devnull, 1, self._audio_rate, 8)
+        self._sink.close()
+        self._filename = None
+        self.connect(self, self._demod, self._sink)
+
+    def start(self, filename):
+        self._sink.open(filename)
+        self._filename = filename
+
+    def stop(self):
+        self._sink.close()
+        self._filename = None
+
+    def filename(self):
+        return self._filename
+
+    def squelch_open(self):
+        return self._demod.squelch_open()
+
+class recorder_pool(object):
+    """
+    Hands out recorders to talkgroup grants.
+
+    Args:
+        recorders: list of recorder blocks, one per voice output (list)
+        tune: callback taking (slot, freq) to retune a voice output (callable)
+        directory: where to put the recordings (str)
+        timeout: seconds without a grant update before a call is over (float)
+        clock: returns the current time in seconds, the stream clock when
+               replaying faster than real time (callable)
+    """
+    def __init__(self, recorders, tune, directory=".", timeout=2.0, clock=time.time):
+        self._recorders = recorders
+        self._tune = tune
+        self._directory = directory
+        self._timeout = timeout
+        self._clock = clock
+        self._lock = threading.Lock()
+        #per-slot call state: (addr, freq, last grant time) or None when free
+        self._calls = [None]*len(recorders)
+        self._done = threading.Event()
+        self._reaper = threading.Thread(target=self._reap)
+        self._reaper.daemon = True
+        self._reaper.start()
+
+    def recorders(self):
+        return self._recorders
+
+    def assign(self, addr, freq):
+        """
+        Record a grant. Returns the slot the call is recording on,
+        or None if every recorder is busy.
+        """
+        now = self._clock()
+        with self._lock:
+            self._expire(now)
+            for slot, call in enumerate(self._calls):
+                if call is not None and call[0] == addr:
+                    if call[1] != freq: #talkgroup moved, follow it
+                        self._tune(slot, freq)
+                    self._calls[slot] = (addr, freq, now)
+                    return slot
+            if None not in self._calls:
+                return None
+            slot = self._calls.index(None)
+            self._tune(slot, freq)
+            filename = os.path.join(self._directory, "%i_%s.wav" % (addr, time.strftime("%Y%m%d_%H%M%S", time.localtime(now))))
+            self._recorders[slot].start(filename)
+            self._calls[slot] = (addr, freq, now)
+            print "Recording %i on %.4fMHz in slot %i" % (addr, freq/1.e6, slot)
+            return slot
+
+    def release(self, slot):
+        with self._lock:
+            self._release(slot)
+
+    def busy(self):
+        with self._lock:
+            return len(self._calls) - self._calls.count(None)
+
+    def close(self):
+        self._done.set()
+        with self._lock:
+            for slot in xrange(len(self._calls)):
+                self._release(slot)
+
+    def _release(self, slot):
+        if self._calls[slot] is not None:
+            self._recorders[slot].stop()
+            self._calls[slot] = None
+
+    def _expire(self, now):
+        for slot, call in enumerate(self._calls):
+            if call is not None and (now - call[2]) > self._timeout:
+                self._release(slot)
+
+    #calls also have to end when the control channel goes quiet
+    def _reap(self):
+        while not self._done.wait(self._timeout / 2.):
+            with self._lock:
+                self._expire(self._clock())
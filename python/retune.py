@@ -0,0 +1,175 @@
+# Copyright 2013 Nick Foster
+#
+# This file is part of gr-scanner
+#
+# gr-scanner is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3, or (at your option)
+# any later version.
+#
+# gr-scanner is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with gr-scanner; see the file COPYING.  If not, write to
+# the Free Software Foundation, Inc., 51 Franklin Street,
+# Boston, MA 02110-1301, USA.
+#
+
+# Retuning scanner for narrowband radios
+# When the radio can't see the whole system at once, we act like a
+# normal scanner: sit on the control channel, hop the tuner over to a
+# voice channel when a call is granted, and hop back when the call ends.
+# Samples from while the tuner is settling are blanked, and how long
+# that takes is measured from the input power on every hop.
+
+import time
+import threading
+import numpy
+from gnuradio import gr
+
+def settle_point(power_db, tolerance_db=1.5):
+    """
+    Index of the first block after which the power stays within
+    tolerance_db of where it ends up (the median of the second half).
+    """
+    final = numpy.median(power_db[len(power_db)//2:])
+    unsettled = numpy.flatnonzero(numpy.abs(power_db - final) > tolerance_db)
+    return int(unsettled[-1]) + 1 if len(unsettled) else 0
+
+class settle_gate(gr.sync_block):
+    """
+    Passes samples through, but zeroes them for a while after blank().
+    It also measures how long the input power takes to settle after each
+    blank() and keeps an estimate of the tuner's settle time.
+
+    Args:
+        rate: sample rate (float)
+        settle_time: initial settle time estimate in seconds (float)
+        window: seconds of power to look at after each hop (float)
+    """
+    def __init__(self, rate, settle_time=0.02, window=0.2):
+        gr.sync_block.__init__(self,
+                               name="settle_gate",
+                               in_sig=[numpy.complex64],
+                               out_sig=[numpy.complex64])
+        self._rate = rate
+        self._block = max(int(rate * 1e-3), 1) #1ms power blocks
+        self._window = int(window * rate) // self._block * self._block
+        self._settle_time = settle_time
+        self._measured = []
+        self._lock = threading.Lock()
+        self._request = None
+        self._blank_until = 0
+        self._measure = None #samples since the last hop, while measuring
+
+    def blank(self):
+        """
+        Zero the input from now until the tuner has settled.
+        """
+        with self._lock:
+            self._request = int(self.settle_time() * self._rate)
+
+    def settle_time(self):
+        """
+        Current settle time estimate: the worst of the last few hops, or
+        the initial estimate until there's been a hop.
+        """
+        if not self._measured:
+            return self._settle_time
+        return max(self._measured[-8:])
+
+    def work(self, input_items, output_items):
+        inp, out = input_items[0], output_items[0]
+        start = self.nitems_read(0)
+        with self._lock:
+            if self._request is not None:
+                self._blank_until = start + self._request
+                self._measure = []
+                self._request = None
+        out[:] = inp
+        if self._blank_until > start:
+            out[:min(self._blank_until - start, len(out))] = 0
+
+        if self._measure is not None:
+            self._measure.append(inp[:self._window - sum(len(x) for x in self._measure)].copy())
+            got = numpy.concatenate(self._measure)
+            if len(got) >= self._window:
+                blocks = got.reshape(-1, self._block)
+                power = 10*numpy.log10(numpy.mean(blocks.real**2 + blocks.imag**2, axis=1) + 1e-20)
+                self._measured.append(settle_point(power) * self._block / float(self._rate))
+                self._measure = None
+        return len(out)
+
+class retune_scheduler(object):
+    """
+    Hops the tuner between the control channel and voice calls.
+
+    Args:
+        feed: the trunked_feed (trunked_feed)
+        gate: the settle_gate after the radio (settle_gate)
+        hang: seconds of closed squelch that end a call (float)
+        max_call: longest a call can keep us off the control channel (float)
+    """
+    def __init__(self, feed, gate, hang=2.0, max_call=120.0):
+        self._feed = feed
+        self._gate = gate
+        self._hang = hang
+        self._max_call = max_call
+        self._home = feed.center_freq()
+        self._lock = threading.Lock()
+        self._call = None #(squelch_open, keepalive, start time, last time open)
+        self._done = threading.Event()
+        self._watcher = threading.Thread(target=self._watch)
+        self._watcher.daemon = True
+        self._watcher.start()
+
+    def on_voice(self):
+        return self._call is not None
+
+    def start_call(self, freq, tune, squelch_open, keepalive=None):
+        """
+        Hop over to a call on freq. tune(freq) maps the voice output to it
+        once the tuner has moved, squelch_open() says whether the call is
+        still going, and keepalive() is called while it is. Returns False
+        if we're already away on another call.
+        """
+        with self._lock:
+            if self._call is not None:
+                return False
+            print "Retuning to call on %.4fMHz (settle %.1fms)" % (freq/1.e6, self._gate.settle_time()*1e3)
+            self._hop(self._feed.center_for(freq))
+            tune(freq)
+            now = time.time()
+            self._call = (squelch_open, keepalive, now, now)
+            return True
+
+    def close(self):
+        self._done.set()
+
+    def _hop(self, center):
+        self._feed.set_center_freq(center)
+        self._gate.blank()
+
+    def _watch(self):
+        while not self._done.wait(0.05):
+            with self._lock:
+                if self._call is None:
+                    continue
+                squelch_open, keepalive, start, last_open = self._call
+                now = time.time()
+                alive = squelch_open()
+                if alive:
+                    last_open = now
+                    self._call = (squelch_open, keepalive, start, last_open)
+                if now - last_open > self._hang or now - start > self._max_call:
+                    print "Call over, back to the control channel"
+                    self._hop(self._home)
+                    self._call = None
+                    alive = False
+            #keepalive() goes to the recorder pool, which holds its own lock
+            #while it calls start_call(), so it's called without ours held
+            if alive and keepalive is not None:
+                keepalive()
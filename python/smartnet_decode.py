@@ -0,0 +1,242 @@
+# Copyright 2013 Nick Foster
+#
+# This file is part of gr-scanner
+#
+# gr-scanner is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3, or (at your option)
+# any later version.
+#
+# gr-scanner is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with gr-scanner; see the file COPYING.  If not, write to
+# the Free Software Foundation, Inc., 51 Franklin Street,
+# Boston, MA 02110-1301, USA.
+#
+
+# Offline Smartnet control channel decoder
+# Does what correlate_access_code_tag_bb, deinterleave and crc do to a
+# sliced bit stream, but to every frame in a big array at once. It needs
+# nothing but numpy, so it's usable for bulk re-decoding of archived bit
+# captures and as a reference for testing the C++ blocks.
+#
+# Bits are one per byte (LSB significant), as binary_slicer_fb emits them.
+# Soft symbols are floats from clock recovery, positive for a 1.
+
+import numpy
+
+SYNC = 0xAC        #"10101100"
+SYNC_BITS = 8
+FRAME_BITS = 76    #deinterleaved frame: 38 data bits, each followed by a parity bit
+WINDOW_BITS = 84   #bits deinterleave wants available after the preamble
+
+#deinterleave: frame bit 4k+l is window bit k+19l
+_DEINTERLEAVE = numpy.array([k + 19*l for k in range(19) for l in range(4)])
+
+def _crc_ops():
+    #the CRC register value each of the 27 data bits XORs in, from crc_impl::crc
+    ops = []
+    crcop = 0x036E
+    for j in range(27):
+        if crcop & 0x01:
+            crcop = (crcop >> 1) ^ 0x0225
+        else:
+            crcop >>= 1
+        ops.append(crcop)
+    return numpy.array(ops, dtype=numpy.uint16)
+
+_CRC_OPS = _crc_ops()
+_CRC_INIT = 0x0393
+
+frame_dtype = numpy.dtype([("offset", numpy.uint64),
+                           ("address", numpy.uint16),
+                           ("command", numpy.uint16),
+                           ("groupflag", numpy.uint8),
+                           ("crc", numpy.uint16),
+                           ("crc_ok", numpy.bool_)])
+
+def _pack(bits):
+    #rows of bits to integers, MSB first
+    weights = numpy.left_shift(1, numpy.arange(bits.shape[1]-1, -1, -1)).astype(numpy.uint32)
+    return bits.astype(numpy.uint32).dot(weights)
+
+def find_sync(bits):
+    """
+    Returns the index of the first bit after every preamble in bits,
+    which is where correlate_access_code_tag_bb puts its tag.
+    """
+    bits = numpy.asarray(bits, dtype=numpy.uint8) & 0x01
+    n = len(bits) - SYNC_BITS + 1
+    if n <= 0:
+        return numpy.zeros(0, dtype=numpy.int64)
+    reg = numpy.zeros(n, dtype=numpy.uint8)
+    for i in range(SYNC_BITS):
+        reg |= bits[i:i+n] << (SYNC_BITS-1-i)
+    return numpy.nonzero(reg == SYNC)[0] + SYNC_BITS
+
+def deinterleave(bits, marks):
+    """
+    Pulls out the deinterleaved frame after each preamble mark. Marks
+    without WINDOW_BITS bits after them are dropped. Returns (marks, frames),
+    frames being one row of FRAME_BITS per mark.
+    """
+    bits = numpy.asarray(bits, dtype=numpy.uint8)
+    marks = numpy.asarray(marks)
+    marks = marks[marks + WINDOW_BITS <= len(bits)]
+    frames = bits[marks[:,None] + _DEINTERLEAVE[None,:]] & 0x01
+    return marks, frames
+
+def ecc(frames):
+    """
+    Syndrome-corrects frames, returning the 38 data bits of each. Parity
+    bit k is data bit k XOR data bit k-1, so a bad data bit flips two
+    consecutive syndrome bits.
+    """
+    data = frames[:, 0::2]
+    parity = frames[:, 1::2]
+    prev = numpy.zeros_like(data)
+    prev[:, 1:] = data[:, :-1]
+    syndrome = parity ^ data ^ prev
+    flip = numpy.zeros_like(data)
+    flip[:, :-1] = syndrome[:, :-1] & syndrome[:, 1:]
+    return data ^ flip
+
+def viterbi(frames):
+    """
+    Soft-decision decode of rows of FRAME_BITS soft symbols (positive for
+    a 1), returning the 38 data bits of each. The code is rate 1/2 with
+    one bit of memory, so the trellis has two states: the last data bit.
+    """
+    y = numpy.asarray(frames, dtype=numpy.float64)
+    d, p = y[:, 0::2], y[:, 1::2]
+    n = len(y)
+    metric = numpy.zeros((n, 2))
+    metric[:, 1] = -numpy.inf #starts from a 0
+    #came_from[:, k, b]: whether the best path into state b at bit k came from state 1
+    came_from = numpy.zeros((n, 38, 2), dtype=numpy.uint8)
+    for k in range(38):
+        new = numpy.empty((n, 2))
+        for b in (0, 1):
+            sign = 2*b - 1
+            from0 = metric[:, 0] + sign*d[:, k] + sign*p[:, k]
+            from1 = metric[:, 1] + sign*d[:, k] - sign*p[:, k]
+            came_from[:, k, b] = from1 > from0
+            new[:, b] = numpy.maximum(from0, from1)
+        metric = new
+    state = numpy.argmax(metric, axis=1)
+    data = numpy.zeros((n, 38), dtype=numpy.uint8)
+    rows = numpy.arange(n)
+    for k in range(37, -1, -1):
+        data[:, k] = state
+        state = came_from[rows, k, state]
+    return data
+
+def encode_osw(address, groupflag, command):
+    """
+    On-air bits (the 76 after the preamble) for arrays of OSW fields,
+    one row per OSW. The inverse of deinterleave, ecc and parse.
+    """
+    address = numpy.atleast_1d(numpy.asarray(address, dtype=numpy.uint32)) ^ 0x33C7
+    command = numpy.atleast_1d(numpy.asarray(command, dtype=numpy.uint32)) ^ 0x032A
+    n = len(address)
+    data = numpy.zeros((n, 38), dtype=numpy.uint8)
+    data[:, 0:16] = 1 - ((address[:, None] >> numpy.arange(15, -1, -1)) & 0x01)
+    data[:, 16] = 1 - (numpy.broadcast_to(groupflag, (n,)).astype(numpy.uint8) & 0x01)
+    data[:, 17:27] = 1 - ((command[:, None] >> numpy.arange(9, -1, -1)) & 0x01)
+    calc, given = crc(data)
+    data[:, 27:37] = 1 - ((calc[:, None].astype(numpy.uint32) >> numpy.arange(9, -1, -1)) & 0x01)
+    prev = numpy.zeros_like(data)
+    prev[:, 1:] = data[:, :-1]
+    frames = numpy.zeros((n, FRAME_BITS), dtype=numpy.uint8)
+    frames[:, 0::2] = data
+    frames[:, 1::2] = data ^ prev
+    bits = numpy.zeros((n, FRAME_BITS), dtype=numpy.uint8)
+    bits[:, _DEINTERLEAVE] = frames
+    return bits
+
+def crc(data):
+    """
+    Returns (calculated, given) CRCs for rows of data bits.
+    """
+    calc = _CRC_INIT ^ numpy.bitwise_xor.reduce(numpy.where(data[:, :27], _CRC_OPS, 0).astype(numpy.uint16), axis=1)
+    given = _pack(1 - data[:, 27:37])
+    return calc, given
+
+def parse(data):
+    """
+    Splits rows of data bits into an array of frame_dtype records.
+    Everything's sent inverted, and the address and command are XOR'd
+    per the mottrunk.txt description.
+    """
+    inv = 1 - data
+    calc, given = crc(data)
+    out = numpy.zeros(len(data), dtype=frame_dtype)
+    out["address"] = _pack(inv[:, 0:16]) ^ 0x33C7
+    out["groupflag"] = inv[:, 16]
+    out["command"] = _pack(inv[:, 17:27]) ^ 0x032A
+    out["crc"] = given
+    out["crc_ok"] = (calc == given)
+    return out
+
+def decode_bits(bits, offset=0, all_frames=False):
+    """
+    Decodes every Smartnet frame in a sliced bit array.
+
+    Args:
+        bits: one bit per byte (array-like)
+        offset: bit stream offset of bits[0], added to each frame's offset (int)
+        all_frames: also return frames that fail CRC (bool)
+
+    Returns an array of frame_dtype records, where offset is the first bit
+    after the preamble, same as the crc block's records.
+    """
+    bits = numpy.asarray(bits, dtype=numpy.uint8)
+    marks, frames = deinterleave(bits, find_sync(bits))
+    pkts = parse(ecc(frames))
+    pkts["offset"] = marks + offset
+    if not all_frames:
+        pkts = pkts[pkts["crc_ok"]]
+    return pkts
+
+def decode_soft(soft, offset=0, all_frames=False):
+    """
+    decode_bits for soft symbols, Viterbi decoding instead of ecc().
+    Preambles are found in the sliced symbols.
+    """
+    soft = numpy.asarray(soft, dtype=numpy.float32)
+    marks = find_sync(soft > 0)
+    marks = marks[marks + WINDOW_BITS <= len(soft)]
+    pkts = parse(viterbi(soft[marks[:,None] + _DEINTERLEAVE[None,:]]))
+    pkts["offset"] = marks + offset
+    if not all_frames:
+        pkts = pkts[pkts["crc_ok"]]
+    return pkts
+
+def decode_file(filename, all_frames=False, packed=False, chunk=1<<22):
+    """
+    Decodes a file of sliced bits (one per byte, as written by a file_sink
+    after the slicer, or eight per byte MSB first if packed) in chunks of
+    the given number of bits, so captures bigger than memory work too.
+    """
+    raw = numpy.memmap(filename, dtype=numpy.uint8, mode="r")
+    nbits = len(raw) * (8 if packed else 1)
+    results = []
+    for start in range(0, nbits, chunk):
+        #back up over the preamble and run on past the end so frames
+        #straddling chunk boundaries are found exactly once
+        base = max(0, start - SYNC_BITS)
+        stop = min(start + chunk + WINDOW_BITS, nbits)
+        if packed:
+            #only unpack the bytes this chunk covers
+            bits = numpy.unpackbits(raw[base//8:(stop+7)//8])[base%8:base%8 + stop-base]
+        else:
+            bits = raw[base:stop]
+        pkts = decode_bits(bits, base, all_frames)
+        results.append(pkts[(pkts["offset"] >= start) & (pkts["offset"] < start+chunk)])
+    if not results:
+        return numpy.zeros(0, dtype=frame_dtype)
+    return numpy.concatenate(results)
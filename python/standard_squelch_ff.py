@@ -19,9 +19,15 @@
 # Boston, MA 02110-1301, USA.
 #
 
-import math
-from gnuradio import gr, analog, blocks
-from gnuradio.filter import iir_filter_ffd, single_pole_iir_filter_ff
+import numpy
+from gnuradio import gr
+import scanner
+
+#fixed coeffs, Chebyshev type 2 LPF=[0, 0.4, 0.7], HPF=[0.4, 0.7, 1]
+_low_taps = ([0.12260106307699403, -0.22058023529806434, 0.22058023529806436, -0.12260106307699434],
+             [1.00000000000000000, 0.7589332900264623, 0.5162740252200005, 0.07097813844342238])
+_hi_taps = ([0.1913118666668073, 0.4406071020350289, 0.4406071020350288, 0.19131186666680736],
+            [1.000000000000000000, -0.11503633296078866, 0.3769676347066441, 0.0019066356578167866])
 
 class standard_squelch_ff(gr.hier_block2):
     """
@@ -47,74 +53,86 @@ class standard_squelch_ff(gr.hier_block2):
                                 gr.io_signature(1, 1, gr.sizeof_float), # Input signature
                                 gr.io_signature(1, 1, gr.sizeof_float)) # Output signature
 
-
-        #fixed coeffs, Chebyshev type 2 LPF=[0, 0.4, 0.7], HPF=[0.4, 0.7, 1]
-        self.low_iir = iir_filter_ffd([0.12260106307699403, -0.22058023529806434, 0.22058023529806436, -0.12260106307699434],
-                                             [1.00000000000000000, 0.7589332900264623, 0.5162740252200005, 0.07097813844342238],
-                                             False)
-        self.low_square = blocks.multiply_ff()
-        self.low_smooth = single_pole_iir_filter_ff(alpha)
-
-        self.hi_iir = iir_filter_ffd([0.1913118666668073, 0.4406071020350289, 0.4406071020350288, 0.19131186666680736],
-                                            [1.000000000000000000, -0.11503633296078866, 0.3769676347066441, 0.0019066356578167866], 
-                                             False)
-        self.hi_square = blocks.multiply_ff()
-        self.hi_smooth = single_pole_iir_filter_ff(alpha)
-
-        #inverted thresholds because we reversed the division block inputs
-        #to make the threshold output 1 when open and 0 when closed
-        self.gate = blocks.threshold_ff(0,0,0)
-        self.set_threshold(threshold_db)
-        self.squelch_lpf = single_pole_iir_filter_ff(alpha)
-        self.squelch_mult = blocks.multiply_ff()
-        self.div = blocks.divide_ff()
-
-        #This is horrible, but there's no better way to gate samples.
-        #the block is fast, so realistically there's little overhead
-        #TODO: implement a valve block that gates based on an input value
-        self.valve = analog.pwr_squelch_ff(-100, 1, 0, gate)
-
-        #sample path
-        self.connect(self, (self.squelch_mult, 0))
-
-        #filter path (LPF)
-        self.connect(self,self.low_iir)
-        self.connect(self.low_iir,(self.low_square,0))
-        self.connect(self.low_iir,(self.low_square,1))
-        self.connect(self.low_square,self.low_smooth,(self.div,0))
-
-        #filter path (HPF)
-        self.connect(self,self.hi_iir)
-        self.connect(self.hi_iir,(self.hi_square,0))
-        self.connect(self.hi_iir,(self.hi_square,1))
-        self.connect(self.hi_square,self.hi_smooth,(self.div,1))
-
-        #control path
-        self.connect(self.div, self.gate, self.squelch_lpf, (self.squelch_mult,1))
-        self.connect(self.squelch_mult, self)
+        #the filters, power averages, threshold and multiply all happen
+        #in the one block now, see reference() for what it does
+        self.squelch = scanner.noise_squelch_ff(alpha, threshold_db, gate)
+        self.connect(self, self.squelch, self)
 
     def set_threshold(self, threshold_db):
-        self.gate.set_hi(1/(10**(threshold_db/10.)))
-        self.gate.set_lo(1/(10**((threshold_db+1)/10.)))
+        self.squelch.set_threshold(threshold_db)
 
     def threshold(self):
-        return self.gate.hi()
+        return self.squelch.threshold()
 
     def set_alpha(self, alpha):
-        self._alpha = alpha
-        self.low_smooth.set_taps(alpha)
-        self.hi_smooth.set_taps(alpha)
-        self.squelch_lpf.set_taps(alpha)
+        self.squelch.set_alpha(alpha)
 
     def alpha(self):
-        return self._alpha
+        return self.squelch.alpha()
 
     def set_gate(self, gate):
-        self.valve.set_gate(gate)
+        self.squelch.set_gate(gate)
 
     def gate(self):
-        return self.valve.gate()
+        return self.squelch.gate()
+
+    def is_open(self):
+        return self.squelch.is_open()
 
     #TODO: this is historical, not sure what it's for
     def squelch_range(self):
         return (0.0, 1.0, 1.0/100)
+
+def _iir(b, a, x):
+    y = numpy.zeros(len(x))
+    xs = numpy.concatenate((numpy.zeros(len(b)-1), x))
+    ys = numpy.zeros(len(a)-1 + len(x))
+    for n in range(len(x)):
+        acc = numpy.dot(b, xs[n:n+len(b)][::-1]) - numpy.dot(a[1:], ys[n:n+len(a)-1][::-1])
+        ys[n+len(a)-1] = y[n] = acc
+    return y
+
+def _smooth(alpha, x):
+    y = numpy.zeros(len(x))
+    prev = 0.
+    for n in range(len(x)):
+        prev = y[n] = alpha*x[n] + (1-alpha)*prev
+    return y
+
+def reference_state(x, alpha=0.0001, threshold_db=-10):
+    """
+    Whether reference() has the squelch open after each sample of x, which
+    is what the block's is_open() says once it's been through them.
+    """
+    x = numpy.asarray(x, dtype=numpy.float64)
+    low_pwr = _smooth(alpha, _iir(_low_taps[0], _low_taps[1], x)**2)
+    hi_pwr = _smooth(alpha, _iir(_hi_taps[0], _hi_taps[1], x)**2)
+    with numpy.errstate(divide="ignore", invalid="ignore"):
+        ratio = low_pwr / hi_pwr
+    hi = 1/(10**(threshold_db/10.))
+    lo = 1/(10**((threshold_db+1)/10.))
+    state = numpy.zeros(len(x))
+    is_open = 0.
+    for n in range(len(x)):
+        if ratio[n] > hi:
+            is_open = 1.
+        elif ratio[n] < lo:
+            is_open = 0.
+        state[n] = is_open
+    return state
+
+def reference(x, alpha=0.0001, threshold_db=-10, gate=False):
+    """
+    Slow NumPy model of noise_squelch_ff, for checking the block against.
+
+    With gate=False it's also what the block graph this class used to be
+    did. That graph built a pwr_squelch_ff valve but never connected it
+    (and its threshold block shadowed gate()), so it never gated. Gating,
+    dropping the samples under -100dB, only happens with gate=True.
+    """
+    x = numpy.asarray(x, dtype=numpy.float64)
+    state = reference_state(x, alpha, threshold_db)
+    out = (x * _smooth(alpha, state)).astype(numpy.float32)
+    if not gate:
+        return out
+    return out[out*out >= 1e-10]
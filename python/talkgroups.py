@@ -0,0 +1,120 @@
+# Copyright 2013 Nick Foster
+#
+# This file is part of gr-scanner
+#
+# gr-scanner is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3, or (at your option)
+# any later version.
+#
+# gr-scanner is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with gr-scanner; see the file COPYING.  If not, write to
+# the Free Software Foundation, Inc., 51 Franklin Street,
+# Boston, MA 02110-1301, USA.
+#
+
+# Talkgroup database
+# Loads a talkgroup CSV (tgnum, shortname, longname, category, like
+# apps/sf_talkgroups.csv) into a record array plus an index over the whole
+# 16-bit address space. The index already has the Smartnet priority bits
+# masked off: every address maps to the record for addr & 0xFFF0, unless
+# the address has a record of its own. EDACS group ids have no priority
+# bits, so EDACS databases are loaded with a mask of 0xFFFF. Both arrays
+# are cached as .npy and memory-mapped on the next load, so big databases
+# open in constant time.
+
+import csv
+import re
+import numpy
+import diskcache
+
+ADDRESSES = 0x10000
+
+class talkgroup_db(object):
+    """
+    Args:
+        records: record array with tgnum, shortname, longname, category fields
+        index: record number for every address, -1 for none (int32 array)
+        mask: the talkgroup part of an address, 0xFFF0 for Smartnet (int)
+    """
+    def __init__(self, records, index, mask=0xFFF0):
+        self._records = records
+        self._index = index
+        self._mask = mask
+
+    @staticmethod
+    def build_index(tgnums, mask=0xFFF0):
+        exact = numpy.empty(ADDRESSES, dtype=numpy.int32)
+        exact[:] = -1
+        exact[tgnums] = numpy.arange(len(tgnums), dtype=numpy.int32)
+        #addresses without their own record fall back to the one with the priority bits cleared
+        masked = exact[numpy.arange(ADDRESSES) & mask]
+        return numpy.where(exact >= 0, exact, masked).astype(numpy.int32)
+
+    @staticmethod
+    def from_csv(filename, mask=0xFFF0):
+        """
+        Loads a talkgroup CSV, from the binary cache if the CSV hasn't changed.
+        """
+        rec_path = diskcache.file_path("tgrec", filename)
+        idx_path = diskcache.file_path("tgidx-%04x" % mask, filename)
+        records = diskcache.load(rec_path, mmap=True)
+        index = diskcache.load(idx_path, mmap=True)
+        if records is not None and index is not None:
+            return talkgroup_db(records, index, mask)
+
+        rows = []
+        with open(filename, "r") as f:
+            for row in csv.reader(f):
+                try:
+                    rows.append((int(row[0]),) + tuple(field.strip() for field in row[1:4]))
+                except (ValueError, IndexError):
+                    continue #header or blank line
+        width = lambda i: max([1] + [len(row[i]) for row in rows])
+        dtype = numpy.dtype([("tgnum", numpy.uint16),
+                             ("shortname", "S%i" % width(1)),
+                             ("longname", "S%i" % width(2)),
+                             ("category", "S%i" % width(3))])
+        records = numpy.array(rows, dtype=dtype)
+        index = talkgroup_db.build_index(records["tgnum"], mask)
+        diskcache.save(rec_path, records)
+        diskcache.save(idx_path, index)
+        return talkgroup_db(records, index, mask)
+
+    def __len__(self):
+        return len(self._records)
+
+    def lookup(self, addr):
+        """
+        The record for a talkgroup address, or None.
+        """
+        row = self._index[addr]
+        return self._records[row] if row >= 0 else None
+
+    def name(self, addr):
+        rec = self.lookup(addr)
+        return rec["shortname"].decode("utf-8") if rec is not None else str(addr & self._mask)
+
+    def categories(self):
+        return sorted(set(c.decode("utf-8") for c in self._records["category"]))
+
+    def select(self, categories=None, regex=None):
+        """
+        Returns a bool array over all addresses, True for talkgroups in any
+        of the given categories or whose short or long name matches regex.
+        """
+        if len(self._records) == 0:
+            return numpy.zeros(ADDRESSES, dtype=bool)
+        rows = numpy.zeros(len(self._records), dtype=bool)
+        for category in categories or []:
+            rows |= (self._records["category"] == category.encode("utf-8"))
+        if regex:
+            pattern = re.compile(regex.encode("utf-8"), re.IGNORECASE)
+            rows |= numpy.array([bool(pattern.search(s) or pattern.search(l)) for s, l in
+                                 zip(self._records["shortname"], self._records["longname"])], dtype=bool)
+        return (self._index >= 0) & rows[self._index]
@@ -0,0 +1,93 @@
+# Copyright 2013 Nick Foster
+#
+# This file is part of gr-scanner
+#
+# gr-scanner is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3, or (at your option)
+# any later version.
+#
+# gr-scanner is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with gr-scanner; see the file COPYING.  If not, write to
+# the Free Software Foundation, Inc., 51 Franklin Street,
+# Boston, MA 02110-1301, USA.
+#
+
+# Filter taps cache
+# Designing taps (Remez in optfir especially) takes a while, and every
+# voice chain asks for the same ones. Taps are keyed by the designer's
+# name and parameters, kept in memory for the rest of the process and in
+# the disk cache for the next one. optfir is only imported when something
+# actually has to be designed, and each design that misses the cache
+# prints how long it took.
+
+import time
+import numpy
+from gnuradio import filter
+import diskcache
+
+_taps = {}
+
+def design(kind, params, designer):
+    """
+    Taps for designer(*params), from the cache if they've been designed
+    before with the same parameters.
+    """
+    key = (kind,) + tuple(params)
+    if key not in _taps:
+        path = diskcache.key_path("taps", key)
+        taps = diskcache.load(path)
+        if taps is None:
+            start = time.time()
+            taps = numpy.array(designer(*params), dtype=numpy.float64)
+            print "Designed %s taps (%i) in %.3fs" % (kind, len(taps), time.time() - start)
+            diskcache.save(path, taps)
+        _taps[key] = taps.tolist()
+    return _taps[key]
+
+def _remez_low_pass(gain, rate, passband, stopband, ripple, atten):
+    from gnuradio.filter import optfir
+    #optfir gives up on tight specs, so relax the ripple until it converges
+    while True:
+        try:
+            return optfir.low_pass(gain, rate, passband, stopband, ripple, atten)
+        except RuntimeError:
+            ripple += 0.01
+            if ripple >= 1.0:
+                raise RuntimeError("optfir could not generate an appropriate filter.")
+
+def _remez_band_pass(gain, rate, stop1, pass1, pass2, stop2, ripple, atten):
+    from gnuradio.filter import optfir
+    return optfir.band_pass(gain, rate, stop1, pass1, pass2, stop2, ripple, atten)
+
+def low_pass(gain, rate, passband, stopband, ripple, atten):
+    return design("optfir.low_pass", (gain, rate, passband, stopband, ripple, atten), _remez_low_pass)
+
+def band_pass(gain, rate, stop1, pass1, pass2, stop2, ripple, atten):
+    return design("optfir.band_pass", (gain, rate, stop1, pass1, pass2, stop2, ripple, atten), _remez_band_pass)
+
+def firdes_low_pass(gain, rate, cutoff, transition, window):
+    return design("firdes.low_pass", (gain, rate, cutoff, transition, window), filter.firdes.low_pass)
+
+def arb_resampler(rate, flt_size=32, atten=100):
+    """
+    The taps pfb.arb_resampler_ccf/fff would design for themselves.
+    """
+    percent = 0.80
+    if rate < 1:
+        #filter to under half the output bandwidth to stop aliasing
+        halfband = 0.5*rate
+        bw = percent*halfband
+        tb = (percent/2.0)*halfband
+        return design("firdes.low_pass_2", (flt_size, flt_size, bw, tb, atten, filter.firdes.WIN_BLACKMAN_HARRIS),
+                      filter.firdes.low_pass_2)
+    #filter to under half the input bandwidth to stop images
+    halfband = 0.5
+    bw = percent*halfband
+    tb = (percent/2.0)*halfband
+    return low_pass(flt_size, flt_size, bw, bw+tb, 0.1, atten)
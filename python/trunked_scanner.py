@@ -1,5 +1,8 @@
 from gnuradio import gr
 from gnuradio.gr.pubsub import pubsub
+import os
+import time
+import numpy
 import scanner
 from optparse import OptionParser, OptionGroup
 #instantiates a sample feed, control decoder, audio sink, and control
@@ -8,33 +11,165 @@ class trunked_scanner(gr.top_block, pubsub):
         gr.top_block.__init__(self)
         pubsub.__init__(self)
         self._options = options
-
-        self._feed = scanner.trunked_feed(options, nchans=2)
-        self._monitor = [int(i) for i in options.monitor.split(",")]
-        self._tg_assignments = {}
+        self._replay = options.replay
+        if self._replay:
+            if not os.path.isfile(options.source) or ":" in options.source:
+                raise Exception("Replay needs a capture file as the source")
+            if options.recorders == 0 and not options.audio_output:
+                options.audio_output = "null" #don't let the sound card pace the replay
+        #wideband sample of the latest control channel event, and the wall
+        #clock time the stream started at, for timing calls in a replay
+        self._stream_sample = 0
+        self._grant = None #talkgroup of the grant being handled
+        self._epoch = time.time()
 
         if options.type == 'smartnet':
-            self._data_path = scanner.smartnet_ctrl_rx(self._feed.get_rate("ctrl"))
+            bandplan = scanner.bandplan.load(options.bandplan or "800_standard")
         elif options.type == 'edacs':
-            self._data_path = scanner.edacs_ctrl_rx(self._feed.get_rate("ctrl"))
+            bandplan = scanner.bandplan.load(options.bandplan, 32) if options.bandplan else None
         else:
             raise Exception("Invalid network type (must be edacs or smartnet)")
+        #the feed plans its rate and center freq around the system's channels
+        channels = bandplan.channels() if bandplan is not None else []
+        self._feed = scanner.trunked_feed(options, nchans=1+max(1, options.recorders), channels=channels)
+        #Smartnet addresses carry 4 priority bits, EDACS group ids don't
+        self._tg_mask = 0xFFF0 if options.type == 'smartnet' else 0xFFFF
+        self._talkgroups = scanner.talkgroup_db.from_csv(options.talkgroups, self._tg_mask) if options.talkgroups else None
+        self._monitor = self.build_monitor(options, self._talkgroups, self._tg_mask)
+        self._tg_assignments = {}
+
+        if options.type == 'smartnet':
+            self._data_path = scanner.smartnet_ctrl_rx(self._feed.get_rate("ctrl"), bandplan=bandplan, soft=options.soft)
+        else:
+            self._data_path = scanner.edacs_ctrl_rx(self._feed.get_rate("ctrl"), bandplan=bandplan)
         self.connect((self._feed,0), self._data_path)
+        self._latency = self._data_path.latency()
         options.rate = self._feed.get_rate("audio")
-        self._audio_path = scanner.audio_path(options)
-        self.connect((self._feed,1), self._audio_path)
+        if options.recorders > 0:
+            #one recorder per voice output, the control channel is output 0
+            self._pool = scanner.recorder_pool([scanner.recorder(options.rate, idle_db=options.idle_squelch) for i in xrange(options.recorders)],
+                                               self.tune_voice,
+                                               options.record_dir,
+                                               options.call_timeout,
+                                               self.clock if self._replay else time.time)
+            for i, rec in enumerate(self._pool.recorders()):
+                self.connect((self._feed,i+1), rec)
+        else:
+            self._pool = None
+            self._audio_path = scanner.audio_path(options)
+            self.connect((self._feed,1), self._audio_path)
+
+        if options.retune:
+            self._retune = scanner.retune_scheduler(self._feed, self._feed.settle_gate(),
+                                                    options.call_timeout, options.max_call)
+        else:
+            self._retune = None
 
         #setup a callback to retune the audio feed freq
         self._data_path.set_assign_callback(self.handle_assignment)
 
-    def handle_assignment(self, addr, groupflag, freq):
+        #last, so it sees every block
+        self._perf = scanner.perf_monitor(self, options.perf_interval)
+
+    def tune_voice(self, slot, freq):
+        if self._retune is not None and not self._feed.in_band(freq):
+            #keep the pool's call alive while we can't hear the grants
+            addr = self._grant
+            keepalive = lambda: self._pool.assign(addr, freq)
+            with self._latency.timed("retune"):
+                self._retune.start_call(freq, lambda f: self._feed.set_voice_freq(slot, f),
+                                        self._pool.recorders()[slot].squelch_open, keepalive)
+            return
+        with self._latency.timed("retune"):
+            self._feed.set_voice_freq(slot, freq)
+        #the grant that caused this was the latest control channel event
+        self._feed.preroll(slot, self._stream_sample - int(self._options.preroll * self._feed.get_rate("master")))
+
+    def start(self, *args):
+        #packets are timed from when the stream started. Radios take a
+        #moment to actually start streaming, which shows up as a constant
+        #extra in the demod latency.
+        self._epoch = time.time()
+        if self._feed.live_source():
+            self._data_path.set_epoch(self._epoch)
+        gr.top_block.start(self, *args)
+
+    def clock(self):
+        capture = self._feed.capture()
+        if capture is not None:
+            return capture.time_at(self._stream_sample)
+        return self._epoch + self._stream_sample / self._feed.get_rate("master")
+
+    def handle_assignment(self, addr, groupflag, freq, timestamp, sample):
+        self._stream_sample = max(self._stream_sample, self._feed.ctrl_to_master(sample))
+        if self._replay:
+            name = self._talkgroups.name(addr) if self._talkgroups is not None else str(addr & self._tg_mask)
+            #stream sample to capture sample, which differ after a seek or skipped quiet stretch
+            sample = self._feed.capture().file_sample(self._feed.ctrl_to_master(sample))
+            print "%.6f %i %s %i %.4f" % (self._feed.capture().index().time_at(sample),
+                                         sample, name, groupflag, freq/1.e6)
         #TODO handle all channel assignment and priority monitor stuff here
-        if (addr & 0xFFF0) in self._monitor:# and self._tg_assignments.get(addr) != freq: #mask because last 4 bits is priority mask
-            self._feed.set_audio_freq(freq)
+        if self._monitor[addr]:# and self._tg_assignments.get(addr) != freq: #mask already covers the 4 priority bits
+            if self._pool is not None:
+                self._grant = addr & self._tg_mask
+                self._pool.assign(addr & self._tg_mask, freq)
+            elif self._retune is not None and not self._feed.in_band(freq):
+                with self._latency.timed("retune"):
+                    self._retune.start_call(freq, self._feed.set_audio_freq, self._audio_path.squelch_open)
+            else:
+                with self._latency.timed("retune"):
+                    self._feed.set_audio_freq(freq)
 
         self._tg_assignments[addr] = freq
 
+    @staticmethod
+    def build_monitor(options, talkgroups, mask):
+        #one flag per address, so the per-grant check is a single index
+        #no matter how many talkgroups are monitored. mask is the one the
+        #talkgroup DB was loaded with, so the two agree on what a talkgroup is
+        addrs = numpy.arange(scanner.talkgroups.ADDRESSES)
+        if options.monitor == "all":
+            return numpy.ones(len(addrs), dtype=bool)
+        monitor = numpy.zeros(len(addrs), dtype=bool)
+        for tg in options.monitor.split(","):
+            monitor[(addrs & mask) == int(tg)] = True
+        if talkgroups is not None and (options.tg_category or options.tg_regex):
+            categories = options.tg_category.split(",") if options.tg_category else None
+            monitor |= talkgroups.select(categories, options.tg_regex)
+        return monitor
+
+    def wait_idle(self):
+        return self._data_path.wait_idle()
+
+    def replay_stats(self, elapsed):
+        """
+        Samples per second and speed-up over real time for a replay that
+        took elapsed seconds.
+        """
+        rate = self._feed.capture().samples_read() / elapsed
+        return rate, rate / self._feed.get_rate("master")
+
+    def perf_stats(self):
+        """
+        Per-block rates since the last call or stats dump, see perf_monitor.sample().
+        """
+        return self._perf.sample()
+
+    def bottleneck(self):
+        return self._perf.bottleneck()
+
+    def health(self):
+        return self._data_path.health()
+
+    def latency_report(self):
+        return self._latency.report()
+
     def close(self):
+        self._perf.close()
+        if self._retune is not None:
+            self._retune.close()
+        if self._pool is not None:
+            self._pool.close()
         self._feed.close()
 
     @staticmethod
@@ -44,9 +179,35 @@ class trunked_scanner(gr.top_block, pubsub):
         group = OptionGroup(parser, "Scanner setup options")
         #Choose source
         group.add_option("-m","--monitor", type="string", default="0",
-                        help="Monitor a list of talkgroups (comma-separated) [default=%default]")
+                        help="Monitor a list of talkgroups (comma-separated), or all [default=%default]")
         group.add_option("-t","--type", type="string", default="smartnet",
                          help="Network type (edacs or smartnet only) [default=%default]")
+        group.add_option("--talkgroups", type="string", default=None,
+                         help="Talkgroup CSV of tgnum, shortname, longname, category")
+        group.add_option("--tg-category", type="string", default=None,
+                         help="Also monitor talkgroups in these categories (comma-separated)")
+        group.add_option("--tg-regex", type="string", default=None,
+                         help="Also monitor talkgroups whose name matches this regex")
+        group.add_option("--soft", action="store_true", default=False,
+                         help="Soft-decision decode the Smartnet control channel (better on weak signals, more CPU)")
+        group.add_option("--bandplan", type="string", default=None,
+                         help="Channel CSV, or Smartnet plan 800_standard, 800_reband, 800_splinter, 900, obt,<base>,<spacing>,<offset> [default=800_standard for Smartnet]")
+        group.add_option("--replay", action="store_true", default=False,
+                         help="Run a capture file as fast as possible and print timestamped grants as: unix time, capture sample, talkgroup, groupflag, MHz")
+        group.add_option("--recorders", type="int", default=0,
+                         help="Record up to this many concurrent calls to disk instead of playing audio [default=%default]")
+        group.add_option("--record-dir", type="string", default=".",
+                         help="Directory to write call recordings to [default=%default]")
+        group.add_option("--idle-squelch", type="eng_float", default=None,
+                         help="Skip demodulating recorder channels while their power is under this many dB [default=off]")
+        group.add_option("--max-call", type="eng_float", default=120,
+                         help="Longest a call can hold the tuner away from the control channel with --retune [default=%default]")
+        group.add_option("--perf-interval", type="eng_float", default=0,
+                         help="Print per-block CPU, item rates and buffer fullness this often, in seconds [default=off]")
+        group.add_option("--latency", action="store_true", default=False,
+                         help="Print grant-to-retune latency histograms on exit")
+        group.add_option("--call-timeout", type="eng_float", default=2.0,
+                         help="Seconds without a grant before a recorded call is over [default=%default]")
         parser.add_option_group(group)
 
 
@@ -0,0 +1,174 @@
+# Copyright 2013 Nick Foster
+#
+# This file is part of gr-scanner
+#
+# gr-scanner is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3, or (at your option)
+# any later version.
+#
+# gr-scanner is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with gr-scanner; see the file COPYING.  If not, write to
+# the Free Software Foundation, Inc., 51 Franklin Street,
+# Boston, MA 02110-1301, USA.
+#
+
+# Synthetic control channel signals
+# Generates Smartnet (3600 baud, interleaved rate-1/2 coded OSWs) and
+# EDACS (9600 baud, three copies of each packet) baseband IQ with a
+# known packet list, at any sample rate, SNR, frequency offset and
+# symbol clock drift, so decode throughput and sensitivity can be
+# measured without a radio. Needs nothing but numpy.
+#
+# Bits here are as binary_slicer_fb would emit them, a 1 being the
+# upper tone. EDACS goes through scanner.invert after the slicer, so
+# edacs_bits() gives the bits as they are after that, and edacs_signal()
+# sends them inverted.
+
+import numpy
+import smartnet_decode
+
+SMARTNET_BAUD = 3600.
+EDACS_BAUD = 9600.
+
+#preamble as seen after scanner.invert, see ctrl_chan.edacs_ctrl_rx
+EDACS_PREAMBLE = "010101010101010101010111000100100101010101010101"
+EDACS_FRAME_BITS = 288 #preamble, then two packets of three 40-bit copies
+
+smartnet_sent = numpy.dtype([("offset", numpy.uint64),
+                             ("address", numpy.uint16),
+                             ("command", numpy.uint16),
+                             ("groupflag", numpy.uint8)])
+edacs_sent = numpy.dtype([("offset", numpy.uint64),
+                          ("pkt", numpy.uint64)])
+
+def _bits(s):
+    return numpy.array([int(c) for c in s], dtype=numpy.uint8)
+
+def _unpack(words, nbits):
+    #rows of bits, MSB first
+    words = numpy.asarray(words, dtype=numpy.uint64)
+    shifts = numpy.arange(nbits-1, -1, -1).astype(numpy.uint64)
+    return ((words[:, None] >> shifts[None, :]) & numpy.uint64(1)).astype(numpy.uint8)
+
+def _dotting(n):
+    #alternating bits: lets clock recovery lock, and can't contain a preamble
+    return numpy.arange(n, dtype=numpy.uint8) & 0x01
+
+def smartnet_bits(address, groupflag, command, lead=240):
+    """
+    Sliced bit stream for a run of OSWs, each sent as a preamble and 76
+    coded bits, with lead bits of dotting before them. Returns
+    (bits, marks), marks being the index of the first bit after each
+    preamble, where correlate_access_code_tag_bb tags it.
+    """
+    osws = smartnet_decode.encode_osw(address, groupflag, command)
+    sync = _unpack([smartnet_decode.SYNC], smartnet_decode.SYNC_BITS)[0]
+    frames = numpy.hstack((numpy.tile(sync, (len(osws), 1)), osws))
+    #a last preamble, since deinterleave wants to see the whole of a window
+    bits = numpy.concatenate((_dotting(lead), frames.ravel(), sync, _dotting(lead)))
+    marks = lead + smartnet_decode.WINDOW_BITS * numpy.arange(len(osws)) + smartnet_decode.SYNC_BITS
+    return bits, marks
+
+def edacs_crc(data):
+    """
+    CRC-12 (poly 0x7D7, zero initial value) of 28-bit packet data words,
+    the one edacs_pkt_rx checks.
+    """
+    data = numpy.asarray(data, dtype=numpy.uint64)
+    crc = numpy.zeros(len(data), dtype=numpy.uint64)
+    for shift in range(27, -1, -1):
+        feedback = ((crc >> numpy.uint64(11)) ^ (data >> numpy.uint64(shift))) & numpy.uint64(1)
+        crc = ((crc << numpy.uint64(1)) & numpy.uint64(0xFFF)) ^ (feedback * numpy.uint64(0x7D7))
+    return crc
+
+def edacs_bits(data, lead=480):
+    """
+    Bit stream, as seen after scanner.invert, for 28-bit EDACS packet data words (an even
+    number of them), two packets to a frame, with lead bits of dotting
+    before them. Returns (bits, marks, pkts), marks being the index of
+    the first bit after each packet's frame preamble, and pkts the 40-bit
+    packets with their CRCs.
+    """
+    data = numpy.asarray(data, dtype=numpy.uint64) & numpy.uint64(0xFFFFFFF)
+    if len(data) % 2:
+        raise ValueError("EDACS packets go two to a frame")
+    pkts = (data << numpy.uint64(12)) | edacs_crc(data)
+    copies = _unpack(pkts, 40)
+    #three copies, the middle one inverted
+    copies = numpy.hstack((copies, 1 - copies, copies)).reshape(-1, 240)
+    frames = numpy.hstack((numpy.tile(_bits(EDACS_PREAMBLE), (len(copies), 1)), copies))
+    bits = numpy.concatenate((_dotting(lead), frames.ravel(), _dotting(lead)))
+    marks = numpy.repeat(lead + EDACS_FRAME_BITS * numpy.arange(len(copies)) + len(EDACS_PREAMBLE), 2)
+    return bits, marks, pkts
+
+def fsk_modulate(bits, baud, rate, deviation, freq_offset=0., drift_ppm=0., snr_db=None, bt=0.5, rng=None):
+    """
+    Gaussian-filtered 2FSK of a bit stream at rate samples per second.
+
+    Args:
+        bits: bits to send, 1 being +deviation (array-like)
+        baud: nominal symbol rate (float)
+        rate: sample rate (float)
+        deviation: peak deviation in Hz (float)
+        freq_offset: carrier offset from 0Hz (float)
+        drift_ppm: transmitter symbol clock error in ppm (float)
+        snr_db: Es/N0 in dB, or None for no noise (float)
+        bt: Gaussian filter bandwidth-time product (float)
+        rng: numpy RandomState for the noise (RandomState)
+    """
+    bits = numpy.asarray(bits, dtype=numpy.uint8)
+    sps = rate / (baud * (1 + drift_ppm * 1e-6))
+    n = int(len(bits) * sps)
+    symbol = numpy.minimum((numpy.arange(n) / sps).astype(numpy.int64), len(bits) - 1)
+    freq = numpy.where(bits[symbol] & 0x01, deviation, -deviation).astype(numpy.float64)
+    if bt:
+        sigma = sps * numpy.sqrt(numpy.log(2)) / (2 * numpy.pi * bt)
+        t = numpy.arange(-int(3*sigma), int(3*sigma) + 1)
+        gauss = numpy.exp(-0.5 * (t / sigma)**2)
+        freq = numpy.convolve(freq, gauss / gauss.sum(), "same")
+    #wrap the phase as it goes so long signals don't lose precision
+    phase = numpy.mod(numpy.cumsum((freq + freq_offset) / rate), 1.0)
+    iq = numpy.exp(2j * numpy.pi * phase)
+    if snr_db is not None:
+        if rng is None:
+            rng = numpy.random.RandomState()
+        #unit power signal, so N0 is the symbol energy over the SNR
+        n0 = (rate / baud) * 10**(-snr_db / 10.)
+        iq += numpy.sqrt(n0 / 2) * (rng.standard_normal(n) + 1j * rng.standard_normal(n))
+    return iq.astype(numpy.complex64)
+
+def smartnet_signal(nosws, rate, snr_db=None, freq_offset=0., drift_ppm=0., deviation=2500., seed=None):
+    """
+    IQ for nosws random OSWs. Returns (iq, sent), sent being a
+    smartnet_sent record per OSW with the offset the crc block should
+    report for it.
+    """
+    rng = numpy.random.RandomState(seed)
+    sent = numpy.zeros(nosws, dtype=smartnet_sent)
+    sent["address"] = rng.randint(0, 0x10000, nosws)
+    sent["groupflag"] = rng.randint(0, 2, nosws)
+    sent["command"] = rng.randint(0, 0x400, nosws)
+    bits, sent["offset"] = smartnet_bits(sent["address"], sent["groupflag"], sent["command"])
+    iq = fsk_modulate(bits, SMARTNET_BAUD, rate, deviation, freq_offset, drift_ppm, snr_db, rng=rng)
+    return iq, sent
+
+def edacs_signal(npkts, rate, snr_db=None, freq_offset=0., drift_ppm=0., deviation=2400., seed=None):
+    """
+    IQ for npkts (rounded up to even) random EDACS packets. Returns
+    (iq, sent), sent being an edacs_sent record per packet.
+    """
+    rng = numpy.random.RandomState(seed)
+    npkts += npkts % 2
+    data = rng.randint(0, 1 << 28, npkts).astype(numpy.uint64)
+    bits, marks, pkts = edacs_bits(data)
+    sent = numpy.zeros(npkts, dtype=edacs_sent)
+    sent["offset"] = marks
+    sent["pkt"] = pkts
+    iq = fsk_modulate(1 - bits, EDACS_BAUD, rate, deviation, freq_offset, drift_ppm, snr_db, rng=rng)
+    return iq, sent
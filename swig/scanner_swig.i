@@ -12,6 +12,8 @@
 #include "scanner/deinterleave.h"
 #include "scanner/invert.h"
 #include "scanner/edacs_pkt_rx.h"
+#include "scanner/noise_squelch_ff.h"
+#include "scanner/soft_decoder.h"
 %}
 
 
@@ -25,3 +27,8 @@ GR_SWIG_BLOCK_MAGIC2(scanner, deinterleave);
 GR_SWIG_BLOCK_MAGIC2(scanner, invert);
 %include "scanner/edacs_pkt_rx.h"
 GR_SWIG_BLOCK_MAGIC2(scanner, edacs_pkt_rx);
+
+%include "scanner/noise_squelch_ff.h"
+GR_SWIG_BLOCK_MAGIC2(scanner, noise_squelch_ff);
+%include "scanner/soft_decoder.h"
+GR_SWIG_BLOCK_MAGIC2(scanner, soft_decoder);